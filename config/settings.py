@@ -71,6 +71,9 @@ MIDDLEWARE = [
 
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+
+    # Writes the request's activity-log rows in one go once the response is built
+    'website.activity_log.ActivityLogBufferMiddleware',
 ]
 
 
@@ -285,6 +288,13 @@ MESSAGE_RETENTION_DAYS = 0  # LEGAL REQUIREMENT: Store forever
 # Activity logging
 ACTIVITY_LOGGING_ENABLED = True
 
+# Buffer a request's activity rows and write them with one bulk_create at the end.
+# Each request spools its rows to ACTIVITY_LOG_SPOOL_DIR first; leftovers from a
+# crashed worker are written by `python manage.py replay_activity_spool`.
+ACTIVITY_LOG_BUFFERED = True
+ACTIVITY_LOG_SPOOL_DIR = BASE_DIR / 'activity_spool'
+ACTIVITY_LOG_SPOOL_FSYNC = True
+
 # Admin email for legal compliance notifications
 LEGAL_COMPLIANCE_EMAIL = os.environ.get('LEGAL_COMPLIANCE_EMAIL', 'legal@synergy-dating.com')
 ADMIN_EMAILS = ['admin@synergy-dating.com']
@@ -293,6 +303,16 @@ ADMIN_EMAILS = ['admin@synergy-dating.com']
 DATA_EXPORT_ENABLED = True
 MAX_EXPORT_RECORDS = 10000  # Limit for single export
 
+# =============================================================================
+# RECOMMENDATIONS
+# =============================================================================
+
+# Patch stored recommendation lists when a member is approved/created.
+# Batch approvals are queued and patched by `python manage.py refresh_recommendations`
+# (from cron, or with --loop as a worker). Turn off for large imports and let the
+# nightly precompute_recommendations catch up.
+RECOMMENDATIONS_LIVE_REFRESH = True
+
 # =============================================================================
 # SECURITY SETTINGS (Auto-configured for production)
 # =============================================================================
@@ -0,0 +1,176 @@
+# activity_log.py - Buffered activity-log writer with a durable spool file
+"""
+log_user_activity() used to INSERT one UserActivityLog row per call, inside
+the user's request. Inside a request we now:
+
+  1. append each entry to a per-request spool file (flushed + fsynced), and
+  2. keep the row in memory,
+
+then ActivityLogBufferMiddleware writes the whole request's rows with one
+bulk_create when the response is done and deletes the spool file. If the
+worker dies first, the spool file survives and `replay_activity_spool`
+inserts it later. Outside a request (shell, management commands) entries
+are written straight away as before.
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+_local = threading.local()
+
+
+def spool_dir():
+    path = Path(getattr(settings, 'ACTIVITY_LOG_SPOOL_DIR', Path(settings.BASE_DIR) / 'activity_spool'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+# ==================== SERIALIZATION ====================
+
+def entry_to_dict(entry):
+    """UserActivityLog (unsaved) -> JSON-safe dict for the spool file"""
+    return {
+        'user_id': entry.user_id,
+        'activity_type': entry.activity_type,
+        'target_user_id': entry.target_user_id,
+        'ip_address': entry.ip_address,
+        'agent_id': entry.agent_id,
+        'user_agent': entry.user_agent,
+        'additional_data': entry.additional_data,
+        'created_at': entry.created_at.isoformat(),
+    }
+
+
+def entry_from_dict(data):
+    from .models import UserActivityLog
+    entry = UserActivityLog(
+        user_id=data['user_id'],
+        activity_type=data['activity_type'],
+        target_user_id=data.get('target_user_id'),
+        ip_address=data.get('ip_address'),
+        agent_id=data.get('agent_id'),
+        user_agent=data.get('user_agent') or '',
+        additional_data=data.get('additional_data') or {},
+        created_at=datetime.fromisoformat(data['created_at']),
+    )
+    entry.promote_keys()
+    return entry
+
+
+# ==================== REQUEST BUFFER ====================
+
+class ActivityLogBuffer:
+    """Entries logged during one request, mirrored to a spool file"""
+
+    def __init__(self):
+        self.entries = []
+        self.path = spool_dir() / f"{os.getpid()}-{uuid.uuid4().hex}.jsonl"
+        self._file = None
+
+    def add(self, entry):
+        if self._file is None:
+            self._file = self.path.open('a', encoding='utf-8')
+        self._file.write(json.dumps(entry_to_dict(entry), default=str) + '\n')
+        self._file.flush()
+        if getattr(settings, 'ACTIVITY_LOG_SPOOL_FSYNC', True):
+            os.fsync(self._file.fileno())
+        self.entries.append(entry)
+
+    def flush(self):
+        """Write everything with one bulk_create, then drop the spool file if every row made it"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not self.entries:
+            return 0
+
+        count = len(self.entries)
+        written = write_entries(self.entries)
+        self.entries = []
+        if written < count:
+            # Database down or flapping - leave the file for replay_activity_spool
+            print(f"Kept activity spool {self.path.name}: {count - written} of {count} row(s) not written")
+            return written
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        return written
+
+
+def write_entries(entries):
+    """bulk_create, falling back to row-by-row so one bad row can't lose the rest"""
+    from .models import UserActivityLog
+    for entry in entries:
+        entry.intern_agent()
+    try:
+        UserActivityLog.objects.bulk_create(entries, batch_size=500)
+        return len(entries)
+    except Exception as e:
+        print(f"Error bulk logging activity, retrying row by row: {e}")
+
+    written = 0
+    for entry in entries:
+        try:
+            entry.pk = None
+            entry.save()
+            written += 1
+        except Exception as e:
+            print(f"Error logging activity {entry.activity_type} for user {entry.user_id}: {e}")
+    return written
+
+
+def start_buffer():
+    _local.buffer = ActivityLogBuffer()
+    return _local.buffer
+
+
+def end_buffer():
+    buffer = getattr(_local, 'buffer', None)
+    _local.buffer = None
+    if buffer is not None:
+        buffer.flush()
+
+
+def record(entry):
+    """Buffer the entry if we're inside a request, otherwise write it now"""
+    if not entry.created_at:
+        entry.created_at = timezone.now()
+    entry.promote_keys()
+
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is not None:
+        buffer.add(entry)
+        return entry
+
+    try:
+        entry.save()
+        return entry
+    except Exception as e:
+        print(f"Error logging activity: {e}")
+        return None
+
+
+# ==================== MIDDLEWARE ====================
+
+class ActivityLogBufferMiddleware:
+    """Collect a request's activity-log rows and write them once at the end"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'ACTIVITY_LOG_BUFFERED', True):
+            return self.get_response(request)
+
+        start_buffer()
+        try:
+            return self.get_response(request)
+        finally:
+            end_buffer()
@@ -0,0 +1,174 @@
+# activity_partitions.py - Monthly partitions / table rotation for UserActivityLog
+"""
+PostgreSQL: website_useractivitylog is a RANGE (created_at) partitioned table
+(see migration 0022) with one partition per month plus a DEFAULT partition.
+Any query with a created_at range only touches the matching months.
+
+SQLite has no partitioning, so old months are rotated out of the hot table
+into website_useractivitylog_YYYY_MM archive tables with the same columns.
+Readers that need the whole history (exports, timelines) run their query
+against each archive too via with_archives().
+"""
+from datetime import date, datetime, time
+
+from django.db import connection, transaction
+from django.db.models.sql.datastructures import BaseTable
+from django.utils import timezone
+
+PARENT_TABLE = 'website_useractivitylog'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+
+
+# ==================== MONTH HELPERS ====================
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_table(month):
+    return f'{PARENT_TABLE}_{month.year:04d}_{month.month:02d}'
+
+
+def month_bounds(month):
+    """Aware datetimes [start, end) for a month in the site timezone"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(month, time.min), tz)
+    end = timezone.make_aware(datetime.combine(add_months(month, 1), time.min), tz)
+    return start, end
+
+
+# ==================== POSTGRESQL ====================
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s",
+            [PARENT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def create_month_partition(cursor, month):
+    """CREATE TABLE ... PARTITION OF for one month (no-op if it exists)"""
+    start, end = month_bounds(month)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{month_table(month)}" PARTITION OF "{PARENT_TABLE}" '
+        f'FOR VALUES FROM (%s) TO (%s)',
+        [start, end],
+    )
+
+
+def ensure_partitions(months_ahead=3, first_month=None):
+    """Create monthly partitions from first_month (default: this month) to months_ahead out"""
+    month = month_start(first_month or timezone.localdate())
+    last = add_months(month_start(timezone.localdate()), months_ahead)
+    created = []
+    with connection.cursor() as cursor:
+        while month <= last:
+            create_month_partition(cursor, month)
+            created.append(month_table(month))
+            month = add_months(month, 1)
+    return created
+
+
+# ==================== SQLITE ROTATION ====================
+
+def archive_tables():
+    """Existing website_useractivitylog_YYYY_MM tables, oldest first"""
+    prefix = f'{PARENT_TABLE}_'
+    return sorted(
+        name for name in connection.introspection.table_names()
+        if name.startswith(prefix) and name[len(prefix):].replace('_', '').isdigit()
+    )
+
+
+def add_missing_columns(cursor, table):
+    """
+    ALTER an archive made before a migration added columns to the live table,
+    so queries built for the live table run against it (old rows read NULL).
+    """
+    introspection = connection.introspection
+    archived = {column.name for column in introspection.get_table_description(cursor, table)}
+    for column in introspection.get_table_description(cursor, PARENT_TABLE):
+        if column.name not in archived:
+            cursor.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column.name}" {column.type_code} NULL')
+
+
+def rotate_month(month):
+    """Move one month of rows out of the hot table into its archive table"""
+    from .models import UserActivityLog
+
+    start, end = month_bounds(month)
+    rows = UserActivityLog.objects.filter(created_at__gte=start, created_at__lt=end)
+    ids_sql, params = rows.values('id').query.sql_with_params()
+    table = month_table(month)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS "{table}" AS SELECT * FROM "{PARENT_TABLE}" WHERE 0')
+        add_missing_columns(cursor, table)
+        columns = ', '.join(
+            f'"{column.name}"' for column in connection.introspection.get_table_description(cursor, PARENT_TABLE)
+        )
+        cursor.execute(
+            f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{PARENT_TABLE}" WHERE id IN ({ids_sql})',
+            params,
+        )
+        moved = cursor.rowcount
+        rows._raw_delete(rows.db)
+    return moved
+
+
+def rotate_before(cutoff_month):
+    """Rotate every month older than cutoff_month; returns {table: rows moved}"""
+    from .models import UserActivityLog
+
+    oldest = UserActivityLog.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if not oldest:
+        return {}
+
+    moved = {}
+    month = month_start(timezone.localtime(oldest).date())
+    while month < cutoff_month:
+        count = rotate_month(month)
+        if count:
+            moved[month_table(month)] = count
+        month = add_months(month, 1)
+    return moved
+
+
+def on_table(queryset, table):
+    """queryset compiled against another table with the same columns (an archive)"""
+    queryset = queryset.all()
+    alias = queryset.query.get_initial_alias()
+    # Columns stay qualified by the alias, so filters and joins work unchanged
+    queryset.query.alias_map[alias] = BaseTable(table, alias)
+    return queryset
+
+
+def with_archives(queryset, newest_first=False):
+    """
+    [queryset] followed (SQLite only) by the same query on each archive table.
+    Rotated months are older than anything left in the live table, so reading
+    the querysets in turn reads the whole history in order: archives first,
+    oldest month first - or, newest_first, the live table and then each
+    archive newest first, so an archive is only queried once the rows
+    before it run out.
+    """
+    if connection.vendor != 'sqlite' or queryset.model._meta.db_table != PARENT_TABLE:
+        return [queryset]
+    tables = archive_tables()
+    with connection.cursor() as cursor:
+        for table in tables:
+            add_missing_columns(cursor, table)
+    archives = [on_table(queryset, table) for table in tables]
+    if newest_first:
+        return [queryset, *reversed(archives)]
+    return [*archives, queryset]
@@ -3,23 +3,34 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from django.utils.html import format_html
-from django.urls import reverse
-from django.db.models import Count, Q
+from django.urls import reverse, path
+from django.db.models import Count, Q, Exists, OuterRef, Subquery, Func, F, IntegerField, Max
 from django.utils import timezone
 from django.contrib import messages
-from django.http import HttpResponse
-from django.core import serializers
-from django.shortcuts import render
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
+from django.template.response import TemplateResponse
+from django.forms.models import BaseInlineFormSet
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.admin.views.decorators import staff_member_required
 import json
+from datetime import timedelta
 
 from allauth.account.models import EmailAddress
 
 from .models import (
     BlogPost, UserProfile, TrustIndicator, LegalConsent, ProfileEditRequest,
     UserLike, UserFavorite, UserBlock, DateEvent, DateView, Conversation, 
-    Message, UserActivityLog, UserProfileImage, PrivateAccessRequest, PrivateImage
+    Message, UserActivityLog, UserProfileImage, PrivateAccessRequest, PrivateImage, QueuedEmail,
+    SiteDailyStats, DataExport
 )
+from .recommendations import queue_refresh_many
+from .rollups import activity_totals, site_stats_series
+from .exports import activity_log_export, keyset_rows, with_usernames, streaming_export, FORMATS
+from .paginators import EstimatedCountPaginator
+from .data_exports import request_export
+from .timelines import activity_timeline, pair_timeline, pair_timeline_entries, PAIR_COLUMNS
 
 # ==================== ADMIN CONFIGURATION ====================
 
@@ -27,6 +38,102 @@ admin.site.site_header = "Synergy Dating Admin - LEGAL COMPLIANCE MODE"
 admin.site.site_title = "Synergy Admin Portal"
 admin.site.index_title = "Administration Dashboard - All Data Monitored"
 
+# ==================== CHANGELIST QUERY HELPERS ====================
+
+def count_of(queryset):
+    """Correlated COUNT(*) for annotate() - counted inside the page query, not once per row"""
+    return Subquery(
+        queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count'),
+        output_field=IntegerField(),
+    )
+
+class PageDataMixin:
+    """
+    Runs load_page_data() once on the objects of the changelist page, after
+    it's fetched, so per-row extras can come from one batched query.
+    """
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        # Evaluates the page queryset; the template reuses the same objects
+        self.load_page_data(request, list(changelist.result_list))
+        return changelist
+    
+    def load_page_data(self, request, objects):
+        pass
+
+class TargetUserMixin(PageDataMixin):
+    """
+    For tables that point at a second user by bare id (liked_user_id...):
+    every target on the page is resolved with one in_bulk query.
+    """
+    target_field = None
+    
+    def load_page_data(self, request, objects):
+        super().load_page_data(request, objects)
+        ids = {getattr(obj, self.target_field) for obj in objects} - {None}
+        users = User.objects.select_related('profile').only(
+            'id', 'username', 'profile__profile_name'
+        ).in_bulk(ids)
+        for obj in objects:
+            obj.target_user_obj = users.get(getattr(obj, self.target_field))
+    
+    def target_link(self, obj):
+        target_id = getattr(obj, self.target_field)
+        if target_id is None:
+            return '-'
+        if hasattr(obj, 'target_user_obj'):
+            user = obj.target_user_obj
+        else:
+            user = User.objects.select_related('profile').filter(id=target_id).first()
+        if user is None:
+            return f"User ID: {target_id}"
+        
+        url = reverse('admin:auth_user_change', args=[user.id])
+        try:
+            profile_name = user.profile.profile_name
+        except UserProfile.DoesNotExist:
+            profile_name = None
+        if profile_name:
+            return format_html('<a href="{}">{}</a> ({})', url, user.username, profile_name)
+        return format_html('<a href="{}">{}</a>', url, user.username)
+
+class StreamingExportMixin:
+    """
+    CSV exports streamed in constant memory (website/exports.py).
+    Subclasses give export_columns [(header, row key)]; the keys are read in
+    keyset batches on export_order unless export_rows(queryset) is overridden.
+    """
+    export_filename = 'export'
+    export_columns = []
+    export_order = ('created_at', 'id')
+    
+    def export_rows(self, queryset):
+        keys = [key for header, key in self.export_columns]
+        # A bare target user id (TargetUserMixin) gets its username in chunks, not by a join
+        target_field = getattr(self, 'target_field', None)
+        target_username = f"{target_field[:-len('_id')]}__username" if target_field else None
+        if target_username not in keys:
+            return keyset_rows(queryset, keys, order=self.export_order)
+        rows = keyset_rows(queryset, [key for key in keys if key != target_username], order=self.export_order)
+        return with_usernames(rows, target_field, target_username)
+    
+    def stream_export(self, queryset, compress=False):
+        return streaming_export(
+            self.export_rows(queryset),
+            [key for header, key in self.export_columns],
+            f"{self.export_filename}_{timezone.now():%Y%m%d_%H%M%S}",
+            compress=compress,
+            headers=[header for header, key in self.export_columns],
+        )
+    
+    @admin.action(description="Export selected to CSV")
+    def export_csv(self, request, queryset):
+        return self.stream_export(queryset)
+    
+    @admin.action(description="Export selected to CSV (gzipped)")
+    def export_csv_gz(self, request, queryset):
+        return self.stream_export(queryset, compress=True)
+
 # ==================== INLINE ADMIN CLASSES ====================
 
 class UserProfileInline(admin.StackedInline):
@@ -42,44 +149,102 @@ class UserProfileInline(admin.StackedInline):
         return obj.display_age() if hasattr(obj, 'display_age') and callable(obj.display_age) else 'N/A'
     display_age.short_description = 'Age'
 
-class UserActivityLogInline(admin.TabularInline):
-    model = UserActivityLog
+class RecentWindowFormSet(BaseInlineFormSet):
+    """Inline formset that loads only the newest `window` rows (set by RecentWindowInline)"""
+    window = 10
+    
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            # Slice after the parent's fk filter - slicing in the inline's get_queryset breaks it
+            self._queryset = super().get_queryset()[:self.window]
+        return self._queryset
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        # Row titles (__str__) read the parent through the fk - hand it over instead of a query per row
+        setattr(form.instance, self.fk.name, self.instance)
+        return form
+
+class RecentWindowInline(admin.TabularInline):
+    """
+    Read-only inline showing a fixed, most-recent window of rows via an
+    indexed (fk, created_at) query, titled with a link to the full list
+    when view_all_url() gives one.
+    """
+    formset = RecentWindowFormSet
+    window = 10
+    title = ''
+    ordering = ['-created_at']
     extra = 0
     can_delete = False
-    readonly_fields = ['activity_type', 'target_user', 'ip_address', 'user_agent', 'created_at']
+    
+    def view_all_url(self, obj):
+        """URL of every row for obj, or None for a title without a link"""
+        return None
+    
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.window = self.window
+        if obj is not None:
+            # Inline instances are built per request, so this is safe to set here
+            url = self.view_all_url(obj)
+            if url:
+                self.verbose_name_plural = format_html(
+                    '{} (latest {}) &middot; <a href="{}">view all</a>', self.title, self.window, url,
+                )
+            else:
+                self.verbose_name_plural = format_html('{} (latest {})', self.title, self.window)
+        return formset
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+class UserActivityLogInline(RecentWindowInline):
+    model = UserActivityLog
+    title = 'Recent activity'
+    readonly_fields = ['activity_type', 'target_user', 'ip_address', 'created_at']
     fields = ['activity_type', 'target_user', 'ip_address', 'created_at']
-    max_num = 10
     fk_name = 'user'
+    
+    def view_all_url(self, obj):
+        return reverse('admin:auth_user_timeline', args=[obj.id])
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('target_user')
 
-class UserLikeInline(admin.TabularInline):
+class UserLikeInline(RecentWindowInline):
     model = UserLike
-    extra = 0
-    can_delete = False
-    verbose_name_plural = 'Likes Given'
+    title = 'Likes given'
     fk_name = 'user'
     fields = ['liked_user_id', 'created_at']
     readonly_fields = ['liked_user_id', 'created_at']
+    
+    def view_all_url(self, obj):
+        return reverse('admin:website_userlike_changelist') + f'?user__id__exact={obj.id}'
 
-class MessageInline(admin.TabularInline):
+class MessageInline(RecentWindowInline):
     model = Message
-    extra = 0
-    can_delete = False
-    verbose_name_plural = 'Recent Messages'
-    fields = ['conversation', 'content_preview', 'created_at', 'is_read']
-    readonly_fields = ['conversation', 'content_preview', 'created_at', 'is_read']
+    title = 'Messages sent'
+    fields = ['conversation_link', 'content_preview', 'created_at', 'is_read']
+    readonly_fields = ['conversation_link', 'content_preview', 'created_at', 'is_read']
     fk_name = 'sender'
     
+    def view_all_url(self, obj):
+        return reverse('admin:website_message_changelist') + f'?sender__id__exact={obj.id}'
+    
+    def conversation_link(self, obj):
+        # Conversation.__str__ queries its participants - link by id instead
+        url = reverse('admin:website_conversation_change', args=[obj.conversation_id])
+        return format_html('<a href="{}">Conv #{}</a>', url, obj.conversation_id)
+    conversation_link.short_description = 'Conversation'
+    
     def content_preview(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Message'
-    
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.filter(sender=request.user if request.user.is_authenticated else None)[:5]
 
 # ==================== CUSTOM USER ADMIN ====================
 
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(PageDataMixin, BaseUserAdmin):
     inlines = [UserProfileInline, UserActivityLogInline, UserLikeInline, MessageInline]
     list_display = ['username', 'email', 'get_profile_name', 'date_joined', 
                     'last_login', 'is_active', 'is_staff', 'activity_count', 'message_count']
@@ -88,6 +253,7 @@ class UserAdmin(BaseUserAdmin):
     
     # CRITICAL FIX: actions must be a list, not a method
     actions = ['deactivate_users', 'activate_users', 'export_user_data', 'view_full_activity_logs',
+               'view_pair_timeline', 'export_full_activity_logs', 'queue_data_exports',
                'verify_selected_emails', 'unverify_selected_emails']
     
     fieldsets = (
@@ -98,6 +264,112 @@ class UserAdmin(BaseUserAdmin):
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
     )
     
+    def get_urls(self):
+        return [
+            path('<int:user_id>/timeline/', self.admin_site.admin_view(self.activity_timeline_view),
+                 name='auth_user_timeline'),
+            path('pair-timeline/', self.admin_site.admin_view(self.pair_timeline_view),
+                 name='auth_user_pair_timeline'),
+        ] + super().get_urls()
+    
+    def lookup_user_id(self, value):
+        """User id from an id or a username typed into a filter (0 if there's no such user)"""
+        value = (value or '').strip()
+        if not value:
+            return None
+        if value.isdigit():
+            return int(value)
+        return User.objects.filter(username=value).values_list('id', flat=True).first() or 0
+    
+    def activity_timeline_view(self, request, user_id):
+        """A member's whole activity history, 50 rows a page, loaded as the page scrolls"""
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        member = get_object_or_404(User, pk=user_id)
+        
+        activity_type = request.GET.get('type') or None
+        counterpart = (request.GET.get('counterpart') or '').strip()
+        counterpart_id = self.lookup_user_id(counterpart)
+        
+        entries, next_cursor = activity_timeline(
+            member.id, request.GET.get('cursor'), activity_type, counterpart_id
+        )
+        rows = render_to_string('admin/website/user_timeline_rows.html', {'entries': entries}, request)
+        if request.GET.get('format') == 'json':
+            return JsonResponse({'html': rows, 'next_cursor': next_cursor})
+        
+        return TemplateResponse(request, 'admin/website/user_timeline.html', {
+            **self.admin_site.each_context(request),
+            'title': f'Activity timeline: {member.username}',
+            'opts': self.model._meta,
+            'member': member,
+            'entries': entries,
+            'rows': rows,
+            'next_cursor': next_cursor,
+            'activity_types': UserActivityLog.ACTIVITY_TYPES,
+            'activity_type': activity_type or '',
+            'counterpart': counterpart,
+        })
+    
+    def pair_timeline_view(self, request):
+        """Everything between two members across tables, newest first, with a streamed export"""
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        first = (request.GET.get('a') or '').strip()
+        second = (request.GET.get('b') or '').strip()
+        user_a, user_b = self.lookup_user_id(first), self.lookup_user_id(second)
+        members = User.objects.in_bulk([user_a, user_b]) if user_a and user_b and user_a != user_b else {}
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Interaction timeline',
+            'opts': self.model._meta,
+            'first': first,
+            'second': second,
+            'formats': list(FORMATS),
+        }
+        if len(members) < 2:
+            if first or second:
+                context['error'] = 'Enter two different existing members (id or username).'
+            return TemplateResponse(request, 'admin/website/pair_timeline.html', context)
+        
+        fmt = request.GET.get('format')
+        if fmt in FORMATS:
+            # Chronological and complete - read a batch of range scans at a time
+            filename = f"interactions_{members[user_a].username}_{members[user_b].username}_{timezone.now():%Y%m%d}"
+            return streaming_export(
+                pair_timeline_entries(user_a, user_b), PAIR_COLUMNS, filename, fmt,
+                compress=request.GET.get('gzip') == '1',
+            )
+        
+        entries, next_cursor = pair_timeline(user_a, user_b, request.GET.get('cursor'))
+        rows = render_to_string('admin/website/pair_timeline_rows.html', {'entries': entries}, request)
+        if fmt == 'json':
+            return JsonResponse({'html': rows, 'next_cursor': next_cursor})
+        
+        context.update({
+            'title': f'Interaction timeline: {members[user_a].username} & {members[user_b].username}',
+            'members': [members[user_a], members[user_b]],
+            'entries': entries,
+            'rows': rows,
+            'next_cursor': next_cursor,
+        })
+        return TemplateResponse(request, 'admin/website/pair_timeline.html', context)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('profile').annotate(
+            sent_count=count_of(Message.objects.filter(sender=OuterRef('pk'))),
+            received_count=count_of(
+                Message.objects.filter(conversation__participants=OuterRef('pk')).exclude(sender=OuterRef('pk'))
+            ),
+        )
+    
+    def load_page_data(self, request, objects):
+        # Daily rollups + today's raw rows for the whole page, never the full history
+        totals = activity_totals([user.id for user in objects])
+        for user in objects:
+            user.activity_total = totals[user.id]
+    
     def get_profile_name(self, obj):
         try:
             return obj.profile.profile_name
@@ -108,16 +380,16 @@ class UserAdmin(BaseUserAdmin):
     get_profile_name.short_description = 'Profile Name'
     
     def activity_count(self, obj):
-        count = UserActivityLog.objects.filter(user=obj).count()
-        url = reverse('admin:website_useractivitylog_changelist') + f'?user__id__exact={obj.id}'
+        count = getattr(obj, 'activity_total', None)
+        if count is None:
+            count = activity_totals([obj.id])[obj.id]
+        url = reverse('admin:website_useractivitylog_changelist') + f'?involving={obj.id}'
         return format_html('<a href="{}">{}</a>', url, count)
     activity_count.short_description = 'Activities'
     
     def message_count(self, obj):
-        sent = Message.objects.filter(sender=obj).count()
-        received = Message.objects.filter(conversation__participants=obj).exclude(sender=obj).count()
-        url = reverse('admin:website_message_changelist') + f'?conversation__participants__id__exact={obj.id}'
-        return format_html('<a href="{}">S:{} | R:{}</a>', url, sent, received)
+        url = reverse('admin:website_message_changelist') + f'?participant={obj.id}'
+        return format_html('<a href="{}">S:{} | R:{}</a>', url, obj.sent_count, obj.received_count)
     message_count.short_description = 'Messages'
     
     # Admin actions - must use @admin.action decorator
@@ -131,25 +403,49 @@ class UserAdmin(BaseUserAdmin):
         updated = queryset.update(is_active=True)
         self.message_user(request, f"{updated} user(s) activated.", messages.SUCCESS)
     
-    @admin.action(description="Export user data (JSON)")
+    @admin.action(description="Export user data (NDJSON, streamed)")
     def export_user_data(self, request, queryset):
-        data = serializers.serialize('json', queryset, 
-                                    fields=('username', 'email', 'first_name', 'last_name', 'date_joined'))
-        response = HttpResponse(data, content_type='application/json')
-        response['Content-Disposition'] = 'attachment; filename="user_data.json"'
-        return response
+        # One JSON object per line, written as it's read - any selection size
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'date_joined']
+        rows = keyset_rows(queryset, fields, order=('date_joined', 'id'))
+        return streaming_export(rows, fields, f"user_data_{timezone.now():%Y%m%d_%H%M%S}", fmt='ndjson')
     
     @admin.action(description="View full activity logs")
     def view_full_activity_logs(self, request, queryset):
+        if queryset.count() == 1:
+            # One member: the full, scrollable timeline
+            return redirect('admin:auth_user_timeline', queryset.get().id)
+        
         user_ids = queryset.values_list('id', flat=True)
-        logs = UserActivityLog.objects.filter(user_id__in=user_ids).order_by('-created_at')[:100]
+        logs = UserActivityLog.objects.involving(user_ids).order_by('-created_at')[:100]
         
-        return render(request, 'admin/website/user_activity_report.html', {
+        return render(request, 'website/admin/user_activity_report.html', {
             'logs': logs,
             'users': queryset,
             'title': 'User Activity Report'
         })
     
+    @admin.action(description="Queue complete data exports (GDPR archive)")
+    def queue_data_exports(self, request, queryset):
+        for user in queryset:
+            request_export(user, requested_by=request.user)
+        self.message_user(request, f"Data export queued for {queryset.count()} user(s); "
+                                   f"you will be emailed a link to each archive", messages.SUCCESS)
+    
+    @admin.action(description="Interaction timeline between two selected users")
+    def view_pair_timeline(self, request, queryset):
+        user_ids = list(queryset.values_list('id', flat=True)[:3])
+        if len(user_ids) != 2:
+            self.message_user(request, "Select exactly two users", level=messages.WARNING)
+            return None
+        return redirect(reverse('admin:auth_user_pair_timeline') + f'?a={user_ids[0]}&b={user_ids[1]}')
+    
+    @admin.action(description="Export full activity logs (CSV, streamed)")
+    def export_full_activity_logs(self, request, queryset):
+        # Every row, not the report's 100 - streamed so size doesn't matter
+        logs = UserActivityLog.objects.involving(queryset.values('id'))
+        return activity_log_export(logs, f"activity_logs_{timezone.now():%Y%m%d_%H%M%S}")
+    
     @admin.action(description="Verify email for selected users")
     def verify_selected_emails(self, request, queryset):
         verified_count = 0
@@ -219,17 +515,59 @@ class BaseModelAdmin(admin.ModelAdmin):
 
 # ==================== MESSAGE ADMIN (CRITICAL FOR LEGAL COMPLIANCE) ====================
 
+class SelectedIdFilter(admin.SimpleListFilter):
+    """
+    Filter by one id taken from the URL (links from other admin pages).
+    Only the selected value is listed - a full related-object list would
+    load every conversation / user into the sidebar.
+    """
+    lookup = None
+    
+    def label_for(self, value):
+        return value
+    
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if value and value.isdigit():
+            return [(value, self.label_for(value))]
+        return []
+    
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(**{self.lookup: int(value)})
+        return queryset
+
+class MessageConversationFilter(SelectedIdFilter):
+    title = 'conversation'
+    parameter_name = 'conversation__id__exact'
+    lookup = 'conversation_id'
+    
+    def label_for(self, value):
+        return f"Conversation #{value}"
+
+class MessageParticipantFilter(SelectedIdFilter):
+    title = 'participant'
+    parameter_name = 'participant'
+    lookup = 'conversation__participants__id'
+    
+    def label_for(self, value):
+        return User.objects.filter(id=value).values_list('username', flat=True).first() or f"User ID: {value}"
+
 @admin.register(Message)
 class MessageAdmin(BaseModelAdmin):
     list_display = ['id', 'conversation_link', 'sender_link', 'receiver_link', 
-                    'content_preview', 'is_read', 'deleted_status', 'created_at']
+                    'content_preview', 'is_read', 'deleted_status', 'created_at', 'activity_link']
     list_filter = ['is_read', 'is_deleted_for_sender', 'is_deleted_for_receiver', 
-                   'created_at', 'conversation']
+                   'created_at', MessageConversationFilter, MessageParticipantFilter]
     search_fields = ['content', 'sender__username', 'sender__profile__profile_name']
     readonly_fields = ['conversation', 'sender', 'content', 'is_deleted_for_sender', 
                       'is_deleted_for_receiver', 'deleted_at', 'deleted_by', 'created_at']
     date_hierarchy = 'created_at'
     list_per_page = 50
+    # Estimated counts once the table is huge; no second unfiltered COUNT(*)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Message Content (LEGALLY RETAINED)', {
@@ -256,10 +594,9 @@ class MessageAdmin(BaseModelAdmin):
     sender_link.short_description = 'Sender'
     
     def receiver_link(self, obj):
-        receiver = obj.conversation.participants.exclude(id=obj.sender.id).first()
-        if receiver:
-            url = reverse('admin:auth_user_change', args=[receiver.id])
-            return format_html('<a href="{}">{}</a>', url, receiver.username)
+        if obj.receiver_id:
+            url = reverse('admin:auth_user_change', args=[obj.receiver_id])
+            return format_html('<a href="{}">{}</a>', url, obj.receiver_username)
         return '-'
     receiver_link.short_description = 'Receiver'
     
@@ -277,8 +614,20 @@ class MessageAdmin(BaseModelAdmin):
         return format_html('<span style="color: #27ae60;">Active</span>')
     deleted_status.short_description = 'Deletion Status'
     
+    def activity_link(self, obj):
+        url = reverse('admin:website_useractivitylog_changelist') + f'?message_id={obj.id}'
+        return format_html('<a href="{}">Log</a>', url)
+    activity_link.short_description = 'Activity'
+    
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('sender', 'conversation')
+        # The other participant, read in the same query as the message
+        receivers = Conversation.participants.through.objects.filter(
+            conversation_id=OuterRef('conversation_id')
+        ).exclude(user_id=OuterRef('sender_id'))
+        return super().get_queryset(request).select_related('sender', 'conversation').annotate(
+            receiver_id=Subquery(receivers.values('user_id')[:1]),
+            receiver_username=Subquery(receivers.values('user__username')[:1]),
+        )
     
     def has_delete_permission(self, request, obj=None):
         return False
@@ -296,15 +645,19 @@ class ConversationAdmin(BaseModelAdmin):
     search_fields = ['participants__username', 'participants__profile__profile_name']
     filter_horizontal = ['participants']
     readonly_fields = ['created_at', 'updated_at', 'participants_list_display']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     def participants_list(self, obj):
+        # Reads the prefetched list - no query per conversation
+        participants = list(obj.participants.all())
         users = []
-        for p in obj.participants.all()[:3]:
+        for p in participants[:3]:
             url = reverse('admin:auth_user_change', args=[p.id])
             users.append(format_html('<a href="{}">{}</a>', url, p.username))
         
-        if obj.participants.count() > 3:
-            users.append(f"...(+{obj.participants.count() - 3})")
+        if len(participants) > 3:
+            users.append(f"...(+{len(participants) - 3})")
             
         return format_html(', '.join(users))
     participants_list.short_description = 'Participants'
@@ -314,44 +667,73 @@ class ConversationAdmin(BaseModelAdmin):
     participants_list_display.short_description = 'Participants'
     
     def message_count(self, obj):
-        count = obj.messages.count()
         url = reverse('admin:website_message_changelist') + f'?conversation__id__exact={obj.id}'
-        return format_html('<a href="{}">{}</a>', url, count)
+        return format_html('<a href="{}">{}</a>', url, obj.message_total)
     message_count.short_description = 'Messages'
+    message_count.admin_order_field = 'message_total'
     
     def last_message_time(self, obj):
-        last_msg = obj.messages.order_by('-created_at').first()
-        return last_msg.created_at if last_msg else '-'
+        return obj.last_message_at or '-'
     last_message_time.short_description = 'Last Message'
+    last_message_time.admin_order_field = 'last_message_at'
     
     def view_messages_link(self, obj):
         url = reverse('admin:website_message_changelist') + f'?conversation__id__exact={obj.id}'
-        return format_html('<a href="{}" class="button">View Messages</a>', url)
+        activity_url = reverse('admin:website_useractivitylog_changelist') + f'?conversation_id={obj.id}'
+        return format_html('<a href="{}" class="button">View Messages</a> '
+                           '<a href="{}" class="button">Activity Log</a>', url, activity_url)
     view_messages_link.short_description = 'Actions'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('participants')
+        messages_in = Message.objects.filter(conversation=OuterRef('pk'))
+        return super().get_queryset(request).prefetch_related('participants').annotate(
+            message_total=count_of(messages_in),
+            last_message_at=Subquery(messages_in.order_by('-created_at').values('created_at')[:1]),
+        )
 
 # ==================== USER ACTIVITY LOG ADMIN (CRITICAL FOR LEGAL COMPLIANCE) ====================
 
+class InvolvingUserFilter(SelectedIdFilter):
+    """?involving=<user id> - the user's own rows plus two-party rows where they are the counterpart"""
+    title = 'involving user'
+    parameter_name = 'involving'
+    
+    def label_for(self, value):
+        return User.objects.filter(id=value).values_list('username', flat=True).first() or f"User ID: {value}"
+    
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.involving([int(value)])
+        return queryset
+
 @admin.register(UserActivityLog)
-class UserActivityLogAdmin(BaseModelAdmin):
+class UserActivityLogAdmin(TargetUserMixin, BaseModelAdmin):
     list_display = ['id', 'user_link', 'activity_type', 'target_user_link', 
                     'ip_address', 'created_at', 'additional_data_preview']
-    list_filter = ['activity_type', 'created_at', 'ip_address']
+    list_filter = [InvolvingUserFilter, 'activity_type', 'created_at', 'ip_address']
     search_fields = ['user__username', 'user__email', 'ip_address', 
-                    'additional_data', 'user_agent']
+                    'additional_data', 'user_agent', 'agent__value']
     readonly_fields = ['user', 'activity_type', 'target_user', 'ip_address', 
-                      'user_agent', 'additional_data_prettified', 'created_at']
+                      'user_agent_display', 'additional_data_prettified', 'created_at',
+                      'message_id', 'conversation_id', 'request_id', 'date_id']
     date_hierarchy = 'created_at'
     list_per_page = 100
+    actions = ['export_logs_csv', 'export_logs_ndjson_gz']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    target_field = 'target_user_id'
     
     fieldsets = (
         ('Activity Information', {
             'fields': ('user', 'activity_type', 'target_user', 'created_at')
         }),
+        ('Related Records', {
+            # Indexed copies of the ids in Additional Data - filter with ?conversation_id=<id> etc.
+            'fields': ('message_id', 'conversation_id', 'request_id', 'date_id'),
+        }),
         ('Technical Details', {
-            'fields': ('ip_address', 'user_agent'),
+            'fields': ('ip_address', 'user_agent_display'),
             'classes': ('collapse',)
         }),
         ('Additional Data', {
@@ -366,10 +748,7 @@ class UserActivityLogAdmin(BaseModelAdmin):
     user_link.short_description = 'User'
     
     def target_user_link(self, obj):
-        if obj.target_user:
-            url = reverse('admin:auth_user_change', args=[obj.target_user.id])
-            return format_html('<a href="{}">{}</a>', url, obj.target_user.username)
-        return '-'
+        return self.target_link(obj)
     target_user_link.short_description = 'Target User'
     
     def additional_data_preview(self, obj):
@@ -393,6 +772,10 @@ class UserActivityLogAdmin(BaseModelAdmin):
         return '-'
     additional_data_prettified.short_description = 'Additional Data (Pretty)'
     
+    def user_agent_display(self, obj):
+        return obj.user_agent_text or '-'
+    user_agent_display.short_description = 'User agent'
+    
     def has_add_permission(self, request):
         return False
     
@@ -400,7 +783,18 @@ class UserActivityLogAdmin(BaseModelAdmin):
         return False
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'target_user')
+        # target_user is resolved per page by TargetUserMixin
+        return super().get_queryset(request).select_related('user', 'agent')
+    
+    # Use "select all N" on a filtered changelist to export the whole filter result
+    @admin.action(description="Export selected logs (CSV, streamed)")
+    def export_logs_csv(self, request, queryset):
+        return activity_log_export(queryset, f"activity_logs_{timezone.now():%Y%m%d_%H%M%S}")
+    
+    @admin.action(description="Export selected logs (NDJSON, gzipped)")
+    def export_logs_ndjson_gz(self, request, queryset):
+        return activity_log_export(queryset, f"activity_logs_{timezone.now():%Y%m%d_%H%M%S}",
+                                   fmt='ndjson', compress=True)
 
 # ==================== PRIVATE ACCESS REQUEST ADMIN ====================
 
@@ -744,25 +1138,27 @@ class ProfileEditRequestAdmin(BaseModelAdmin):
 
     @admin.action(description="Approve selected requests")
     def approve_selected_requests(self, request, queryset):
-        approved_count = 0
-        for edit_request in queryset.filter(status='pending'):
-            if edit_request.approve(request.user, "Approved via admin action"):
-                approved_count += 1
+        pending = queryset.filter(status='pending').select_related('user', 'user__profile')
+        try:
+            approved_count = len(ProfileEditRequest.approve_many(pending, request.user, "Approved via admin action"))
+        except Exception as e:
+            print(f"Error approving profile edit requests: {e}")
+            approved_count = 0
         
         if approved_count > 0:
-            self.message_user(request, f"Successfully approved {approved_count} profile edit request(s)", messages.SUCCESS)
+            self.message_user(request, f"Successfully approved {approved_count} profile edit request(s); "
+                                       f"notification emails are queued", messages.SUCCESS)
         else:
             self.message_user(request, "No requests were approved", level=messages.WARNING)
     
     @admin.action(description="Reject selected requests")
     def reject_selected_requests(self, request, queryset):
-        rejected_count = 0
-        for edit_request in queryset.filter(status='pending'):
-            edit_request.reject(request.user, "Rejected via admin action")
-            rejected_count += 1
+        pending = queryset.filter(status='pending').select_related('user')
+        rejected_count = len(ProfileEditRequest.reject_many(pending, request.user, "Rejected via admin action"))
         
         if rejected_count > 0:
-            self.message_user(request, f"Successfully rejected {rejected_count} profile edit request(s)", messages.SUCCESS)
+            self.message_user(request, f"Successfully rejected {rejected_count} profile edit request(s); "
+                                       f"notification emails are queued", messages.SUCCESS)
         else:
             self.message_user(request, "No requests were rejected", level=messages.WARNING)
     
@@ -870,14 +1266,20 @@ class UserProfileAdmin(BaseModelAdmin):
         ),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').annotate(
+            has_verified_email=Exists(EmailAddress.objects.filter(user_id=OuterRef('user_id'), verified=True))
+        )
+    
     def user_email(self, obj):
         return obj.user.email if obj.user else "No user"
     user_email.short_description = "Email"
 
     def email_verified(self, obj):
-        return EmailAddress.objects.filter(user=obj.user, verified=True).exists()
+        return obj.has_verified_email
     email_verified.boolean = True
     email_verified.short_description = "Email Verified?"
+    email_verified.admin_order_field = 'has_verified_email'
     
     def email_verified_display(self, obj):
         verified = EmailAddress.objects.filter(user=obj.user, verified=True).exists()
@@ -893,7 +1295,13 @@ class UserProfileAdmin(BaseModelAdmin):
     
     @admin.action(description="Approve selected profiles")
     def approve_profiles(self, request, queryset):
+        # Capture the rows first - with "approved: No" filtered, the queryset is empty after the update
+        profiles = list(queryset)
         updated = queryset.update(is_approved=True)
+        for profile in profiles:
+            profile.is_approved = True
+        # Newly approved members join everyone's recommendations on the next refresh_recommendations run
+        queue_refresh_many(profiles)
         self.message_user(request, f"{updated} profile(s) approved.", messages.SUCCESS)
     
     @admin.action(description="Unapprove selected profiles")
@@ -1048,11 +1456,14 @@ class DateEventAdmin(BaseModelAdmin):
     host_link.short_description = 'Host'
     
     def view_count(self, obj):
-        return obj.dateview_set.count()
+        return obj.view_total
     view_count.short_description = 'Views'
+    view_count.admin_order_field = 'view_total'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('host')
+        return super().get_queryset(request).select_related('host').annotate(
+            view_total=count_of(DateView.objects.filter(date_event=OuterRef('pk')))
+        )
     
     @admin.action(description="Cancel selected dates")
     def cancel_selected_dates(self, request, queryset):
@@ -1064,60 +1475,101 @@ class DateEventAdmin(BaseModelAdmin):
         updated = queryset.update(is_cancelled=False)
         self.message_user(request, f"{updated} date(s) uncancelled.", messages.SUCCESS)
 
-# ==================== OTHER MODELS ====================
+# ==================== SITE STATISTICS DASHBOARD ====================
 
-@admin.register(UserLike)
-class UserLikeAdmin(BaseModelAdmin):
-    list_display = ['user_link', 'liked_user_link', 'created_at']
-    list_filter = ['created_at']
-    search_fields = ['user__username', 'liked_user_id']
-    readonly_fields = ['created_at']
+@admin.register(SiteDailyStats)
+class SiteDailyStatsAdmin(BaseModelAdmin):
+    """
+    The changelist is a dashboard charting the stats rolled up by
+    rollup_site_stats - a 12-month view reads ~365 rows, never the raw tables.
+    """
+    PERIODS = {
+        '30d': ('Last 30 days', 30, False),
+        '90d': ('Last 90 days', 90, False),
+        '12m': ('Last 12 months', 365, True),
+        '24m': ('Last 24 months', 730, True),
+    }
+    DEFAULT_PERIOD = '12m'
     
-    # Add actions
-    actions = ['export_likes_csv']
+    def has_add_permission(self, request):
+        return False
     
-    def user_link(self, obj):
-        if obj.user:
-            url = reverse('admin:auth_user_change', args=[obj.user.id])
-            return format_html('<a href="{}">{}</a>', url, obj.user.username)
-        return "No user"
-    user_link.short_description = 'User'
+    def has_change_permission(self, request, obj=None):
+        return False
     
-    def liked_user_link(self, obj):
-        try:
-            liked_user = User.objects.get(id=obj.liked_user_id)
-            url = reverse('admin:auth_user_change', args=[liked_user.id])
-            return format_html('<a href="{}">{}</a>', url, liked_user.username)
-        except User.DoesNotExist:
-            return f"User ID: {obj.liked_user_id}"
-    liked_user_link.short_description = 'Liked User'
-    
-    @admin.action(description="Export likes to CSV")
-    def export_likes_csv(self, request, queryset):
-        import csv
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="likes_export.csv"'
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        
+        period = request.GET.get('period')
+        if period not in self.PERIODS:
+            period = self.DEFAULT_PERIOD
+        label, days, by_month = self.PERIODS[period]
         
-        writer = csv.writer(response)
-        writer.writerow(['User', 'Liked User', 'Created At'])
+        until = timezone.localdate()
+        since = until - timedelta(days=days - 1)
+        if by_month:
+            since = since.replace(day=1)
+        series = site_stats_series(since, until, by_month)
         
-        for like in queryset:
-            writer.writerow([
-                like.user.username if like.user else f"User ID: {like.user_id}",
-                like.liked_user_id,
-                like.created_at
-            ])
+        charts = []
+        for metric in SiteDailyStats.METRICS:
+            values = [row[metric] or 0 for row in series]
+            peak = max(values, default=0)
+            charts.append({
+                'label': SiteDailyStats._meta.get_field(metric).verbose_name,
+                'total': sum(values),
+                'peak': peak,
+                'bars': [
+                    {'period': row['period'], 'count': value, 'height': round(100 * value / peak) if peak else 0}
+                    for row, value in zip(series, values)
+                ],
+            })
         
-        return response
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f'Site statistics - {label}',
+            'opts': self.model._meta,
+            'periods': [(key, name) for key, (name, _, _) in self.PERIODS.items()],
+            'period': period,
+            'by_month': by_month,
+            'charts': charts,
+            'last_updated': SiteDailyStats.objects.aggregate(last=Max('updated_at'))['last'],
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/website/sitedailystats/dashboard.html', context)
 
-@admin.register(UserFavorite)
-class UserFavoriteAdmin(BaseModelAdmin):
-    list_display = ['user_link', 'favorite_user_link', 'created_at']
+# ==================== OTHER MODELS ====================
+
+class TargetUserAdmin(StreamingExportMixin, TargetUserMixin, BaseModelAdmin):
+    """Likes, favorites and blocks: a user, a second user by bare id (target_field) and created_at"""
+    target_label = 'Target User'
+    list_display = ['user_link', 'target_user_link', 'created_at']
+    list_select_related = ['user']
     list_filter = ['created_at']
     readonly_fields = ['created_at']
     
     # Add actions
-    actions = ['export_favorites_csv']
+    actions = ['export_csv', 'export_csv_gz']
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.export_columns = [
+            ('User', 'user__username'),
+            ('User ID', 'user_id'),
+            (cls.target_label, f"{cls.target_field[:-len('_id')]}__username"),
+            (f'{cls.target_label} ID', cls.target_field),
+            ('Created At', 'created_at'),
+        ]
+        
+        # Column header per table ("Liked User"...)
+        def target_user_link(self, obj):
+            return self.target_link(obj)
+        target_user_link.short_description = cls.target_label
+        cls.target_user_link = target_user_link
     
     def user_link(self, obj):
         if obj.user:
@@ -1125,84 +1577,41 @@ class UserFavoriteAdmin(BaseModelAdmin):
             return format_html('<a href="{}">{}</a>', url, obj.user.username)
         return "No user"
     user_link.short_description = 'User'
-    
-    def favorite_user_link(self, obj):
-        try:
-            favorite_user = User.objects.get(id=obj.favorite_user_id)
-            url = reverse('admin:auth_user_change', args=[favorite_user.id])
-            return format_html('<a href="{}">{}</a>', url, favorite_user.username)
-        except User.DoesNotExist:
-            return f"User ID: {obj.favorite_user_id}"
-    favorite_user_link.short_description = 'Favorite User'
-    
-    @admin.action(description="Export favorites to CSV")
-    def export_favorites_csv(self, request, queryset):
-        import csv
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="favorites_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['User', 'Favorite User', 'Created At'])
-        
-        for favorite in queryset:
-            writer.writerow([
-                favorite.user.username if favorite.user else f"User ID: {favorite.user_id}",
-                favorite.favorite_user_id,
-                favorite.created_at
-            ])
-        
-        return response
+
+@admin.register(UserLike)
+class UserLikeAdmin(TargetUserAdmin):
+    target_field = 'liked_user_id'
+    target_label = 'Liked User'
+    search_fields = ['user__username', 'liked_user_id']
+    export_filename = 'likes_export'
+
+@admin.register(UserFavorite)
+class UserFavoriteAdmin(TargetUserAdmin):
+    target_field = 'favorite_user_id'
+    target_label = 'Favorite User'
+    export_filename = 'favorites_export'
 
 @admin.register(UserBlock)
-class UserBlockAdmin(BaseModelAdmin):
-    list_display = ['user_link', 'blocked_user_link', 'created_at']
-    list_filter = ['created_at']
-    readonly_fields = ['created_at']
-    
-    # Add actions
-    actions = ['export_blocks_csv']
-    
-    def user_link(self, obj):
-        if obj.user:
-            url = reverse('admin:auth_user_change', args=[obj.user.id])
-            return format_html('<a href="{}">{}</a>', url, obj.user.username)
-        return "No user"
-    user_link.short_description = 'User'
-    
-    def blocked_user_link(self, obj):
-        try:
-            blocked_user = User.objects.get(id=obj.blocked_user_id)
-            url = reverse('admin:auth_user_change', args=[blocked_user.id])
-            return format_html('<a href="{}">{}</a>', url, blocked_user.username)
-        except User.DoesNotExist:
-            return f"User ID: {obj.blocked_user_id}"
-    blocked_user_link.short_description = 'Blocked User'
-    
-    @admin.action(description="Export blocks to CSV")
-    def export_blocks_csv(self, request, queryset):
-        import csv
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="blocks_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['User', 'Blocked User', 'Created At'])
-        
-        for block in queryset:
-            writer.writerow([
-                block.user.username if block.user else f"User ID: {block.user_id}",
-                block.blocked_user_id,
-                block.created_at
-            ])
-        
-        return response
+class UserBlockAdmin(TargetUserAdmin):
+    target_field = 'blocked_user_id'
+    target_label = 'Blocked User'
+    export_filename = 'blocks_export'
 
 @admin.register(DateView)
-class DateViewAdmin(BaseModelAdmin):
+class DateViewAdmin(StreamingExportMixin, BaseModelAdmin):
     list_display = ['user_link', 'date_event_link', 'viewed_at']
     list_filter = ['viewed_at']
     
     # Add actions
-    actions = ['export_views_csv']
+    actions = ['export_csv', 'export_csv_gz']
+    list_select_related = ['user', 'date_event']
+    export_filename = 'date_views_export'
+    export_columns = [
+        ('User', 'user__username'),
+        ('Date Event', 'date_event__title'),
+        ('Viewed At', 'viewed_at'),
+    ]
+    export_order = ('viewed_at', 'id')
     
     def user_link(self, obj):
         if obj.user:
@@ -1216,24 +1625,6 @@ class DateViewAdmin(BaseModelAdmin):
             url = reverse('admin:website_dateevent_change', args=[obj.date_event.id])
             return format_html('<a href="{}">{}</a>', url, obj.date_event.title)
         return "No event"
-    
-    @admin.action(description="Export date views to CSV")
-    def export_views_csv(self, request, queryset):
-        import csv
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="date_views_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['User', 'Date Event', 'Viewed At'])
-        
-        for view in queryset:
-            writer.writerow([
-                view.user.username if view.user else f"User ID: {view.user_id}",
-                view.date_event.title if view.date_event else f"Event ID: {view.date_event_id}",
-                view.viewed_at
-            ])
-        
-        return response
 
 @admin.register(TrustIndicator)
 class TrustIndicatorAdmin(BaseModelAdmin):
@@ -1255,6 +1646,50 @@ class TrustIndicatorAdmin(BaseModelAdmin):
         updated = queryset.update(is_active=False)
         self.message_user(request, f"{updated} indicator(s) deactivated.", messages.SUCCESS)
 
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(BaseModelAdmin):
+    list_display = ("to_email", "subject", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("to_email", "subject")
+    readonly_fields = ("to_email", "subject", "body", "html_body", "attempts", "last_error", "created_at", "sent_at")
+    
+    # Add actions
+    actions = ['retry_emails']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description="Retry selected emails")
+    def retry_emails(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', attempts=0, last_error='')
+        self.message_user(request, f"{updated} email(s) queued again.", messages.SUCCESS)
+
+@admin.register(DataExport)
+class DataExportAdmin(BaseModelAdmin):
+    list_display = ("user", "requested_by", "status", "size", "created_at", "completed_at", "download_link")
+    list_filter = ("status",)
+    list_select_related = ("user", "requested_by")
+    search_fields = ("user__username", "user__email")
+    readonly_fields = ("user", "requested_by", "status", "file", "size", "row_counts", "error",
+                       "created_at", "started_at", "completed_at")
+    
+    # Add actions
+    actions = ['rebuild_exports']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def download_link(self, obj):
+        if obj.status != 'ready':
+            return "-"
+        return format_html('<a href="{}">Download</a>', obj.get_absolute_url())
+    download_link.short_description = 'Archive'
+    
+    @admin.action(description="Build selected exports again")
+    def rebuild_exports(self, request, queryset):
+        updated = queryset.exclude(status='running').update(status='pending', error='')
+        self.message_user(request, f"{updated} export(s) queued again.", messages.SUCCESS)
+
 @admin.register(LegalConsent)
 class LegalConsentAdmin(BaseModelAdmin):
     list_display = (
@@ -0,0 +1,202 @@
+# data_exports.py - Complete GDPR data exports, built outside the request into a zip on storage
+"""
+request_export() records a DataExport; `process_data_exports` (cron, or
+--loop as a worker) builds it. Every section is read in keyset batches
+(exports.keyset_rows) and written as NDJSON straight into a deflated zip
+in a temporary file, which is then uploaded to the default storage - no
+section is capped and memory stays flat however heavy the member. When
+the archive is ready, whoever asked for it is emailed a download link
+(through mail_queue); the link works for the member and for staff only.
+"""
+import json
+import secrets
+import tempfile
+import zipfile
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .activity_partitions import with_archives
+from .exports import keyset_rows, with_usernames, buffered
+from .mail_queue import queue_email
+from .models import (
+    DataExport, UserProfile, Message, UserLike, UserFavorite, UserBlock,
+    PrivateAccessRequest, UserActivityLog
+)
+
+EXPORT_TTL_DAYS = 7
+# A running export older than this is assumed lost with its worker and claimed again
+EXPORT_TIMEOUT_MINUTES = 60
+
+USER_FIELDS = ['id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'last_login', 'is_active']
+
+
+# ==================== REQUESTING ====================
+
+def request_export(user, requested_by=None):
+    """The member's export already in the queue, or a new one"""
+    with transaction.atomic():
+        queued = DataExport.objects.select_for_update().filter(
+            user=user, status__in=['pending', 'running']
+        ).first()
+        if queued:
+            return queued
+        return DataExport.objects.create(user=user, requested_by=requested_by or user)
+
+
+# ==================== SECTIONS ====================
+
+def export_sections(user):
+    """[(file name, rows)] - every section of a member's data, each a lazy row iterator"""
+    user_id = user.id
+    profile_fields = [field.attname for field in UserProfile._meta.concrete_fields]
+    return [
+        ('account.ndjson', [{field: getattr(user, field) for field in USER_FIELDS}]),
+        ('profile.ndjson', UserProfile.objects.filter(user_id=user_id).values(*profile_fields)),
+        ('messages_sent.ndjson', keyset_rows(
+            Message.objects.filter(sender_id=user_id),
+            ['id', 'conversation_id', 'content', 'is_read', 'is_deleted_for_sender', 'created_at'],
+        )),
+        ('messages_received.ndjson', keyset_rows(
+            Message.objects.filter(conversation__participants=user_id).exclude(sender_id=user_id),
+            ['id', 'conversation_id', 'sender_id', 'sender__username', 'content', 'is_read',
+             'is_deleted_for_receiver', 'created_at'],
+        )),
+        ('likes_given.ndjson', with_usernames(
+            keyset_rows(UserLike.objects.filter(user_id=user_id), ['liked_user_id', 'created_at']),
+            'liked_user_id', 'liked_username',
+        )),
+        ('likes_received.ndjson', keyset_rows(
+            UserLike.objects.filter(liked_user_id=user_id), ['user_id', 'user__username', 'created_at'],
+        )),
+        ('favorites.ndjson', with_usernames(
+            keyset_rows(UserFavorite.objects.filter(user_id=user_id), ['favorite_user_id', 'created_at']),
+            'favorite_user_id', 'favorite_username',
+        )),
+        ('blocks.ndjson', with_usernames(
+            keyset_rows(UserBlock.objects.filter(user_id=user_id), ['blocked_user_id', 'created_at']),
+            'blocked_user_id', 'blocked_username',
+        )),
+        ('private_access_requests.ndjson', keyset_rows(
+            PrivateAccessRequest.objects.filter(Q(requester_id=user_id) | Q(target_user_id=user_id)),
+            ['id', 'requester__username', 'target_user__username', 'status', 'message',
+             'created_at', 'granted_at', 'denied_at', 'revoked_at'],
+        )),
+        # Includes two-party rows logged once from the other member's side, and rotated months
+        ('activity_logs.ndjson', with_usernames(
+            chain.from_iterable(keyset_rows(
+                logs, ['id', 'seen_type', 'counterpart_id', 'ip_address', 'additional_data', 'created_at'],
+            ) for logs in with_archives(UserActivityLog.objects.as_seen_by(user_id))),
+            'counterpart_id', 'counterpart',
+        )),
+    ]
+
+
+def _lines(rows, counter, name):
+    for row in rows:
+        counter[name] = counter.get(name, 0) + 1
+        yield json.dumps(row, default=str) + '\n'
+
+
+# ==================== BUILDING ====================
+
+def build_archive(export):
+    """Write every section into a zip on storage; fills in file, size and row_counts (unsaved)"""
+    counts = {}
+    with tempfile.TemporaryFile() as archive_file:
+        with zipfile.ZipFile(archive_file, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, rows in export_sections(export.user):
+                section = name.rsplit('.', 1)[0]
+                counts[section] = 0
+                # force_zip64: a section's size isn't known until it has been written
+                with archive.open(name, 'w', force_zip64=True) as member:
+                    for block in buffered(_lines(rows, counts, section)):
+                        member.write(block)
+
+        export.size = archive_file.tell()
+        archive_file.seek(0)
+        # Random name - media storage may be publicly readable by path
+        filename = f"{export.user_id}-{secrets.token_hex(16)}.zip"
+        export.file.save(filename, File(archive_file), save=False)
+    export.row_counts = counts
+
+
+def run_export(export):
+    """Build one claimed export and notify the requester; never raises"""
+    previous_file = export.file.name
+    try:
+        build_archive(export)
+        export.status = 'ready'
+        export.error = ''
+    except Exception as e:
+        print(f"Error building data export {export.id}: {e}")
+        export.status = 'failed'
+        export.error = str(e)[:1000]
+    export.completed_at = timezone.now()
+    export.save()
+
+    # A rebuild replaces the archive - don't leave the old one behind on storage
+    if previous_file and previous_file != export.file.name:
+        try:
+            export.file.storage.delete(previous_file)
+        except Exception as e:
+            print(f"Error deleting data export file {previous_file}: {e}")
+
+    if export.status == 'ready':
+        recipient = export.requested_by or export.user
+        if recipient.email:
+            queue_email(recipient.email, 'Your data export is ready', 'emails/data_export_ready.html', {
+                'user': recipient,
+                'export': export,
+                'download_url': settings.SITE_URL.rstrip('/') + reverse('download_data_export', args=[export.id]),
+                'expires_days': getattr(settings, 'DATA_EXPORT_TTL_DAYS', EXPORT_TTL_DAYS),
+            })
+    return export
+
+
+def claim_pending(limit=1):
+    """
+    Mark up to limit pending exports as running (SKIP LOCKED, so workers never
+    share one). Exports left running past the timeout - their worker died -
+    go back to pending first.
+    """
+    timeout = getattr(settings, 'DATA_EXPORT_TIMEOUT_MINUTES', EXPORT_TIMEOUT_MINUTES)
+    with transaction.atomic():
+        DataExport.objects.filter(
+            status='running', started_at__lt=timezone.now() - timedelta(minutes=timeout)
+        ).update(status='pending')
+        exports = list(
+            DataExport.objects.select_for_update(skip_locked=True)
+            .filter(status='pending').select_related('user', 'requested_by').order_by('id')[:limit]
+        )
+        now = timezone.now()
+        for export in exports:
+            export.status = 'running'
+            export.started_at = now
+        DataExport.objects.bulk_update(exports, ['status', 'started_at'])
+    return exports
+
+
+def purge_expired(days=None):
+    """Delete archives (file and row) finished more than days ago; returns how many"""
+    days = days if days is not None else getattr(settings, 'DATA_EXPORT_TTL_DAYS', EXPORT_TTL_DAYS)
+    expired = DataExport.objects.filter(
+        status__in=['ready', 'failed'], completed_at__lt=timezone.now() - timedelta(days=days)
+    )
+    purged = 0
+    for export in expired.iterator():
+        if export.file:
+            try:
+                export.file.delete(save=False)
+            except Exception as e:
+                print(f"Error deleting data export file {export.file.name}: {e}")
+                continue
+        export.delete()
+        purged += 1
+    return purged
@@ -144,10 +144,13 @@ def get_all_profile_ids(exclude_id=None):
         print(f"Error getting profile IDs: {e}")
         return []
 
-def get_all_profiles(exclude_id=None):
-    """Get all profiles, optionally excluding one"""
+def get_all_profiles(exclude_id=None, profile_ids=None):
+    """Get all profiles, optionally excluding one or limited to profile_ids (kept in order)"""
     try:
-        profile_ids = get_all_profile_ids(exclude_id)
+        if profile_ids is None:
+            profile_ids = get_all_profile_ids(exclude_id)
+        else:
+            profile_ids = [pid for pid in profile_ids if pid != exclude_id]
         profiles = []
         for profile_id in profile_ids:
             profile = get_profile_by_id(profile_id)
@@ -0,0 +1,243 @@
+# geo.py - Offline geocoding and radius search for member locations
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ACos, Cos, Least, Radians, Sin
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'au_gazetteer.csv'
+
+EARTH_RADIUS_KM = 6371.0
+GEOHASH_PRECISION = 9
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+STATE_ALIASES = {
+    'new south wales': 'nsw',
+    'victoria': 'vic',
+    'queensland': 'qld',
+    'western australia': 'wa',
+    'south australia': 'sa',
+    'tasmania': 'tas',
+    'northern territory': 'nt',
+    'australian capital territory': 'act',
+}
+STATE_CODES = {'nsw', 'vic', 'qld', 'wa', 'sa', 'tas', 'nt', 'act'}
+
+# State-only locations that still pin a member to a usable point
+STATE_FALLBACKS = {
+    'act': ('canberra', 'act'),
+}
+
+
+# ==================== GAZETTEER ====================
+
+def _normalize(text):
+    """Lowercase, strip the country and collapse spacing/punctuation"""
+    text = (text or '').lower().strip()
+    # States first - "western australia" must not lose its "australia" to the country strip
+    for name, code in STATE_ALIASES.items():
+        text = re.sub(rf'\b{name}\b', code, text)
+    text = re.sub(r',?\s*australia$', '', text)
+    text = re.sub(r'\s*-\s*', '-', text)
+    text = text.replace(',', ' ')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _split_state(text):
+    """Split 'surry hills nsw' into ('surry hills', 'nsw')"""
+    parts = text.rsplit(' ', 1)
+    if len(parts) == 2 and parts[1] in STATE_CODES:
+        return parts[0], parts[1]
+    if text in STATE_CODES:
+        return '', text
+    return text, None
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    """
+    Load the bundled gazetteer once per process.
+    Returns (by_locality_and_state, by_locality) lookup dicts.
+    """
+    by_pair = {}
+    by_locality = {}
+    with GAZETTEER_PATH.open('r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            locality = _normalize(row['locality'])
+            state = row['state'].strip().lower()
+            point = (float(row['latitude']), float(row['longitude']))
+            by_pair[(locality, state)] = point
+            by_locality.setdefault(locality, []).append(point)
+    return by_pair, by_locality
+
+
+def geocode(location):
+    """
+    Resolve free-text like 'Sydney NSW, Australia' to (lat, lon).
+    Returns None when the text can't be placed more precisely than a state.
+    """
+    by_pair, by_locality = load_gazetteer()
+    locality, state = _split_state(_normalize(location))
+
+    if not locality and state in STATE_FALLBACKS:
+        return by_pair.get(STATE_FALLBACKS[state])
+    if not locality:
+        return None
+
+    if state and (locality, state) in by_pair:
+        return by_pair[(locality, state)]
+
+    # Locality without a (known) state - only trust unambiguous names
+    candidates = by_locality.get(locality, [])
+    if len(candidates) == 1:
+        return candidates[0]
+    return None
+
+
+@lru_cache(maxsize=1)
+def _locality_states():
+    by_pair, by_locality = load_gazetteer()
+    states = {}
+    for locality, state in by_pair:
+        states.setdefault(locality, set()).add(state)
+    return states
+
+
+def geocode_state(location):
+    """
+    Resolve free-text to a state code ('nsw', 'vic', ...), or '' if unknown.
+    A bare locality only counts when the gazetteer has it in one state.
+    """
+    locality, state = _split_state(_normalize(location))
+    if state:
+        return state
+    states = _locality_states().get(locality, set())
+    if len(states) == 1:
+        return next(iter(states))
+    return ''
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points, in Python"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# ==================== GEOHASH ====================
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits = bits << 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def _cell_size_degrees(precision):
+    """(lat_degrees, lon_degrees) covered by one geohash cell"""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the search circle"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    lon_delta = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    return (
+        max(latitude - lat_delta, -90.0),
+        min(latitude + lat_delta, 90.0),
+        max(longitude - lon_delta, -180.0),
+        min(longitude + lon_delta, 180.0),
+    )
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Geohash prefixes covering the search circle's bounding box.
+    Picks the finest precision that keeps the cover to a handful of cells,
+    so the lookup stays a few index range scans.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lon_step = _cell_size_degrees(precision)
+        if lat_step >= (max_lat - min_lat) / 2 and lon_step >= (max_lon - min_lon) / 2:
+            break
+
+    cells = set()
+    lat = min_lat
+    while lat <= max_lat + lat_step:
+        lon = min_lon
+        while lon <= max_lon + lon_step:
+            cells.add(encode_geohash(min(lat, max_lat), min(lon, max_lon), precision))
+            lon += lon_step
+        lat += lat_step
+    return sorted(cells)
+
+
+# ==================== QUERY HELPERS ====================
+
+def within_radius_q(latitude, longitude, radius_km):
+    """
+    Q filter for rows whose geohash/lat/lon put them inside the radius box.
+    The geohash prefixes hit the geohash index; lat/lon trims the box edges.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+
+    cell_q = Q()
+    for cell in covering_cells(latitude, longitude, radius_km):
+        cell_q |= Q(geohash__startswith=cell)
+
+    return cell_q & Q(
+        latitude__gte=min_lat, latitude__lte=max_lat,
+        longitude__gte=min_lon, longitude__lte=max_lon,
+    )
+
+
+def distance_km_expression(latitude, longitude):
+    """Great-circle distance (spherical law of cosines) computed in SQL"""
+    lat = math.radians(latitude)
+    cos_angle = (
+        Sin(Radians(F('latitude'))) * math.sin(lat)
+        + Cos(Radians(F('latitude'))) * math.cos(lat)
+        * Cos(Radians(F('longitude')) - math.radians(longitude))
+    )
+    # Clamp rounding noise above 1.0 so ACOS never errors for the same point
+    return ACos(Least(cos_angle, 1.0, output_field=FloatField())) * EARTH_RADIUS_KM
+
@@ -0,0 +1,97 @@
+# mail_queue.py - Outgoing email stored in the database and sent outside the request
+"""
+A send through the Brevo SMTP relay takes a second or more, so code that
+runs inside a web request queues mail instead: queued_email() renders a
+message into an unsaved QueuedEmail row (bulk_create them, or call
+queue_email() for one) and `send_queued_emails` - from cron, or with
+--loop as a long-running worker - delivers the backlog over one SMTP
+connection. Rows are written in the caller's transaction, so mail for
+work that rolls back is never sent.
+"""
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+MAX_ATTEMPTS = 5
+
+
+def queued_email(to_email, subject, template_name, context):
+    """Render template_name into an unsaved QueuedEmail"""
+    from .models import QueuedEmail
+
+    html_body = render_to_string(template_name, context)
+    return QueuedEmail(
+        to_email=to_email,
+        subject=subject,
+        body=strip_tags(html_body),
+        html_body=html_body,
+    )
+
+
+def queue_email(to_email, subject, template_name, context):
+    email = queued_email(to_email, subject, template_name, context)
+    email.save()
+    return email
+
+
+def send_queued(batch_size=100, max_attempts=MAX_ATTEMPTS):
+    """
+    Send up to batch_size pending emails; returns (sent, failed).
+    Rows are locked with SKIP LOCKED on PostgreSQL so several workers
+    never send the same message twice.
+    """
+    from .models import QueuedEmail
+
+    sent = failed = 0
+    with transaction.atomic():
+        batch = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', attempts__lt=max_attempts)
+            .order_by('id')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            # Relay unreachable - count the attempt on every row and try again next run
+            print(f"Error connecting to the mail server: {e}")
+            connection = None
+
+        now = timezone.now()
+        for email in batch:
+            email.attempts += 1
+            if connection is None:
+                email.last_error = 'Could not connect to the mail server'
+            else:
+                message = EmailMultiAlternatives(
+                    email.subject, email.body, settings.DEFAULT_FROM_EMAIL,
+                    [email.to_email], connection=connection,
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, 'text/html')
+                try:
+                    message.send()
+                    email.status = 'sent'
+                    email.sent_at = now
+                    email.last_error = ''
+                    sent += 1
+                    continue
+                except Exception as e:
+                    print(f"Error sending queued email {email.id}: {e}")
+                    email.last_error = str(e)[:1000]
+
+            if email.attempts >= max_attempts:
+                email.status = 'failed'
+            failed += 1
+
+        if connection is not None:
+            connection.close()
+
+        QueuedEmail.objects.bulk_update(batch, ['status', 'attempts', 'last_error', 'sent_at'])
+    return sent, failed
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from website.models import UserActivityLog
+
+
+class Command(BaseCommand):
+    help = 'Copy message/conversation/request/date ids out of additional_data into their indexed columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows read and updated per batch (default 2000)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count rows that would change without writing')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = list(UserActivityLog.PROMOTED_KEYS)
+
+        # Rows that carry one of the keys in JSON but not yet in its column
+        pending = Q()
+        for key in fields:
+            pending |= Q(**{'additional_data__has_key': key, f'{key}__isnull': True})
+        queryset = UserActivityLog.objects.filter(pending).only('id', 'additional_data', *fields)
+
+        last_id = 0
+        scanned = 0
+        updated = 0
+        while True:
+            # Keyset on id so each batch is an index range, not an OFFSET scan
+            batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            scanned += len(batch)
+
+            changed = [entry for entry in batch if entry.promote_keys()]
+            if changed and not options['dry_run']:
+                with transaction.atomic():
+                    UserActivityLog.objects.bulk_update(changed, fields, batch_size=batch_size)
+            updated += len(changed)
+            self.stdout.write(f"  ...up to id {last_id}: {updated} row(s) updated")
+
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {updated} of {scanned} scanned row(s)"))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Q
+
+from website.models import UserActivityLog
+
+
+class Command(BaseCommand):
+    help = ('Delete the second copy of two-party activity rows logged before they were stored once '
+            '(message_received, like_received, the 2nd conversation_started). '
+            'Migration 0030 does this on upgrade; re-run it for rows logged by old workers during a deploy '
+            '(backfill_activity_keys first, and rollup_activity --since <first day> after).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows deleted per batch (default 2000)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count duplicates without deleting')
+
+    def handle(self, *args, **options):
+        logs = UserActivityLog.objects.all()
+
+        # Only rows whose actor-side twin still exists - nothing is lost by deleting them
+        message_twin = logs.filter(
+            activity_type='message_sent',
+            message_id=OuterRef('message_id'),
+            user_id=OuterRef('target_user_id'),
+        )
+        like_twin = logs.filter(
+            activity_type='like_given',
+            user_id=OuterRef('target_user_id'),
+            target_user_id=OuterRef('user_id'),
+            additional_data__timestamp=OuterRef('additional_data__timestamp'),
+        )
+        conversation_twin = logs.filter(
+            activity_type='conversation_started',
+            conversation_id=OuterRef('conversation_id'),
+            id__lt=OuterRef('id'),
+        )
+        duplicates = logs.filter(
+            Q(activity_type='message_received', message_id__isnull=False) & Exists(message_twin)
+            | Q(activity_type='like_received') & Exists(like_twin)
+            | Q(activity_type='conversation_started', conversation_id__isnull=False) & Exists(conversation_twin)
+        )
+
+        last_id = 0
+        removed = 0
+        while True:
+            ids = list(duplicates.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[
+                :options['batch_size']
+            ])
+            if not ids:
+                break
+            last_id = ids[-1]
+            if not options['dry_run']:
+                UserActivityLog.objects.filter(id__in=ids).delete()
+            removed += len(ids)
+            self.stdout.write(f"  ...up to id {last_id}: {removed} duplicate(s)")
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} duplicate row(s)"))
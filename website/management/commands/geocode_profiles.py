@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from website.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Resolve UserProfile.location to coordinates using the bundled offline gazetteer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Profiles updated per bulk_update')
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only geocode profiles without coordinates')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = UserProfile.objects.only('id', 'location', 'latitude', 'longitude', 'geohash', 'state')
+        if options['missing_only']:
+            queryset = queryset.filter(latitude__isnull=True)
+
+        resolved = 0
+        unresolved = set()
+        batch = []
+
+        for profile in queryset.order_by('id').iterator(chunk_size=batch_size):
+            profile.update_coordinates()
+            if profile.has_coordinates:
+                resolved += 1
+            else:
+                unresolved.add(profile.location)
+            batch.append(profile)
+
+            if len(batch) >= batch_size:
+                UserProfile.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash', 'state'])
+                batch = []
+
+        if batch:
+            UserProfile.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash', 'state'])
+
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {resolved} profile(s)"))
+        if unresolved:
+            self.stdout.write(self.style.WARNING(
+                f"{len(unresolved)} location(s) not in gazetteer:"
+            ))
+            for location in sorted(unresolved):
+                self.stdout.write(f"  - {location}")
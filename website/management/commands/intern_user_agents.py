@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from website.models import UserActivityLog
+from website.user_agents import agent_id_for
+
+
+class Command(BaseCommand):
+    help = 'Move activity-log user_agent text into the UserAgent lookup table, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows read and updated per batch (default 2000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # Text still on the row, or the old second copy inside login additional_data
+        queryset = UserActivityLog.objects.filter(
+            Q(agent__isnull=True) & ~Q(user_agent='')
+            | Q(activity_type='login', additional_data__has_key='user_agent')
+        ).only('id', 'activity_type', 'agent', 'user_agent', 'additional_data')
+
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for entry in batch:
+                data = entry.additional_data if isinstance(entry.additional_data, dict) else {}
+                copy = data.pop('user_agent', None)
+                if not entry.user_agent and not entry.agent_id and copy:
+                    entry.user_agent = copy
+                if entry.user_agent and not entry.agent_id:
+                    # Resolved outside the batch transaction, so new ids go into the LRU
+                    entry.agent_id = agent_id_for(entry.user_agent)
+                    if entry.agent_id:
+                        entry.user_agent = ''
+
+            with transaction.atomic():
+                UserActivityLog.objects.bulk_update(
+                    batch, ['agent', 'user_agent', 'additional_data'], batch_size=batch_size
+                )
+            updated += len(batch)
+            self.stdout.write(f"  ...up to id {last_id}: {updated} row(s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Interned user agents on {updated} row(s)"))
+        self.stdout.write("On PostgreSQL run VACUUM (or VACUUM FULL off-peak) on website_useractivitylog "
+                          "to hand the freed space back.")
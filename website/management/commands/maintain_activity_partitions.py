@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from website.activity_partitions import (
+    is_partitioned, ensure_partitions, rotate_before, archive_tables,
+    month_start, add_months,
+)
+from website.rollups import next_rollup_day, rolled_through
+
+
+class Command(BaseCommand):
+    help = ('Keep UserActivityLog partitioned by month: create upcoming partitions on PostgreSQL, '
+            'rotate old months into archive tables on SQLite (run daily)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='PostgreSQL: monthly partitions to create ahead of today')
+        parser.add_argument('--keep-months', type=int, default=6,
+                            help='SQLite: months kept in the hot table before rotating out')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'postgresql':
+            if not is_partitioned():
+                self.stdout.write(self.style.ERROR(
+                    "website_useractivitylog is not partitioned - run migrations first"
+                ))
+                return
+            created = ensure_partitions(options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Partitions in place through {created[-1]}"
+            ))
+            return
+
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.style.WARNING(f"No partitioning strategy for {connection.vendor}"))
+            return
+
+        # Never rotate days the rollup job hasn't summarised yet - rollup_activity skips archived months
+        from django.core.management import call_command
+        cutoff = add_months(month_start(timezone.localdate()), -max(options['keep_months'], 1))
+        since = next_rollup_day()
+        if since <= cutoff:
+            call_command('rollup_activity', since=since.isoformat(), until=cutoff.isoformat(), stdout=self.stdout)
+        last_day = rolled_through()
+        if last_day is None:
+            self.stdout.write(self.style.WARNING("Nothing rolled up yet - not rotating"))
+            return
+        cutoff = min(cutoff, month_start(last_day + timedelta(days=1)))
+
+        moved = rotate_before(cutoff)
+        for table, count in moved.items():
+            self.stdout.write(f"  {table}: {count} row(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rotated {sum(moved.values())} row(s) older than {cutoff}; "
+            f"{len(archive_tables())} archive table(s)"
+        ))
@@ -0,0 +1,109 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from website.recommendations import (
+    TOP_N, load_member_features, load_block_pairs,
+    init_worker, rank_shard, store_rankings, prune_inactive,
+)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored top-N recommendations for every active member (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (default: CPU count, 1 = run in-process)')
+        parser.add_argument('--shard-size', type=int, default=250,
+                            help='Viewers scored per worker task')
+        parser.add_argument('--top-n', type=int, default=TOP_N,
+                            help='Candidates stored per member')
+        parser.add_argument('--checkpoint', default=str(Path(settings.BASE_DIR) / 'recommendations_checkpoint.json'),
+                            help='Progress file used to resume an interrupted run')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip shards the checkpoint file says are already stored')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        checkpoint_path = Path(options['checkpoint'])
+        shard_size = max(options['shard_size'], 1)
+        top_n = options['top_n']
+
+        pool = load_member_features()
+        hidden = load_block_pairs()
+        self.stdout.write(f"Loaded {len(pool)} active member(s), {len(hidden)} with blocks")
+
+        done_ranges = self.load_checkpoint(checkpoint_path) if options['resume'] else []
+        viewers = [
+            viewer for viewer in pool
+            if not any(first <= viewer['user_id'] <= last for first, last in done_ranges)
+        ]
+        if done_ranges:
+            self.stdout.write(f"Resuming: {len(pool) - len(viewers)} member(s) already done")
+
+        # Viewers are in user_id order, so each shard is a contiguous id range
+        shards = [viewers[i:i + shard_size] for i in range(0, len(viewers), shard_size)]
+        computed_at = timezone.now()
+        scored = 0
+        stored = 0
+
+        if options['workers'] <= 1:
+            init_worker(pool, hidden, top_n)
+            results = (rank_shard(shard) for shard in shards)
+            for rankings in results:
+                scored, stored = self.save_shard(rankings, computed_at, checkpoint_path, done_ranges,
+                                                 scored, stored, len(viewers), started)
+        else:
+            # Workers never use the DB, but don't let them inherit open connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker,
+                                     initargs=(pool, hidden, top_n)) as executor:
+                futures = [executor.submit(rank_shard, shard) for shard in shards]
+                for future in as_completed(futures):
+                    scored, stored = self.save_shard(future.result(), computed_at, checkpoint_path,
+                                                     done_ranges, scored, stored, len(viewers), started)
+
+        pruned = prune_inactive()
+        if checkpoint_path.exists():
+            checkpoint_path.unlink()
+
+        elapsed = max(time.monotonic() - started, 0.001)
+        self.stdout.write(self.style.SUCCESS(
+            f"Ranked {scored} member(s) against {len(pool)} candidate(s) in {elapsed:.1f}s "
+            f"({scored / elapsed:.0f} members/s, {scored * len(pool) / elapsed:,.0f} pairs/s); "
+            f"stored {stored} row(s), pruned {pruned} stale row(s)"
+        ))
+
+    def save_shard(self, rankings, computed_at, checkpoint_path, done_ranges, scored, stored, total, started):
+        stored += store_rankings(rankings, computed_at)
+        scored += len(rankings)
+
+        if rankings:
+            user_ids = [viewer_user_id for viewer_user_id, ranked in rankings]
+            done_ranges.append([min(user_ids), max(user_ids)])
+            self.save_checkpoint(checkpoint_path, done_ranges)
+
+        elapsed = max(time.monotonic() - started, 0.001)
+        self.stdout.write(f"  {scored}/{total} member(s) ({scored / elapsed:.0f}/s)")
+        return scored, stored
+
+    def load_checkpoint(self, path):
+        try:
+            with path.open('r', encoding='utf-8') as file:
+                return json.load(file).get('done_ranges', [])
+        except (OSError, ValueError):
+            return []
+
+    def save_checkpoint(self, path, done_ranges):
+        # Write then rename so a crash never leaves a half-written checkpoint
+        tmp_path = path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as file:
+            json.dump({'done_ranges': done_ranges, 'updated_at': timezone.now().isoformat()}, file)
+        os.replace(tmp_path, path)
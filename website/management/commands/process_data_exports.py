@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.data_exports import claim_pending, run_export, purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Build queued GDPR data exports into zip archives on storage, and purge expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10,
+                            help='Exports built per run (default 10)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, polling for new requests')
+        parser.add_argument('--interval', type=int, default=30,
+                            help='Seconds between polls with --loop (default 30)')
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        while True:
+            remaining = options['limit']
+            while remaining > 0:
+                exports = claim_pending(1)
+                if not exports:
+                    break
+                export = run_export(exports[0])
+                remaining -= 1
+                if export.status == 'ready':
+                    built += 1
+                    self.stdout.write(f"  ...export {export.id} for {export.user.username}: "
+                                      f"{export.size} bytes, {sum(export.row_counts.values())} row(s)")
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"  ...export {export.id} failed: {export.error}"))
+
+            purged = purge_expired()
+            if purged:
+                self.stdout.write(f"  ...purged {purged} expired export(s)")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Built {built} data export(s)"))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} export(s) failed"))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.recommendations import refresh_queued
+
+
+class Command(BaseCommand):
+    help = 'Patch stored recommendation lists for members queued by web requests (batch approvals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Members refreshed per pass - each pass loads the member pool once (default 500)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, polling for newly queued members')
+        parser.add_argument('--interval', type=int, default=30,
+                            help='Seconds between polls with --loop (default 30)')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            refreshed = refresh_queued(options['batch_size'])
+            total += refreshed
+            if refreshed:
+                self.stdout.write(f"  ...refreshed {refreshed}")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed recommendations for {total} member(s)"))
@@ -0,0 +1,75 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.activity_log import spool_dir, entry_from_dict, write_entries
+from website.models import UserActivityLog
+
+
+class Command(BaseCommand):
+    help = 'Write activity-log rows left in the spool directory by workers that died mid-request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=300,
+                            help='Only replay spool files untouched for this many seconds (default 300)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be replayed without writing')
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options['min_age']
+        files = sorted(
+            path for path in spool_dir().glob('*.jsonl')
+            if path.stat().st_mtime < cutoff
+        )
+        if not files:
+            self.stdout.write(self.style.SUCCESS("Spool is empty"))
+            return
+
+        replayed = 0
+        skipped = 0
+        kept = 0
+        for path in files:
+            entries = []
+            with path.open('r', encoding='utf-8') as file:
+                for line in file:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entries.append(entry_from_dict(json.loads(line)))
+                    except (ValueError, KeyError):
+                        # A torn last line from the crash - everything before it is intact
+                        skipped += 1
+
+            # The worker may have died after its bulk_create but before deleting the file
+            entries = [entry for entry in entries if not self.already_logged(entry)]
+
+            if options['dry_run']:
+                self.stdout.write(f"  {path.name}: {len(entries)} row(s) to replay")
+                replayed += len(entries)
+                continue
+
+            written = write_entries(entries) if entries else 0
+            replayed += written
+            if written < len(entries):
+                # Still failing - keep the file for the next run
+                kept += 1
+                continue
+            path.unlink()
+
+        verb = 'Would replay' if options['dry_run'] else 'Replayed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {replayed} row(s) from {len(files)} spool file(s)"
+        ))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Skipped {skipped} unreadable line(s)"))
+        if kept:
+            self.stdout.write(self.style.WARNING(f"Kept {kept} spool file(s) with rows that could not be written"))
+
+    def already_logged(self, entry):
+        return UserActivityLog.objects.filter(
+            user_id=entry.user_id,
+            activity_type=entry.activity_type,
+            created_at=entry.created_at,
+        ).exists()
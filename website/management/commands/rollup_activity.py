@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from website.activity_partitions import archive_tables, month_table, month_start
+from website.rollups import next_rollup_day, rollup_day
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily per-user / per-type activity counts (run nightly; defaults to every day since the last complete rollup)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild (YYYY-MM-DD, default the day after the last complete rollup)')
+        parser.add_argument('--until', help='Last day to rebuild, inclusive (YYYY-MM-DD, default today)')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            until = date.fromisoformat(options['until']) if options['until'] else today
+            since = date.fromisoformat(options['since']) if options['since'] else next_rollup_day()
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        # On SQLite, rotated months live in archive tables - keep their rollups as they are
+        archived = set(archive_tables()) if connection.vendor == 'sqlite' else set()
+
+        days = 0
+        rows = 0
+        day = since
+        while day <= until:
+            if month_table(month_start(day)) not in archived:
+                rows += rollup_day(day)
+                days += 1
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {days} day(s) into {rows} row(s)"))
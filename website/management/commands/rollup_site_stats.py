@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website.rollups import rollup_site_stats
+
+
+class Command(BaseCommand):
+    help = ('Aggregate signups, messages, likes, matches, private-access requests and date events '
+            'into daily site stats (run nightly or hourly; picks up from the last stored day)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to rebuild (YYYY-MM-DD, default the last stored day)')
+        parser.add_argument('--until', help='Last day to rebuild, inclusive (YYYY-MM-DD, default today)')
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else None
+            until = date.fromisoformat(options['until']) if options['until'] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        days = rollup_site_stats(since, until)
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {days} day(s) of site stats"))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.mail_queue import send_queued, MAX_ATTEMPTS
+
+
+class Command(BaseCommand):
+    help = 'Send emails queued by web requests (profile edit approvals and rejections)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Emails sent per SMTP connection (default 100)')
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                            help=f'Give up on an email after this many failures (default {MAX_ATTEMPTS})')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, polling for new mail')
+        parser.add_argument('--interval', type=int, default=15,
+                            help='Seconds between polls with --loop (default 15)')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_queued(options['batch_size'], options['max_attempts'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"  ...sent {sent}, failed {failed}")
+                if sent:
+                    continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} email(s)"))
+        if total_failed:
+            self.stdout.write(self.style.WARNING(f"{total_failed} send attempt(s) failed"))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0014_userprofile_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_complete', True)), fields=['gender', 'date_of_birth'], name='profile_active_gender_dob_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_complete', True)), fields=['date_of_birth'], name='profile_active_dob_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_complete', True)), fields=['body_type', 'relationship_status'], name='profile_active_body_rel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_complete', True)), fields=['-created_at'], name='profile_active_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.23 on 2026-10-19 04:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('website', '0015_userprofile_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendedCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='website.userprofile')),
+                ('viewer', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recommended_candidates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Recommended Candidate',
+                'verbose_name_plural': 'Recommended Candidates',
+                'indexes': [models.Index(fields=['viewer', 'rank'], name='recommended_viewer_rank_idx')],
+                'unique_together': {('viewer', 'candidate')},
+            },
+        ),
+    ]
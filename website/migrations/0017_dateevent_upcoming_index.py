@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0016_recommendedcandidate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dateevent',
+            index=models.Index(fields=['is_cancelled', 'date_time'], name='date_upcoming_idx'),
+        ),
+    ]
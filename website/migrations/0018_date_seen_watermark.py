@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def watermarks_from_date_views(apps, schema_editor):
+    """Start each user's watermark at their most recent DateView so badges don't jump"""
+    DateView = apps.get_model('website', 'DateView')
+    DateSeenWatermark = apps.get_model('website', 'DateSeenWatermark')
+    latest = DateView.objects.values('user_id').annotate(seen_until=models.Max('viewed_at'))
+    DateSeenWatermark.objects.bulk_create([
+        DateSeenWatermark(user_id=row['user_id'], seen_until=row['seen_until'])
+        for row in latest
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('website', '0017_dateevent_upcoming_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DateSeenWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seen_until', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Date Seen Watermark',
+                'verbose_name_plural': 'Date Seen Watermarks',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dateevent',
+            index=models.Index(fields=['is_cancelled', 'created_at'], name='date_new_idx'),
+        ),
+        migrations.AddField(
+            model_name='dateseenwatermark',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='date_seen_watermark', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(watermarks_from_date_views, migrations.RunPython.noop),
+    ]
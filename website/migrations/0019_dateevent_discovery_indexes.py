@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0018_date_seen_watermark'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dateevent',
+            index=models.Index(condition=models.Q(('is_cancelled', False)), fields=['activity', 'date_time'], name='date_live_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dateevent',
+            index=models.Index(condition=models.Q(('is_cancelled', False)), fields=['area', 'date_time'], name='date_live_area_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dateevent',
+            index=models.Index(condition=models.Q(('is_cancelled', False)), fields=['audience', 'date_time'], name='date_live_audience_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dateevent',
+            index=models.Index(condition=models.Q(('is_cancelled', False)), fields=['vibe', 'budget', 'date_time'], name='date_live_vibe_budget_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('website', '0019_dateevent_discovery_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dateevent',
+            name='attendee_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DateRSVP',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('date_event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rsvps', to='website.dateevent')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='date_rsvps', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Date RSVP',
+                'verbose_name_plural': 'Date RSVPs',
+                'indexes': [models.Index(fields=['user', 'created_at'], name='rsvp_user_idx'), models.Index(fields=['date_event', 'created_at'], name='rsvp_event_idx')],
+                'unique_together': {('date_event', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def partition_activity_log(apps, schema_editor):
+    """
+    PostgreSQL only: rebuild website_useractivitylog as a table partitioned
+    by RANGE (created_at), one partition per month plus a DEFAULT partition.
+    The primary key becomes (id, created_at) because PostgreSQL requires the
+    partition key in every unique constraint; Django still addresses rows by id.
+    SQLite keeps the plain table and uses table rotation instead.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    from website.activity_partitions import (
+        PARENT_TABLE, DEFAULT_PARTITION, month_start, add_months, create_month_partition
+    )
+    from django.utils import timezone
+
+    UserActivityLog = apps.get_model('website', 'UserActivityLog')
+    legacy = f'{PARENT_TABLE}_legacy'
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(created_at) FROM "{PARENT_TABLE}"')
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" RENAME TO "{legacy}"')
+        cursor.execute(
+            f'CREATE TABLE "{PARENT_TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" ADD PRIMARY KEY (id, created_at)')
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{PARENT_TABLE}" DEFAULT')
+
+        # Monthly partitions for existing history and the next few months
+        month = month_start(timezone.localtime(oldest).date() if oldest else timezone.localdate())
+        last = add_months(month_start(timezone.localdate()), 3)
+        while month <= last:
+            create_month_partition(cursor, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{PARENT_TABLE}" OVERRIDING SYSTEM VALUE SELECT * FROM "{legacy}"')
+        cursor.execute(f'DROP TABLE "{legacy}"')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{PARENT_TABLE}', 'id'), "
+            f'COALESCE((SELECT MAX(id) FROM "{PARENT_TABLE}"), 0) + 1, false)'
+        )
+
+    # Recreate the indexes and foreign keys the legacy table carried
+    for index in UserActivityLog._meta.indexes:
+        schema_editor.add_index(UserActivityLog, index)
+    for field_name in ('user', 'target_user'):
+        field = UserActivityLog._meta.get_field(field_name)
+        schema_editor.execute(schema_editor._create_index_sql(UserActivityLog, fields=[field]))
+        schema_editor.execute(schema_editor._create_fk_sql(UserActivityLog, field, '_fk_%(to_table)s_%(to_column)s'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('website', '0021_activity_log_created_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('activity_type', models.CharField(choices=[('login', 'User Login'), ('logout', 'User Logout'), ('message_sent', 'Message Sent'), ('message_received', 'Message Received'), ('message_deleted', 'Message Deleted'), ('profile_view', 'Profile Viewed'), ('like_given', 'Like Given'), ('like_received', 'Like Received'), ('favorite', 'Favorite Toggled'), ('block', 'Block Toggled'), ('date_created', 'Date Created'), ('date_joined', 'Date Joined'), ('date_cancelled', 'Date Cancelled'), ('profile_edit', 'Profile Edited'), ('profile_edit_request', 'Profile Edit Requested'), ('profile_approved', 'Profile Approved'), ('profile_rejected', 'Profile Rejected'), ('private_access_requested', 'Private Access Requested'), ('private_access_granted', 'Private Access Granted'), ('private_access_revoked', 'Private Access Revoked'), ('private_access_denied', 'Private Access Denied')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Activity Daily Rollup',
+                'verbose_name_plural': 'Activity Daily Rollups',
+                'indexes': [models.Index(fields=['user', 'day'], name='rollup_user_day_idx'), models.Index(fields=['activity_type', 'day'], name='rollup_type_day_idx')],
+                'unique_together': {('day', 'user', 'activity_type')},
+            },
+        ),
+        migrations.RunPython(partition_activity_log, migrations.RunPython.noop),
+    ]
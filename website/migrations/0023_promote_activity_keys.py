@@ -0,0 +1,49 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0022_activity_partitions_and_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useractivitylog',
+            name='conversation_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='useractivitylog',
+            name='date_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='useractivitylog',
+            name='message_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='useractivitylog',
+            name='request_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(condition=models.Q(('message_id__isnull', False)), fields=['message_id', 'created_at'], name='activity_message_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(condition=models.Q(('conversation_id__isnull', False)), fields=['conversation_id', 'created_at'], name='activity_conversation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(condition=models.Q(('request_id__isnull', False)), fields=['request_id', 'created_at'], name='activity_request_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(condition=models.Q(('date_id__isnull', False)), fields=['date_id', 'created_at'], name='activity_date_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0023_promote_activity_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(condition=models.Q(('activity_type__in', ['message_sent', 'like_given', 'conversation_started'])), fields=['target_user', 'created_at'], name='activity_counterpart_idx'),
+        ),
+    ]
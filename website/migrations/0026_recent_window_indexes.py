@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0025_intern_user_agents'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'created_at'], name='message_sender_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlike',
+            index=models.Index(fields=['user', 'created_at'], name='like_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0027_queued_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('signups', models.PositiveIntegerField(default=0)),
+                ('messages', models.PositiveIntegerField(default=0)),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('private_access_requests', models.PositiveIntegerField(default=0)),
+                ('date_events', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Site Statistics',
+                'verbose_name_plural': 'Site Statistics',
+                'ordering': ['day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['created_at'], name='message_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlike',
+            index=models.Index(fields=['created_at'], name='like_created_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+from django.db import migrations
+from django.db.models import Exists, OuterRef, Q
+
+PROMOTED_KEYS = ('message_id', 'conversation_id', 'request_id', 'date_id')
+BATCH_SIZE = 2000
+
+
+def backfill_keys(UserActivityLog):
+    """Copy the lookup keys out of additional_data (as backfill_activity_keys does)"""
+    pending = Q()
+    for key in PROMOTED_KEYS:
+        pending |= Q(**{'additional_data__has_key': key, f'{key}__isnull': True})
+    queryset = UserActivityLog.objects.filter(pending).only('id', 'additional_data', *PROMOTED_KEYS)
+
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            return
+        last_id = batch[-1].id
+        changed = []
+        for entry in batch:
+            data = entry.additional_data if isinstance(entry.additional_data, dict) else {}
+            for key in PROMOTED_KEYS:
+                try:
+                    setattr(entry, key, int(data[key]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            changed.append(entry)
+        UserActivityLog.objects.bulk_update(changed, PROMOTED_KEYS, batch_size=BATCH_SIZE)
+
+
+def delete_twins(UserActivityLog):
+    """Delete counterpart copies whose actor-side twin exists (as dedupe_paired_activity does)"""
+    logs = UserActivityLog.objects.all()
+    message_twin = logs.filter(
+        activity_type='message_sent',
+        message_id=OuterRef('message_id'),
+        user_id=OuterRef('target_user_id'),
+    )
+    like_twin = logs.filter(
+        activity_type='like_given',
+        user_id=OuterRef('target_user_id'),
+        target_user_id=OuterRef('user_id'),
+        additional_data__timestamp=OuterRef('additional_data__timestamp'),
+    )
+    conversation_twin = logs.filter(
+        activity_type='conversation_started',
+        conversation_id=OuterRef('conversation_id'),
+        id__lt=OuterRef('id'),
+    )
+    duplicates = logs.filter(
+        Q(activity_type='message_received', message_id__isnull=False) & Exists(message_twin)
+        | Q(activity_type='like_received') & Exists(like_twin)
+        | Q(activity_type='conversation_started', conversation_id__isnull=False) & Exists(conversation_twin)
+    )
+
+    last_id = 0
+    removed = 0
+    while True:
+        ids = list(duplicates.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:BATCH_SIZE])
+        if not ids:
+            return removed
+        last_id = ids[-1]
+        UserActivityLog.objects.filter(id__in=ids).delete()
+        removed += len(ids)
+
+
+def dedupe_paired_activity(apps, schema_editor):
+    UserActivityLog = apps.get_model('website', 'UserActivityLog')
+    ActivityDailyRollup = apps.get_model('website', 'ActivityDailyRollup')
+
+    backfill_keys(UserActivityLog)
+    if delete_twins(UserActivityLog):
+        # Rollups counted both copies - the next rollup_activity rebuilds from the first logged day
+        ActivityDailyRollup.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0029_data_export'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_paired_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-19 05:58
+
+from django.db import migrations, models
+
+from website.geo import geocode_state
+
+BATCH_SIZE = 2000
+
+
+def backfill_state(apps, schema_editor):
+    """Geocode the state of existing profiles (as geocode_profiles does)"""
+    UserProfile = apps.get_model('website', 'UserProfile')
+    queryset = UserProfile.objects.only('id', 'location', 'state')
+
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            return
+        last_id = batch[-1].id
+        for profile in batch:
+            profile.state = geocode_state(profile.location)
+        UserProfile.objects.bulk_update(batch, ['state'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0030_dedupe_paired_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='state',
+            field=models.CharField(blank=True, default='', max_length=3),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_complete', True)), fields=['state'], name='profile_active_state_idx'),
+        ),
+        migrations.RunPython(backfill_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-19 06:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0031_userprofile_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingRecommendationRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queued_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='website.userprofile')),
+            ],
+            options={
+                'verbose_name': 'Pending Recommendation Refresh',
+                'verbose_name_plural': 'Pending Recommendation Refreshes',
+            },
+        ),
+    ]
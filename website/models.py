@@ -1,16 +1,55 @@
 # models.py - COMPLETE WITH MESSAGING MODELS AND LEGAL COMPLIANCE
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 from datetime import date
 import json
 
+from .geo import geocode, geocode_state, encode_geohash, within_radius_q, distance_km_expression
+
+class TrackedFieldsMixin:
+    """
+    Remembers the loaded values of `tracked_fields` so pre/post_save handlers
+    can see what changed without re-reading the row.
+    The snapshot is refreshed after every save (i.e. after post_save runs) -
+    with update_fields, only for the fields that were written.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked()
+        return instance
+
+    def _snapshot_tracked(self, names=None):
+        deferred = self.get_deferred_fields()
+        loaded = getattr(self, '_loaded_values', None) or {}
+        names = self.tracked_fields if names is None else [name for name in self.tracked_fields if name in names]
+        loaded.update({name: getattr(self, name) for name in names if name not in deferred})
+        self._loaded_values = loaded
+
+    def tracked_changes(self, update_fields=None):
+        """
+        {field: (old, new)} for tracked fields changed since load; {} for unsaved rows.
+        Pass a save's update_fields to leave out changes that save won't write.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return {}
+        return {
+            name: (old, getattr(self, name))
+            for name, old in loaded.items()
+            if getattr(self, name) != old and (update_fields is None or name in update_fields)
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_tracked(kwargs.get('update_fields'))
+
 class Conversation(models.Model):
     """Conversation between two users"""
     participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='conversations')
@@ -24,8 +63,10 @@ class Conversation(models.Model):
         usernames = [user.username for user in self.participants.all()]
         return f"Conversation: {' & '.join(usernames)}"
 
-class Message(models.Model):
+class Message(TrackedFieldsMixin, models.Model):
     """Individual message in a conversation - WITH LEGAL COMPLIANCE"""
+    tracked_fields = ('is_read', 'is_deleted_for_sender', 'is_deleted_for_receiver')
+
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
@@ -43,6 +84,12 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # A member's newest messages (user admin inline, legal lookups)
+            models.Index(fields=['sender', 'created_at'], name='message_sender_created_idx'),
+            # Day-range scans for the site stats rollup
+            models.Index(fields=['created_at'], name='message_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}"
@@ -61,6 +108,53 @@ class Message(models.Model):
         other_participants = self.conversation.participants.exclude(id=self.sender.id)
         return other_participants.first() if other_participants.exists() else None
 
+class UserActivityLogQuerySet(models.QuerySet):
+    def between(self, start, end):
+        """start <= created_at < end - lets PostgreSQL prune to the matching monthly partitions"""
+        return self.filter(created_at__gte=start, created_at__lt=end)
+    
+    def involving(self, user_ids):
+        """Rows the users did, plus two-party rows where they are the counterpart"""
+        return self.filter(
+            models.Q(user_id__in=user_ids)
+            | models.Q(target_user_id__in=user_ids, activity_type__in=list(self.model.COUNTERPART_TYPES))
+        )
+    
+    def as_seen_by(self, user_id):
+        """
+        involving(user) from that user's side: seen_type is message_received,
+        like_received... where they were the counterpart, counterpart_id is the other party.
+        """
+        mirrored = [
+            models.When(activity_type=actor_type, then=models.Value(counterpart_type))
+            for actor_type, counterpart_type in self.model.COUNTERPART_TYPES.items()
+        ]
+        return self.involving([user_id]).annotate(
+            seen_type=models.Case(
+                models.When(user_id=user_id, then='activity_type'),
+                *mirrored,
+                default='activity_type',
+                output_field=models.CharField(),
+            ),
+            counterpart_id=models.Case(
+                models.When(user_id=user_id, then='target_user_id'),
+                default='user_id',
+            ),
+        )
+
+class UserAgent(models.Model):
+    """Each distinct User-Agent string once; activity rows point here by id"""
+    digest = models.CharField(max_length=40, unique=True)  # sha1 of value - long text can't be a unique key
+    value = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'User Agent'
+        verbose_name_plural = 'User Agents'
+    
+    def __str__(self):
+        return self.value[:80]
+
 # === NEW MODEL FOR LEGAL COMPLIANCE ===
 class UserActivityLog(models.Model):
     """Log all user activities for legal compliance and admin monitoring"""
@@ -93,9 +187,30 @@ class UserActivityLog(models.Model):
     target_user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, 
                                    on_delete=models.SET_NULL, related_name='targeted_activities')
     ip_address = models.GenericIPAddressField(null=True, blank=True)
+    # Interned into UserAgent on write; the text column only holds legacy rows
+    agent = models.ForeignKey(UserAgent, null=True, blank=True, on_delete=models.PROTECT,
+                              related_name='+', db_index=False)
     user_agent = models.TextField(blank=True)
     additional_data = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Lookup keys copied out of additional_data so they can be indexed
+    message_id = models.BigIntegerField(null=True, blank=True)
+    conversation_id = models.BigIntegerField(null=True, blank=True)
+    request_id = models.BigIntegerField(null=True, blank=True)
+    date_id = models.BigIntegerField(null=True, blank=True)
+    # Set when the activity happens, not when a buffered/spooled row is written
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    
+    PROMOTED_KEYS = ('message_id', 'conversation_id', 'request_id', 'date_id')
+    
+    # Two-party events are stored once, from the actor's side; the counterpart
+    # (target_user) sees them as the mapped type. See as_seen_by().
+    COUNTERPART_TYPES = {
+        'message_sent': 'message_received',
+        'like_given': 'like_received',
+        'conversation_started': 'conversation_started',
+    }
+    
+    objects = UserActivityLogQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
@@ -103,12 +218,97 @@ class UserActivityLog(models.Model):
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['activity_type', 'created_at']),
             models.Index(fields=['ip_address', 'created_at']),
+            # Partial: most rows have none of these keys
+            models.Index(fields=['message_id', 'created_at'], name='activity_message_idx',
+                         condition=models.Q(message_id__isnull=False)),
+            models.Index(fields=['conversation_id', 'created_at'], name='activity_conversation_idx',
+                         condition=models.Q(conversation_id__isnull=False)),
+            models.Index(fields=['request_id', 'created_at'], name='activity_request_idx',
+                         condition=models.Q(request_id__isnull=False)),
+            models.Index(fields=['date_id', 'created_at'], name='activity_date_idx',
+                         condition=models.Q(date_id__isnull=False)),
+            # Counterpart side of involving() / as_seen_by()
+            models.Index(fields=['target_user', 'created_at'], name='activity_counterpart_idx',
+                         condition=models.Q(activity_type__in=['message_sent', 'like_given',
+                                                               'conversation_started'])),
         ]
         verbose_name = 'User Activity Log'
         verbose_name_plural = 'User Activity Logs'
     
     def __str__(self):
         return f"{self.user.username} - {self.activity_type} - {self.created_at}"
+    
+    def promote_keys(self):
+        """Copy the lookup keys out of additional_data into their columns; True if any changed"""
+        data = self.additional_data if isinstance(self.additional_data, dict) else {}
+        changed = False
+        for key in self.PROMOTED_KEYS:
+            try:
+                value = int(data[key])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if getattr(self, key) != value:
+                setattr(self, key, value)
+                changed = True
+        return changed
+    
+    def intern_agent(self):
+        """Swap the user_agent text for a UserAgent id (cached in-process)"""
+        if self.user_agent and not self.agent_id:
+            from .user_agents import agent_id_for
+            self.agent_id = agent_id_for(self.user_agent)
+            if self.agent_id:
+                self.user_agent = ''
+    
+    @property
+    def user_agent_text(self):
+        return self.agent.value if self.agent_id else self.user_agent
+    
+    def save(self, *args, **kwargs):
+        self.promote_keys()
+        self.intern_agent()
+        super().save(*args, **kwargs)
+
+class ActivityDailyRollup(models.Model):
+    """Per-user, per-type activity counts for one day (built by rollup_activity)"""
+    day = models.DateField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='activity_rollups', db_index=False)
+    activity_type = models.CharField(max_length=50, choices=UserActivityLog.ACTIVITY_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['day', 'user', 'activity_type']
+        indexes = [
+            models.Index(fields=['user', 'day'], name='rollup_user_day_idx'),
+            models.Index(fields=['activity_type', 'day'], name='rollup_type_day_idx'),
+        ]
+        verbose_name = 'Activity Daily Rollup'
+        verbose_name_plural = 'Activity Daily Rollups'
+    
+    def __str__(self):
+        return f"{self.day} user {self.user_id} {self.activity_type}: {self.count}"
+
+class SiteDailyStats(models.Model):
+    """Site-wide counters for one day, kept by rollup_site_stats for the admin dashboard"""
+    day = models.DateField(unique=True)
+    signups = models.PositiveIntegerField(default=0)
+    messages = models.PositiveIntegerField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    matches = models.PositiveIntegerField(default=0)
+    private_access_requests = models.PositiveIntegerField(default=0)
+    date_events = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    METRICS = ('signups', 'messages', 'likes', 'matches', 'private_access_requests', 'date_events')
+    
+    class Meta:
+        ordering = ['day']
+        verbose_name = 'Site Statistics'
+        verbose_name_plural = 'Site Statistics'
+    
+    def __str__(self):
+        return f"Site stats {self.day}"
 
 # === NEW MODEL FOR FIXING PRIVATE IMAGES BUG ===
 class UserIdMapping(models.Model):
@@ -153,10 +353,12 @@ class UserIdMapping(models.Model):
 
 # ======================================
 
-class PrivateAccessRequest(models.Model):
+class PrivateAccessRequest(TrackedFieldsMixin, models.Model):
     """
     Model for tracking private photo access requests between users
     """
+    tracked_fields = ('status',)
+
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('granted', 'Granted'),
@@ -260,6 +462,20 @@ class PrivateImage(models.Model):
     def __str__(self):
         return f"Private image {self.position} for {self.user.username}"
 
+class UserProfileQuerySet(models.QuerySet):
+    def within_km(self, latitude, longitude, radius_km):
+        """
+        Profiles within radius_km of a point, nearest first.
+        Uses the geohash/lat-lon indexes; the exact distance is computed in SQL.
+        """
+        return self.filter(
+            within_radius_q(latitude, longitude, radius_km)
+        ).annotate(
+            distance_km=distance_km_expression(latitude, longitude)
+        ).filter(
+            distance_km__lte=radius_km
+        ).order_by('distance_km', 'id')
+
 class UserProfile(models.Model):
     # Step 1: Basic Information
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -288,6 +504,14 @@ class UserProfile(models.Model):
     is_smoker = models.BooleanField(default=False)
     location = models.CharField(max_length=100, default='Unknown')
     
+    # Resolved from location against the bundled gazetteer (see geo.py)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True)
+    state = models.CharField(max_length=3, blank=True, default='')
+    
+    objects = UserProfileQuerySet.as_manager()
+    
     @property
     def profile_heading(self):
         """For templates expecting profile_heading - maps to profile_name"""
@@ -371,9 +595,50 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude']),
+            # Member search only ever looks at approved + complete profiles,
+            # so these partial indexes skip pending/incomplete rows entirely
+            models.Index(fields=['gender', 'date_of_birth'],
+                         condition=models.Q(is_approved=True, is_complete=True),
+                         name='profile_active_gender_dob_idx'),
+            models.Index(fields=['date_of_birth'],
+                         condition=models.Q(is_approved=True, is_complete=True),
+                         name='profile_active_dob_idx'),
+            models.Index(fields=['body_type', 'relationship_status'],
+                         condition=models.Q(is_approved=True, is_complete=True),
+                         name='profile_active_body_rel_idx'),
+            models.Index(fields=['-created_at'],
+                         condition=models.Q(is_approved=True, is_complete=True),
+                         name='profile_active_recent_idx'),
+            models.Index(fields=['state'],
+                         condition=models.Q(is_approved=True, is_complete=True),
+                         name='profile_active_state_idx'),
+        ]
+
     def __str__(self):
         return f"{self.profile_name} - {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        self.update_coordinates()
+        super().save(*args, **kwargs)
+
+    def update_coordinates(self):
+        """Geocode location offline; clears coordinates/state if it can't be placed"""
+        self.state = geocode_state(self.location)
+        point = geocode(self.location)
+        if point:
+            self.latitude, self.longitude = point
+            self.geohash = encode_geohash(*point)
+        else:
+            self.latitude = self.longitude = None
+            self.geohash = ''
+
+    @property
+    def has_coordinates(self):
+        return self.latitude is not None and self.longitude is not None
+
     def get_profile_image_url(self):
         """Get the best available profile image URL"""
         if self.profile_photo:
@@ -491,22 +756,23 @@ class ProfileEditRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Fields copied onto the profile on approval (profile_photo is handled separately)
+    PROFILE_FIELDS = [
+        'profile_name', 'date_of_birth', 'relationship_status', 'body_type',
+        'has_children', 'children_details', 'is_smoker', 'location', 'story',
+        'personality_traits', 'communication_style', 'life_priorities', 'core_values',
+        'arrangement_preferences', 'lifestyle_interests', 'preferred_age_min',
+        'preferred_age_max', 'preferred_distance', 'trust_level', 'privacy_settings',
+        'notification_preferences', 'height', 'gender', 'looking_for'
+    ]
+    
     def get_changed_fields(self):
         """Compare with current profile and return list of changed field names"""
         try:
             current_profile = self.user.profile
             changed_fields = []
             
-            profile_fields = [
-                'profile_name', 'date_of_birth', 'relationship_status', 'body_type',
-                'has_children', 'children_details', 'is_smoker', 'location', 'story',
-                'personality_traits', 'communication_style', 'life_priorities', 'core_values',
-                'arrangement_preferences', 'lifestyle_interests', 'preferred_age_min',
-                'preferred_age_max', 'preferred_distance', 'trust_level', 'privacy_settings',
-                'notification_preferences', 'height', 'gender', 'looking_for'
-            ]
-            
-            for field in profile_fields:
+            for field in self.PROFILE_FIELDS:
                 current_value = getattr(current_profile, field)
                 new_value = getattr(self, field)
                 
@@ -523,107 +789,216 @@ class ProfileEditRequest(models.Model):
     def approve(self, admin_user, notes=''):
         """Approve the changes and update the user's profile"""
         try:
-            profile = self.user.profile
-            changed_fields = self.get_changed_fields()
+            return bool(ProfileEditRequest.approve_many([self], admin_user, notes))
+        except Exception as e:
+            print(f"Error approving profile edit request: {e}")
+            return False
+    
+    def reject(self, admin_user, notes=''):
+        """Reject the changes"""
+        ProfileEditRequest.reject_many([self], admin_user, notes)
+    
+    @classmethod
+    def approve_many(cls, edit_requests, admin_user, notes=''):
+        """
+        Approve a batch in one transaction: one bulk update each for the
+        profiles and the requests, one bulk insert of log rows, and the
+        approval emails and recommendation refreshes queued rather than
+        run. Requests are applied oldest first; ones whose user has no
+        profile are skipped.
+        Returns the approved requests.
+        """
+        from .mail_queue import queued_email
+        from .recommendations import queue_refresh_many
+        
+        now = timezone.now()
+        profiles = {}
+        profile_fields = {'latitude', 'longitude', 'geohash', 'state', 'updated_at'}
+        approved = []
+        logs = []
+        emails = []
+        
+        for edit_request in sorted(edit_requests, key=lambda r: (r.created_at or now, r.id or 0)):
+            try:
+                profile = profiles.setdefault(edit_request.user_id, edit_request.user.profile)
+            except UserProfile.DoesNotExist:
+                continue
+            # Share the profile so a second request for the same user diffs against the first
+            edit_request.user.profile = profile
+            changed_fields = edit_request.get_changed_fields()
             
             for field in changed_fields:
                 if field != 'profile_photo':
-                    setattr(profile, field, getattr(self, field))
-            
-            if self.profile_photo:
-                profile.profile_photo = self.profile_photo
+                    setattr(profile, field, getattr(edit_request, field))
+            if edit_request.profile_photo:
+                profile.profile_photo = edit_request.profile_photo
+            profile_fields.update(changed_fields)
             
-            profile.save()
+            edit_request.status = 'approved'
+            edit_request.reviewed_by = admin_user
+            edit_request.reviewed_at = now
+            edit_request.admin_notes = notes
+            edit_request.updated_at = now
+            approved.append(edit_request)
             
-            # Update request status
-            self.status = 'approved'
-            self.reviewed_by = admin_user
-            self.reviewed_at = timezone.now()
-            self.admin_notes = notes
-            self.save()
-            
-            # Log the activity
-            from .signals import log_user_activity
-            log_user_activity(
+            logs.append(UserActivityLog(
                 user=admin_user,
                 activity_type='profile_approved',
-                target_user=self.user,
+                target_user_id=edit_request.user_id,
                 additional_data={
-                    'request_id': self.id,
+                    'request_id': edit_request.id,
                     'changed_fields': changed_fields,
-                }
+                },
+                created_at=now,
+            ))
+            if edit_request.user.email:
+                emails.append(queued_email(
+                    edit_request.user.email,
+                    'Profile Update Approved',
+                    'emails/profile_approved.html',
+                    {'user': edit_request.user, 'edit_request': edit_request, 'changed_fields': changed_fields},
+                ))
+        
+        if not approved:
+            return []
+        
+        for profile in profiles.values():
+            profile.update_coordinates()
+            profile.updated_at = now
+        
+        with transaction.atomic():
+            UserProfile.objects.bulk_update(list(profiles.values()), sorted(profile_fields), batch_size=500)
+            cls.objects.bulk_update(
+                approved, ['status', 'reviewed_by', 'reviewed_at', 'admin_notes', 'updated_at'], batch_size=500
             )
-            
-            # Send approval email
-            self._send_approval_email()
-            
-            return True
-        except Exception as e:
-            print(f"Error approving profile edit request: {e}")
-            return False
+            cls._log_and_queue(logs, emails)
+            # Rescoring loads every active member - refresh_recommendations does it outside the request
+            queue_refresh_many(profiles.values())
+        
+        return approved
     
-    def reject(self, admin_user, notes=''):
-        """Reject the changes"""
-        self.status = 'rejected'
-        self.reviewed_by = admin_user
-        self.reviewed_at = timezone.now()
-        self.admin_notes = notes
-        self.save()
+    @classmethod
+    def reject_many(cls, edit_requests, admin_user, notes=''):
+        """Reject a batch in one transaction; the emails are queued. Returns the requests."""
+        from .mail_queue import queued_email
         
-        # Log the activity
-        from .signals import log_user_activity
-        log_user_activity(
-            user=admin_user,
-            activity_type='profile_rejected',
-            target_user=self.user,
-            additional_data={
-                'request_id': self.id,
-                'admin_notes': notes,
-            }
-        )
+        now = timezone.now()
+        rejected = list(edit_requests)
+        logs = []
+        emails = []
+        
+        for edit_request in rejected:
+            edit_request.status = 'rejected'
+            edit_request.reviewed_by = admin_user
+            edit_request.reviewed_at = now
+            edit_request.admin_notes = notes
+            edit_request.updated_at = now
+            
+            logs.append(UserActivityLog(
+                user=admin_user,
+                activity_type='profile_rejected',
+                target_user_id=edit_request.user_id,
+                additional_data={
+                    'request_id': edit_request.id,
+                    'admin_notes': notes,
+                },
+                created_at=now,
+            ))
+            if edit_request.user.email:
+                emails.append(queued_email(
+                    edit_request.user.email,
+                    'Profile Update Rejected',
+                    'emails/profile_rejected.html',
+                    {'user': edit_request.user, 'edit_request': edit_request, 'reason': notes},
+                ))
         
-        # Send rejection email
-        self._send_rejection_email()
-    
-    def _send_approval_email(self):
-        """Send email notification to user about approval"""
-        subject = 'Profile Update Approved'
-        html_message = render_to_string('emails/profile_update_approved.html', {
-            'user': self.user,
-            'edit_request': self,
-            'changed_fields': self.get_changed_fields(),
-        })
-        plain_message = strip_tags(html_message)
+        if not rejected:
+            return []
         
-        send_mail(
-            subject,
-            plain_message,
-            settings.DEFAULT_FROM_EMAIL,
-            [self.user.email],
-            html_message=html_message,
-        )
-    
-    def _send_rejection_email(self):
-        """Send email notification to user about rejection"""
-        subject = 'Profile Update Rejected'
-        html_message = render_to_string('emails/profile_update_rejected.html', {
-            'user': self.user,
-            'edit_request': self,
-            'admin_notes': self.admin_notes,
-        })
-        plain_message = strip_tags(html_message)
+        with transaction.atomic():
+            cls.objects.bulk_update(
+                rejected, ['status', 'reviewed_by', 'reviewed_at', 'admin_notes', 'updated_at'], batch_size=500
+            )
+            cls._log_and_queue(logs, emails)
         
-        send_mail(
-            subject,
-            plain_message,
-            settings.DEFAULT_FROM_EMAIL,
-            [self.user.email],
-            html_message=html_message,
-        )
+        return rejected
+    
+    @staticmethod
+    def _log_and_queue(logs, emails):
+        for log in logs:
+            log.promote_keys()
+        UserActivityLog.objects.bulk_create(logs, batch_size=500)
+        QueuedEmail.objects.bulk_create(emails, batch_size=500)
     
     def __str__(self):
         return f"Edit Request - {self.user.username} ({self.status})"
 
+class QueuedEmail(models.Model):
+    """Outgoing email waiting for send_queued_emails - see mail_queue.py"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Queued Email'
+        verbose_name_plural = 'Queued Emails'
+        indexes = [
+            # The worker only ever reads the (small) pending backlog
+            models.Index(fields=['id'], condition=models.Q(status='pending'),
+                         name='queuedemail_pending_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
+class DataExport(models.Model):
+    """A member's complete data export, built in the background by process_data_exports"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='data_exports')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='data_exports/', blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    row_counts = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='dataexport_user_created_idx'),
+            models.Index(fields=['id'], condition=models.Q(status='pending'),
+                         name='dataexport_pending_idx'),
+        ]
+        verbose_name = 'Data Export'
+        verbose_name_plural = 'Data Exports'
+    
+    def __str__(self):
+        return f"Data export for {self.user.username} ({self.status})"
+    
+    def get_absolute_url(self):
+        return reverse('download_data_export', args=[self.id])
+
 class TrustIndicator(models.Model):
     """Tracks trust-building activities - NOT VERIFICATION"""
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -713,6 +1088,10 @@ class UserLike(models.Model):
     
     class Meta:
         unique_together = ['user', 'liked_user_id']
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='like_user_created_idx'),
+            models.Index(fields=['created_at'], name='like_created_idx'),
+        ]
 
 class UserFavorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites')
@@ -730,7 +1109,43 @@ class UserBlock(models.Model):
     class Meta:
         unique_together = ['user', 'blocked_user_id']
 
-class DateEvent(models.Model):
+class DateEventQuerySet(models.QuerySet):
+    def upcoming(self):
+        """Live events still to come, soonest first - served by date_upcoming_idx"""
+        return self.filter(is_cancelled=False, date_time__gt=timezone.now()).order_by('date_time', 'id')
+
+    def archived(self):
+        """Events that have already happened, most recent first"""
+        return self.filter(is_cancelled=False, date_time__lte=timezone.now()).order_by('-date_time', '-id')
+
+    def new_for(self, user, seen_until=None):
+        """Upcoming events posted since the user's watermark - a range count on date_new_idx"""
+        queryset = self.upcoming().exclude(host=user)
+        if seen_until:
+            queryset = queryset.filter(created_at__gt=seen_until)
+        return queryset
+
+    def with_seen(self, user, seen_until=None):
+        """
+        Annotate a per-row `seen` flag in SQL instead of testing id lists in the template.
+        Anything posted before the watermark is seen; newer events need an explicit DateView.
+        """
+        seen = models.Exists(DateView.objects.filter(user=user, date_event=models.OuterRef('pk')))
+        if seen_until:
+            seen = models.ExpressionWrapper(
+                seen | models.Q(created_at__lte=seen_until), output_field=models.BooleanField()
+            )
+        return self.annotate(seen=seen)
+
+    def with_rsvp(self, user):
+        """Annotate `is_going` for the user in the same query"""
+        return self.annotate(is_going=models.Exists(
+            DateRSVP.objects.filter(user=user, date_event=models.OuterRef('pk'))
+        ))
+
+class DateEvent(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('is_cancelled',)
+
     ACTIVITY_CHOICES = [
         ('Coffee', 'Coffee'),
         ('Drinks / Wine Bar', 'Drinks / Wine Bar'),
@@ -789,17 +1204,55 @@ class DateEvent(models.Model):
     group_size = models.CharField(max_length=50, choices=GROUP_SIZE_CHOICES)
     audience = models.CharField(max_length=50, choices=AUDIENCE_CHOICES)
     is_cancelled = models.BooleanField(default=False)
+    # Denormalized count of DateRSVP rows - only ever changed with conditional F() updates
+    attendee_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DateEventQuerySet.as_manager()
+
+    # Guests allowed besides the host (None = no limit)
+    GROUP_SIZE_CAPACITY = {
+        '1_on_1': 1,
+        'small_group': 3,
+        'group': None,
+    }
+    AUDIENCE_GENDERS = {
+        'women_only': 'female',
+        'men_only': 'male',
+    }
+
     class Meta:
         ordering = ['date_time']
+        indexes = [
+            models.Index(fields=['is_cancelled', 'date_time'], name='date_upcoming_idx'),
+            models.Index(fields=['is_cancelled', 'created_at'], name='date_new_idx'),
+            # Date discovery filters live events on one choice and sorts by date_time
+            models.Index(fields=['activity', 'date_time'], condition=models.Q(is_cancelled=False),
+                         name='date_live_activity_idx'),
+            models.Index(fields=['area', 'date_time'], condition=models.Q(is_cancelled=False),
+                         name='date_live_area_idx'),
+            models.Index(fields=['audience', 'date_time'], condition=models.Q(is_cancelled=False),
+                         name='date_live_audience_idx'),
+            models.Index(fields=['vibe', 'budget', 'date_time'], condition=models.Q(is_cancelled=False),
+                         name='date_live_vibe_budget_idx'),
+        ]
         verbose_name = 'Date Event'
         verbose_name_plural = 'Date Events'
 
     def __str__(self):
         return f"{self.title} by {self.host.username}"
 
+    def save(self, *args, **kwargs):
+        # A full save of a loaded row would write back a stale attendee_count over
+        # concurrent join()/leave() updates - the counter is only written by those
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'attendee_count'
+            ]
+        super().save(*args, **kwargs)
+
     def get_audience_display(self):
         return dict(self.AUDIENCE_CHOICES).get(self.audience, self.audience)
 
@@ -812,6 +1265,59 @@ class DateEvent(models.Model):
     def is_past(self):
         return self.date_time <= timezone.now()
 
+    @property
+    def capacity(self):
+        return self.GROUP_SIZE_CAPACITY.get(self.group_size)
+
+    def spots_left(self):
+        if self.capacity is None:
+            return None
+        return max(self.capacity - self.attendee_count, 0)
+
+    def join(self, user):
+        """
+        RSVP user to this date. Returns (success, error).
+        The counter is bumped with a conditional UPDATE, so concurrent joins
+        can never push it past capacity and no row lock outlives the request.
+        """
+        if self.host_id == user.id:
+            return False, 'You are hosting this date'
+
+        required_gender = self.AUDIENCE_GENDERS.get(self.audience)
+        if required_gender and not UserProfile.objects.filter(user=user, gender=required_gender).exists():
+            return False, f'This date is {self.get_audience_display().lower()}'
+
+        if DateRSVP.objects.filter(date_event=self, user=user).exists():
+            return False, 'You are already going'
+
+        seat = DateEvent.objects.filter(pk=self.pk, is_cancelled=False, date_time__gt=timezone.now())
+        if self.capacity is not None:
+            seat = seat.filter(attendee_count__lt=self.capacity)
+
+        try:
+            with transaction.atomic():
+                if not seat.update(attendee_count=models.F('attendee_count') + 1):
+                    return False, 'This date is full or no longer open'
+                DateRSVP.objects.create(date_event=self, user=user)
+        except IntegrityError:
+            # Already going - the counter bump was rolled back with the insert
+            return False, 'You are already going'
+
+        self.refresh_from_db(fields=['attendee_count'])
+        return True, None
+
+    def leave(self, user):
+        """Withdraw user's RSVP. Returns True if they were going."""
+        with transaction.atomic():
+            deleted, _ = DateRSVP.objects.filter(date_event=self, user=user).delete()
+            if deleted:
+                DateEvent.objects.filter(pk=self.pk, attendee_count__gt=0).update(
+                    attendee_count=models.F('attendee_count') - 1
+                )
+        if deleted:
+            self.refresh_from_db(fields=['attendee_count'])
+        return bool(deleted)
+
 class DateView(models.Model):
     """Track which users have seen which dates"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -825,3 +1331,85 @@ class DateView(models.Model):
 
     def __str__(self):
         return f"{self.user.username} viewed {self.date_event.title}"
+
+class RecommendedCandidate(models.Model):
+    """Precomputed top-N candidates per member (rebuilt by precompute_recommendations)"""
+    viewer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommended_candidates',
+                               db_index=False)
+    candidate = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['viewer', 'candidate']
+        indexes = [
+            # Dashboard reads one viewer's list in rank order
+            models.Index(fields=['viewer', 'rank'], name='recommended_viewer_rank_idx'),
+        ]
+        verbose_name = 'Recommended Candidate'
+        verbose_name_plural = 'Recommended Candidates'
+
+    def __str__(self):
+        return f"#{self.rank} for user {self.viewer_id}: profile {self.candidate_id}"
+
+class PendingRecommendationRefresh(models.Model):
+    """A member whose recommendations refresh_recommendations still has to patch"""
+    profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, related_name='+')
+    queued_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Pending Recommendation Refresh'
+        verbose_name_plural = 'Pending Recommendation Refreshes'
+
+    def __str__(self):
+        return f"Refresh recommendations for profile {self.profile_id}"
+
+class DateSeenWatermark(models.Model):
+    """
+    When the user last looked at the dates feed.
+    Events created before this count as seen, so the badge is a range count
+    instead of a NOT IN over every DateView the user ever made.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                related_name='date_seen_watermark')
+    seen_until = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Date Seen Watermark'
+        verbose_name_plural = 'Date Seen Watermarks'
+
+    def __str__(self):
+        return f"{self.user_id} saw dates up to {self.seen_until}"
+
+    @classmethod
+    def get_for(cls, user):
+        """The user's watermark, or None if they've never opened the feed"""
+        return cls.objects.filter(user=user).values_list('seen_until', flat=True).first()
+
+    @classmethod
+    def advance(cls, user, when=None):
+        """Move the watermark forward (never back)"""
+        when = when or timezone.now()
+        updated = cls.objects.filter(user=user, seen_until__lt=when).update(seen_until=when)
+        if not updated:
+            cls.objects.get_or_create(user=user, defaults={'seen_until': when})
+
+class DateRSVP(models.Model):
+    """A member going to someone's date (DateEvent.attendee_count mirrors these rows)"""
+    date_event = models.ForeignKey(DateEvent, on_delete=models.CASCADE, related_name='rsvps')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='date_rsvps')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['date_event', 'user']
+        indexes = [
+            # "My upcoming dates" and the attendee list both read one side in join order
+            models.Index(fields=['user', 'created_at'], name='rsvp_user_idx'),
+            models.Index(fields=['date_event', 'created_at'], name='rsvp_event_idx'),
+        ]
+        verbose_name = 'Date RSVP'
+        verbose_name_plural = 'Date RSVPs'
+
+    def __str__(self):
+        return f"{self.user_id} going to date {self.date_event_id}"
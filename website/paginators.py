@@ -0,0 +1,114 @@
+# paginators.py - Admin paginator that estimates counts on huge tables
+"""
+The admin counts every changelist with SELECT COUNT(*), which on
+Message / UserActivityLog reads the whole table. Once a table is past
+ADMIN_ESTIMATE_THRESHOLD rows, EstimatedCountPaginator uses:
+
+  - unfiltered list: the table size estimate (PostgreSQL pg_class.reltuples,
+    summed over partitions; SQLite: an exact count cached for a few minutes)
+  - filtered list (PostgreSQL): the planner's row estimate for the query,
+    unless it is below the threshold - a selective filter is cheap to count
+    exactly, so it is
+
+and the pagination line reads "about N".
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db import connections
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 50000
+SQLITE_COUNT_TTL = 600
+
+
+def table_estimate(model, using='default'):
+    """Approximate row count for model's table (None if unknown)"""
+    connection = connections[using]
+    table = model._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # reltuples is -1/0 on a partitioned parent - add up its partitions
+            cursor.execute(
+                "SELECT GREATEST(c.reltuples, 0) + COALESCE(("
+                "  SELECT SUM(GREATEST(p.reltuples, 0)) FROM pg_inherits i "
+                "  JOIN pg_class p ON p.oid = i.inhrelid WHERE i.inhparent = c.oid"
+                "), 0) FROM pg_class c WHERE c.oid = %s::regclass",
+                [table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+    return cache.get_or_set(
+        f'admin_table_count:{using}:{table}',
+        lambda: model._default_manager.using(using).count(),
+        SQLITE_COUNT_TTL,
+    )
+
+
+def query_estimate(queryset):
+    """PostgreSQL planner's row estimate for a queryset (None elsewhere)"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+    except Exception as e:
+        print(f"Error estimating row count: {e}")
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count is an estimate past the threshold; see module docstring"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        threshold = getattr(settings, 'ADMIN_ESTIMATE_THRESHOLD', ESTIMATE_THRESHOLD)
+        queryset = self.object_list
+        total = table_estimate(queryset.model, queryset.db)
+        if total is None or total < threshold:
+            return queryset.count()
+
+        if not queryset.query.where:
+            self.estimated = True
+            return total
+
+        rows = query_estimate(queryset)
+        if rows is not None and rows >= threshold:
+            self.estimated = True
+            return rows
+        return queryset.count()
+
+    def validate_number(self, number):
+        self.count  # sets self.estimated
+        if not self.estimated:
+            return super().validate_number(number)
+        # An estimate can be off either way - never reject a page past the "last" one
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.estimated:
+            return super().page(number)
+        # ...nor cut the last page off at the estimate
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
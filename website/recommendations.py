@@ -0,0 +1,424 @@
+# recommendations.py - Candidate scoring and the precomputed "Recommended" lists
+import heapq
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .geo import haversine_km
+from .models import UserProfile, UserBlock, RecommendedCandidate, PendingRecommendationRefresh
+
+TOP_N = 50
+
+# Weights for each scoring signal (a perfect match scores 1.0)
+WEIGHTS = {
+    'age': 0.30,
+    'mutual_age': 0.15,
+    'distance': 0.25,
+    'interests': 0.10,
+    'values': 0.10,
+    'arrangements': 0.10,
+}
+
+FEATURE_FIELDS = [
+    'id', 'user_id', 'date_of_birth', 'latitude', 'longitude',
+    'preferred_age_min', 'preferred_age_max', 'preferred_distance',
+    'lifestyle_interests', 'core_values', 'life_priorities', 'arrangement_preferences',
+]
+
+ACTIVE_MEMBER_Q = Q(is_approved=True, is_complete=True)
+
+
+# ==================== FEATURES ====================
+
+def _age(dob, today):
+    if not dob:
+        return None
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+def _tags(value):
+    """JSON list/dict fields -> frozenset of lowercase tags"""
+    if isinstance(value, dict):
+        value = [key for key, enabled in value.items() if enabled]
+    if not isinstance(value, (list, tuple)):
+        return frozenset()
+    return frozenset(str(item).strip().lower() for item in value if item)
+
+
+def features_from_row(row, today=None):
+    """
+    Plain, picklable features for one profile (a .values() row).
+    Workers only ever see these - they never touch the database.
+    """
+    today = today or date.today()
+    return {
+        'profile_id': row['id'],
+        'user_id': row['user_id'],
+        'age': _age(row['date_of_birth'], today),
+        'lat': row['latitude'],
+        'lon': row['longitude'],
+        'age_min': row['preferred_age_min'],
+        'age_max': row['preferred_age_max'],
+        'max_km': row['preferred_distance'],
+        'interests': _tags(row['lifestyle_interests']),
+        'values': _tags(row['core_values']) | _tags(row['life_priorities']),
+        'arrangements': _tags(row['arrangement_preferences']),
+    }
+
+
+def load_member_features(queryset=None):
+    """Features for every active member, in user_id order"""
+    queryset = queryset if queryset is not None else UserProfile.objects.filter(ACTIVE_MEMBER_Q)
+    today = date.today()
+    return [
+        features_from_row(row, today)
+        for row in queryset.order_by('user_id').values(*FEATURE_FIELDS).iterator(chunk_size=2000)
+    ]
+
+
+def load_block_pairs():
+    """{user_id: {user_ids hidden from them}} - blocks hide members both ways"""
+    hidden = {}
+    for user_id, blocked_user_id in UserBlock.objects.values_list('user_id', 'blocked_user_id').iterator():
+        hidden.setdefault(user_id, set()).add(blocked_user_id)
+        hidden.setdefault(blocked_user_id, set()).add(user_id)
+    return hidden
+
+
+# ==================== SCORING ====================
+
+def _age_fit(age, age_min, age_max):
+    """1.0 inside the preferred range, fading out over 10 years either side"""
+    if age is None or age_min is None or age_max is None:
+        return 0.5
+    if age_min <= age <= age_max:
+        return 1.0
+    gap = age_min - age if age < age_min else age - age_max
+    return max(0.0, 1.0 - gap / 10)
+
+
+def _distance_fit(viewer, candidate):
+    if viewer['lat'] is None or candidate['lat'] is None:
+        return 0.3
+    km = haversine_km(viewer['lat'], viewer['lon'], candidate['lat'], candidate['lon'])
+    limit = max(viewer['max_km'] or 50, 1)
+    if km <= limit:
+        return 1.0 - 0.5 * (km / limit)
+    return max(0.0, 0.5 - (km - limit) / (limit * 4))
+
+
+def _overlap(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def score_pair(viewer, candidate):
+    """How good a match candidate is for viewer (0.0 - 1.0)"""
+    return (
+        WEIGHTS['age'] * _age_fit(candidate['age'], viewer['age_min'], viewer['age_max'])
+        + WEIGHTS['mutual_age'] * _age_fit(viewer['age'], candidate['age_min'], candidate['age_max'])
+        + WEIGHTS['distance'] * _distance_fit(viewer, candidate)
+        + WEIGHTS['interests'] * _overlap(viewer['interests'], candidate['interests'])
+        + WEIGHTS['values'] * _overlap(viewer['values'], candidate['values'])
+        + WEIGHTS['arrangements'] * _overlap(viewer['arrangements'], candidate['arrangements'])
+    )
+
+
+def rank_candidates(viewer, pool, hidden_user_ids=(), top_n=TOP_N):
+    """Top-N [(profile_id, score), ...] for one viewer, best first"""
+    scored = (
+        (score_pair(viewer, candidate), -candidate['profile_id'], candidate['profile_id'])
+        for candidate in pool
+        if candidate['user_id'] != viewer['user_id'] and candidate['user_id'] not in hidden_user_ids
+    )
+    return [(profile_id, round(score, 6)) for score, _, profile_id in heapq.nlargest(top_n, scored)]
+
+
+# ==================== WORKER PROCESSES ====================
+
+_worker_pool = None
+_worker_hidden = None
+_worker_top_n = TOP_N
+
+
+def init_worker(pool, hidden, top_n):
+    """ProcessPoolExecutor initializer - ship the candidate pool once per process"""
+    global _worker_pool, _worker_hidden, _worker_top_n
+    _worker_pool = pool
+    _worker_hidden = hidden
+    _worker_top_n = top_n
+
+
+def rank_shard(viewers):
+    """Rank candidates for a shard of viewers inside a worker process"""
+    return [
+        (viewer['user_id'], rank_candidates(
+            viewer, _worker_pool, _worker_hidden.get(viewer['user_id'], ()), _worker_top_n
+        ))
+        for viewer in viewers
+    ]
+
+
+# ==================== STORAGE ====================
+
+def store_rankings(rankings, computed_at=None):
+    """Replace the stored lists for the given viewers in one transaction"""
+    computed_at = computed_at or timezone.now()
+    rows = [
+        RecommendedCandidate(
+            viewer_id=viewer_user_id, candidate_id=profile_id,
+            rank=rank, score=score, computed_at=computed_at,
+        )
+        for viewer_user_id, ranked in rankings
+        for rank, (profile_id, score) in enumerate(ranked, start=1)
+    ]
+    with transaction.atomic():
+        RecommendedCandidate.objects.filter(
+            viewer_id__in=[viewer_user_id for viewer_user_id, ranked in rankings]
+        ).delete()
+        RecommendedCandidate.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def prune_inactive():
+    """Drop lists owned by, or pointing at, members who are no longer active"""
+    active_profiles = UserProfile.objects.filter(ACTIVE_MEMBER_Q)
+    deleted, _ = RecommendedCandidate.objects.exclude(
+        viewer_id__in=active_profiles.values('user_id')
+    ).delete()
+    stale, _ = RecommendedCandidate.objects.exclude(
+        candidate_id__in=active_profiles.values('id')
+    ).delete()
+    return deleted + stale
+
+
+# ==================== INCREMENTAL REFRESH ====================
+
+def refresh_member(profile, top_n=TOP_N):
+    """
+    Patch stored lists after one member changes, without a full rebuild.
+
+    Rescores only this member: rebuilds their own list, then inserts,
+    rescores or removes them in other members' lists. Only rows that
+    point at the member are read up front; a viewer's list is touched
+    only if the member enters it (evicting the lowest entry when it is
+    full), moves within it or leaves it. A member who drops out of
+    someone's top-N keeps their (lower) score until the nightly rebuild
+    brings in the next-best candidate.
+    """
+    return refresh_members([profile], top_n)
+
+
+def refresh_members(profiles, top_n=TOP_N):
+    """refresh_member for several members, loading the pool once"""
+    profiles = list(profiles)
+    inactive = [profile for profile in profiles if not (profile.is_approved and profile.is_complete)]
+    if inactive:
+        with transaction.atomic():
+            RecommendedCandidate.objects.filter(viewer_id__in=[profile.user_id for profile in inactive]).delete()
+            RecommendedCandidate.objects.filter(candidate_id__in=[profile.id for profile in inactive]).delete()
+
+    active_ids = {profile.user_id for profile in profiles if profile.is_approved and profile.is_complete}
+    if not active_ids:
+        return 0
+
+    pool = load_member_features()
+    members = [features for features in pool if features['user_id'] in active_ids]
+    if not members:
+        return 0
+    member_ids = {member['user_id'] for member in members}
+
+    hidden = {user_id: set() for user_id in member_ids}
+    for blocker_id, blocked_id in UserBlock.objects.filter(
+        Q(user_id__in=member_ids) | Q(blocked_user_id__in=member_ids)
+    ).values_list('user_id', 'blocked_user_id'):
+        if blocker_id in hidden:
+            hidden[blocker_id].add(blocked_id)
+        if blocked_id in hidden:
+            hidden[blocked_id].add(blocker_id)
+
+    computed_at = timezone.now()
+    stored = store_rankings([
+        (member['user_id'], rank_candidates(member, pool, hidden[member['user_id']], top_n))
+        for member in members
+    ], computed_at)
+
+    # Where the members already appear: {viewer_id: {profile_id: score}}
+    others = RecommendedCandidate.objects.exclude(viewer_id__in=member_ids)
+    listed = {}
+    for viewer_id, candidate_id, score in others.filter(
+        candidate_id__in=[member['profile_id'] for member in members]
+    ).values_list('viewer_id', 'candidate_id', 'score'):
+        listed.setdefault(viewer_id, {})[candidate_id] = score
+    # Lowest score on each full list - ranks are kept 1..n in score order
+    floors = dict(others.filter(rank=top_n).values_list('viewer_id', 'score'))
+
+    changes = {}
+    for viewer in pool:
+        viewer_id = viewer['user_id']
+        if viewer_id in member_ids:
+            continue
+        current = listed.get(viewer_id, {})
+        floor = floors.get(viewer_id)
+
+        for member in members:
+            profile_id = member['profile_id']
+            if viewer_id in hidden[member['user_id']]:
+                if profile_id in current:
+                    changes.setdefault(viewer_id, {})[profile_id] = None
+                continue
+            score = round(score_pair(viewer, member), 6)
+            if profile_id in current:
+                if score != current[profile_id]:
+                    changes.setdefault(viewer_id, {})[profile_id] = score
+            elif floor is None or score > floor:
+                changes.setdefault(viewer_id, {})[profile_id] = score
+
+    return stored + patch_lists(changes, top_n, computed_at)
+
+
+def patch_lists(changes, top_n=TOP_N, computed_at=None):
+    """
+    Apply {viewer_id: {profile_id: score, or None to remove}} to stored lists.
+    Writes only the rows that are added, rescored, re-ranked or dropped
+    (removed, or evicted from a full list); returns rows written.
+    """
+    if not changes:
+        return 0
+    computed_at = computed_at or timezone.now()
+    with transaction.atomic():
+        stored = {}
+        for row in RecommendedCandidate.objects.select_for_update().filter(viewer_id__in=list(changes)):
+            stored.setdefault(row.viewer_id, {})[row.candidate_id] = row
+
+        created, updated, deleted = [], [], []
+        for viewer_id, patch in changes.items():
+            current = stored.get(viewer_id, {})
+            scores = {profile_id: row.score for profile_id, row in current.items()}
+            for profile_id, score in patch.items():
+                if score is None:
+                    scores.pop(profile_id, None)
+                else:
+                    scores[profile_id] = score
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_n]
+            for rank, (profile_id, score) in enumerate(ranked, start=1):
+                row = current.pop(profile_id, None)
+                if row is None:
+                    created.append(RecommendedCandidate(
+                        viewer_id=viewer_id, candidate_id=profile_id,
+                        rank=rank, score=score, computed_at=computed_at,
+                    ))
+                elif row.rank != rank or row.score != score:
+                    if row.score != score:
+                        row.computed_at = computed_at
+                    row.rank, row.score = rank, score
+                    updated.append(row)
+            # Whatever is left was removed or pushed off the end
+            deleted.extend(row.id for row in current.values())
+
+        if deleted:
+            RecommendedCandidate.objects.filter(id__in=deleted).delete()
+        RecommendedCandidate.objects.bulk_update(updated, ['rank', 'score', 'computed_at'], batch_size=1000)
+        RecommendedCandidate.objects.bulk_create(created, batch_size=1000)
+    return len(created) + len(updated) + len(deleted)
+
+
+def schedule_refresh(profile):
+    """Refresh once the surrounding transaction commits; never fails the caller"""
+    if not getattr(settings, 'RECOMMENDATIONS_LIVE_REFRESH', True):
+        return
+
+    def _refresh():
+        try:
+            refresh_member(profile)
+        except Exception as e:
+            print(f"Error refreshing recommendations for profile {profile.id}: {e}")
+
+    transaction.on_commit(_refresh)
+
+
+def queue_refresh_many(profiles):
+    """
+    Queue a batch for refresh_recommendations instead of rescoring in the request.
+    Rows are written in the caller's transaction, so nothing is queued for
+    work that rolls back; a member queued twice is refreshed once.
+    """
+    profiles = list(profiles)
+    if not profiles or not getattr(settings, 'RECOMMENDATIONS_LIVE_REFRESH', True):
+        return
+    PendingRecommendationRefresh.objects.bulk_create(
+        [PendingRecommendationRefresh(profile_id=profile.id) for profile in profiles],
+        ignore_conflicts=True,
+    )
+
+
+def refresh_queued(batch_size=500):
+    """
+    Refresh up to batch_size queued members in one pass (one pool load);
+    returns how many were refreshed. Rows are claimed with SKIP LOCKED on
+    PostgreSQL, and put back if the refresh fails.
+    """
+    with transaction.atomic():
+        profile_ids = list(
+            PendingRecommendationRefresh.objects.select_for_update(skip_locked=True)
+            .order_by('id').values_list('profile_id', flat=True)[:batch_size]
+        )
+        if not profile_ids:
+            return 0
+        PendingRecommendationRefresh.objects.filter(profile_id__in=profile_ids).delete()
+
+    # Current rows, not the queued-time copies - and members deleted since are gone
+    profiles = list(UserProfile.objects.filter(id__in=profile_ids))
+    try:
+        refresh_members(profiles)
+    except Exception as e:
+        print(f"Error refreshing recommendations for {len(profiles)} profile(s): {e}")
+        queue_refresh_many(profiles)
+        return 0
+    return len(profiles)
+
+
+# ==================== DASHBOARD ====================
+
+def recommended_for(user, limit=8):
+    """
+    Dashboard cards for user's stored recommendations.
+    One query on the (viewer, rank) index; blocks made since the last
+    rebuild are filtered out in the same query.
+    """
+    blocked_ids = UserBlock.objects.filter(user=user).values('blocked_user_id')
+    blocked_by_ids = UserBlock.objects.filter(blocked_user_id=user.id).values('user_id')
+    rows = RecommendedCandidate.objects.filter(viewer=user).exclude(
+        candidate__user_id__in=blocked_ids
+    ).exclude(
+        candidate__user_id__in=blocked_by_ids
+    ).order_by('rank').values(
+        'candidate_id', 'candidate__profile_name', 'candidate__date_of_birth',
+        'candidate__location', 'candidate__profile_image_url', 'candidate__profile_photo',
+        'candidate__user__username',
+    )[:limit]
+
+    today = date.today()
+    cards = []
+    for row in rows:
+        if row['candidate__profile_image_url']:
+            profile_image = row['candidate__profile_image_url']
+        elif row['candidate__profile_photo']:
+            profile_image = f"{settings.MEDIA_URL}{row['candidate__profile_photo']}"
+        else:
+            profile_image = None
+        age = _age(row['candidate__date_of_birth'], today)
+        cards.append({
+            # Same keys as db_helpers.get_all_profiles so the dashboard card markup is shared
+            'user_id': row['candidate_id'],
+            'display_name': row['candidate__profile_name'] or row['candidate__user__username'],
+            'age': str(age) if age is not None else 'Not provided',
+            'location': row['candidate__location'],
+            'profile_image': profile_image,
+        })
+    return cards
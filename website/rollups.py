@@ -0,0 +1,191 @@
+# rollups.py - Daily per-user / per-type activity counts and site-wide daily stats
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import (
+    UserActivityLog, ActivityDailyRollup, SiteDailyStats,
+    Message, UserLike, PrivateAccessRequest, DateEvent
+)
+
+
+def day_bounds(day):
+    """Aware datetimes [start, end) for a calendar day in the site timezone"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    return start, start + timedelta(days=1)
+
+
+def perspective_counts(logs):
+    """
+    {(user_id, activity_type): count} for both sides of two-party rows:
+    the actor's row, plus the mirrored type (message_received...) for the counterpart.
+    """
+    counts = {}
+    for row in logs.order_by().values('user_id', 'activity_type').annotate(count=Count('id')):
+        key = (row['user_id'], row['activity_type'])
+        counts[key] = counts.get(key, 0) + row['count']
+
+    mirrored = logs.filter(
+        activity_type__in=list(UserActivityLog.COUNTERPART_TYPES), target_user_id__isnull=False
+    ).order_by().values('target_user_id', 'activity_type').annotate(count=Count('id'))
+    for row in mirrored:
+        key = (row['target_user_id'], UserActivityLog.COUNTERPART_TYPES[row['activity_type']])
+        counts[key] = counts.get(key, 0) + row['count']
+    return counts
+
+
+def rollup_day(day):
+    """(Re)build the rollup rows for one day from that day's raw logs"""
+    start, end = day_bounds(day)
+    counts = perspective_counts(UserActivityLog.objects.between(start, end))
+
+    rows = [
+        ActivityDailyRollup(day=day, user_id=user_id, activity_type=activity_type, count=count)
+        for (user_id, activity_type), count in counts.items()
+    ]
+    with transaction.atomic():
+        ActivityDailyRollup.objects.filter(day=day).delete()
+        ActivityDailyRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rolled_through():
+    """
+    Last day whose rollup is known to be complete (None if the job has never run).
+    The newest stored day may have been rolled up while still in progress
+    (today's always is), so it never counts.
+    """
+    last = ActivityDailyRollup.objects.aggregate(last=Max('day'))['last']
+    if last is None:
+        return None
+    return min(last, timezone.localdate()) - timedelta(days=1)
+
+
+def next_rollup_day():
+    """
+    Where the nightly rollup picks up: the day after rolled_through(), or -
+    before the first run - the day of the oldest log, so no history is skipped.
+    """
+    last_day = rolled_through()
+    if last_day:
+        return last_day + timedelta(days=1)
+    first = UserActivityLog.objects.aggregate(first=Min('created_at'))['first']
+    return timezone.localtime(first).date() if first else timezone.localdate()
+
+
+def activity_totals(user_ids):
+    """
+    {user_id: total activity rows} without scanning raw history:
+    rollups up to the last rolled day + raw rows after it.
+    """
+    user_ids = list(user_ids)
+    totals = dict.fromkeys(user_ids, 0)
+    last_day = rolled_through()
+
+    raw = UserActivityLog.objects.involving(user_ids)
+    if last_day:
+        for row in ActivityDailyRollup.objects.filter(
+            user_id__in=user_ids, day__lte=last_day
+        ).order_by().values(
+            'user_id'
+        ).annotate(total=Sum('count')):
+            totals[row['user_id']] += row['total']
+        raw = raw.filter(created_at__gte=day_bounds(last_day)[1])
+
+    for (user_id, activity_type), count in perspective_counts(raw).items():
+        if user_id in totals:
+            totals[user_id] += count
+    return totals
+
+
+# ==================== SITE-WIDE DAILY STATS ====================
+
+def site_metric_sources():
+    """{metric: (queryset, timestamp field)} - one row per counted event"""
+    # A match is counted on the day of the second like (ties broken by id)
+    earlier_like_back = UserLike.objects.filter(
+        user_id=OuterRef('liked_user_id'),
+        liked_user_id=OuterRef('user_id'),
+    ).filter(
+        Q(created_at__lt=OuterRef('created_at'))
+        | Q(created_at=OuterRef('created_at'), id__lt=OuterRef('id'))
+    )
+    return {
+        'signups': (User.objects.all(), 'date_joined'),
+        'messages': (Message.objects.all(), 'created_at'),
+        'likes': (UserLike.objects.all(), 'created_at'),
+        'matches': (UserLike.objects.filter(Exists(earlier_like_back)), 'created_at'),
+        'private_access_requests': (PrivateAccessRequest.objects.all(), 'created_at'),
+        'date_events': (DateEvent.objects.all(), 'created_at'),
+    }
+
+
+def site_counts(since, until):
+    """{day: {metric: count}} for since..until inclusive - one grouped range scan per metric"""
+    start, end = day_bounds(since)[0], day_bounds(until)[1]
+    tz = timezone.get_current_timezone()
+    counts = {}
+    for metric, (queryset, field) in site_metric_sources().items():
+        rows = queryset.filter(**{f'{field}__gte': start, f'{field}__lt': end}).order_by().annotate(
+            day=TruncDate(field, tzinfo=tz)
+        ).values('day').annotate(count=Count('id'))
+        for row in rows:
+            counts.setdefault(row['day'], {})[metric] = row['count']
+    return counts
+
+
+def first_site_day():
+    """Day of the first signup - where a first rollup starts"""
+    first = User.objects.aggregate(first=Min('date_joined'))['first']
+    return timezone.localtime(first).date() if first else None
+
+
+def rollup_site_stats(since=None, until=None):
+    """
+    (Re)build SiteDailyStats for since..until (inclusive). By default it
+    picks up from the last stored day - which may have been rolled up
+    while still in progress - through today. Returns the days written.
+    """
+    until = until or timezone.localdate()
+    if since is None:
+        since = SiteDailyStats.objects.aggregate(last=Max('day'))['last'] or first_site_day()
+    if since is None or since > until:
+        return 0
+
+    counts = site_counts(since, until)
+    rows = []
+    day = since
+    while day <= until:
+        rows.append(SiteDailyStats(day=day, **{
+            metric: counts.get(day, {}).get(metric, 0) for metric in SiteDailyStats.METRICS
+        }))
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        SiteDailyStats.objects.filter(day__gte=since, day__lte=until).delete()
+        SiteDailyStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def site_stats_series(since, until, by_month=False):
+    """[{'period': date, metric: count, ...}] from the stats table, per day or per month"""
+    rows = SiteDailyStats.objects.filter(day__gte=since, day__lte=until)
+    metrics = SiteDailyStats.METRICS
+    if not by_month:
+        return [
+            dict(zip(('period',) + metrics, values))
+            for values in rows.order_by('day').values_list('day', *metrics)
+        ]
+    # Aliases can't reuse the field names, so sum into <metric>_sum and rename
+    totals = rows.order_by().values(period=TruncMonth('day')).annotate(
+        **{f'{metric}_sum': Sum(metric) for metric in metrics}
+    ).order_by('period')
+    return [
+        {'period': row['period'], **{metric: row[f'{metric}_sum'] for metric in metrics}}
+        for row in totals
+    ]
@@ -0,0 +1,188 @@
+# search.py - Faceted search helpers (filters + one-pass facet counts)
+from datetime import date
+
+from django.db.models import Count, Q
+
+from .models import UserProfile, UserBlock, DateEvent
+
+
+def facet_counts(queryset, dimensions, selected):
+    """
+    Count every option of every dimension in ONE aggregate query.
+
+    dimensions: {name: [(value, label, Q), ...]}
+    selected:   {name: [value, ...]} - the filters currently applied
+
+    Each option is counted against all the *other* active filters, so the
+    sidebar shows how many results picking that option would give.
+    """
+    selected_q = {
+        name: _combine_options(options, selected.get(name))
+        for name, options in dimensions.items()
+    }
+
+    aggregates = {}
+    for name, options in dimensions.items():
+        others_q = Q()
+        for other_name, other_q in selected_q.items():
+            if other_name != name:
+                others_q &= other_q
+        for index, (value, label, option_q) in enumerate(options):
+            aggregates[f'{name}__{index}'] = Count('pk', filter=others_q & option_q)
+
+    totals = queryset.aggregate(**aggregates) if aggregates else {}
+
+    facets = {}
+    for name, options in dimensions.items():
+        chosen = set(selected.get(name) or [])
+        facets[name] = [
+            {
+                'value': value,
+                'label': label,
+                'count': totals[f'{name}__{index}'],
+                'selected': value in chosen,
+            }
+            for index, (value, label, option_q) in enumerate(options)
+        ]
+    return facets
+
+
+def apply_facet_filters(queryset, dimensions, selected):
+    """Filter by the selected options (OR within a dimension, AND across)"""
+    for name, options in dimensions.items():
+        queryset = queryset.filter(_combine_options(options, selected.get(name)))
+    return queryset
+
+
+def selected_from_querydict(querydict, dimensions):
+    """Pull ?gender=female&gender=other style selections for known options"""
+    selected = {}
+    for name, options in dimensions.items():
+        valid = {value for value, label, option_q in options}
+        values = [value for value in querydict.getlist(name) if value in valid]
+        if values:
+            selected[name] = values
+    return selected
+
+
+def _combine_options(options, values):
+    if not values:
+        return Q()
+    combined = Q()
+    for value, label, option_q in options:
+        if value in values:
+            combined |= option_q
+    return combined
+
+
+# ==================== MEMBER SEARCH ====================
+
+AGE_BANDS = [
+    ('18-24', '18-24', 18, 24),
+    ('25-34', '25-34', 25, 34),
+    ('35-44', '35-44', 35, 44),
+    ('45-54', '45-54', 45, 54),
+    ('55+', '55+', 55, None),
+]
+
+# Matched against UserProfile.state, which update_coordinates geocodes from location
+STATES = [
+    ('nsw', 'NSW'),
+    ('vic', 'VIC'),
+    ('qld', 'QLD'),
+    ('wa', 'WA'),
+    ('sa', 'SA'),
+    ('act', 'ACT'),
+    ('tas', 'TAS'),
+    ('nt', 'NT'),
+]
+
+
+def _years_ago(today, years):
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        # 29 Feb -> 28 Feb
+        return today.replace(year=today.year - years, day=28)
+
+
+def _age_band_q(min_age, max_age, today):
+    # Age >= min_age  <=> born on/before today - min_age years
+    q = Q(date_of_birth__lte=_years_ago(today, min_age))
+    if max_age is not None:
+        # Age <= max_age <=> born after today - (max_age + 1) years
+        q &= Q(date_of_birth__gt=_years_ago(today, max_age + 1))
+    return q
+
+
+def member_dimensions(today=None):
+    """Facet dimensions for the member search sidebar"""
+    today = today or date.today()
+    gender_choices = UserProfile._meta.get_field('gender').choices
+    return {
+        'gender': [(value, label, Q(gender=value)) for value, label in gender_choices],
+        'age': [(value, label, _age_band_q(low, high, today)) for value, label, low, high in AGE_BANDS],
+        'body_type': [(value, label, Q(body_type=value)) for value, label in UserProfile.BODY_TYPES],
+        'relationship_status': [
+            (value, label, Q(relationship_status=value)) for value, label in UserProfile.RELATIONSHIP_STATUS
+        ],
+        'smoker': [('yes', 'Smoker', Q(is_smoker=True)), ('no', 'Non-smoker', Q(is_smoker=False))],
+        'children': [('yes', 'Has children', Q(has_children=True)), ('no', 'No children', Q(has_children=False))],
+        'state': [(value, label, Q(state=value)) for value, label in STATES],
+    }
+
+
+def searchable_members(viewer=None):
+    """Approved + complete profiles (the partial indexes' predicate), minus the viewer and blocks"""
+    queryset = UserProfile.objects.filter(is_approved=True, is_complete=True)
+    if viewer is not None and viewer.is_authenticated:
+        blocked_ids = UserBlock.objects.filter(user=viewer).values('blocked_user_id')
+        blocked_by_ids = UserBlock.objects.filter(blocked_user_id=viewer.id).values('user_id')
+        queryset = queryset.exclude(user=viewer).exclude(
+            user_id__in=blocked_ids
+        ).exclude(
+            user_id__in=blocked_by_ids
+        )
+    return queryset
+
+
+# ==================== DATE EVENT SEARCH ====================
+
+MAX_AREA_OPTIONS = 50
+
+
+def _choice_options(field_name, choices):
+    return [(value, label, Q(**{field_name: value})) for value, label in choices]
+
+
+def date_dimensions(areas=()):
+    """
+    Facet dimensions for date discovery.
+    Area is free text, so its options are the areas actually in use.
+    """
+    return {
+        'activity': _choice_options('activity', DateEvent.ACTIVITY_CHOICES),
+        'vibe': _choice_options('vibe', DateEvent.VIBE_CHOICES),
+        'budget': _choice_options('budget', DateEvent.BUDGET_CHOICES),
+        'duration': _choice_options('duration', DateEvent.DURATION_CHOICES),
+        'group_size': _choice_options('group_size', DateEvent.GROUP_SIZE_CHOICES),
+        'audience': _choice_options('audience', DateEvent.AUDIENCE_CHOICES),
+        'area': [(area, area, Q(area=area)) for area in areas],
+    }
+
+
+def area_options(queryset):
+    """Distinct areas among the searchable events (capped so the facet query stays small)"""
+    return list(
+        queryset.order_by('area').values_list('area', flat=True).distinct()[:MAX_AREA_OPTIONS]
+    )
+
+
+def searchable_dates(viewer=None):
+    """Upcoming, live events minus those hosted by members the viewer blocked / was blocked by"""
+    queryset = DateEvent.objects.upcoming()
+    if viewer is not None and viewer.is_authenticated:
+        blocked_ids = UserBlock.objects.filter(user=viewer).values('blocked_user_id')
+        blocked_by_ids = UserBlock.objects.filter(blocked_user_id=viewer.id).values('user_id')
+        queryset = queryset.exclude(host_id__in=blocked_ids).exclude(host_id__in=blocked_by_ids)
+    return queryset
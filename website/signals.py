@@ -8,25 +8,38 @@ from django.contrib.auth import get_user_model
 
 from .models import (
     UserActivityLog, ProfileEditRequest, Message, Conversation,
-    UserLike, UserFavorite, UserBlock, DateEvent, PrivateAccessRequest  # Added missing import
+    UserLike, UserFavorite, UserBlock, DateEvent, PrivateAccessRequest,  # Added missing import
+    UserProfile
 )
+from .recommendations import schedule_refresh
+from .activity_log import record
 
 # ============================================================================
 # DUPLICATE LOG FUNCTION TO AVOID CIRCULAR IMPORTS
 # ============================================================================
 
-def log_user_activity(user, activity_type, target_user=None, request=None, additional_data=None):
+def log_user_activity(user, activity_type, target_user=None, request=None, additional_data=None,
+                      user_id=None, target_user_id=None):
     """
     Log user activity for admin monitoring and legal compliance
     This is a duplicate of the function in views.py to avoid circular imports
+    
+    Signal handlers can pass user_id / target_user_id instead of User objects
+    so they never have to fetch a User just to fill a foreign key.
     """
-    if not user or not user.is_authenticated:
+    if user is not None:
+        if not user.is_authenticated:
+            return None
+        user_id = user.id
+    if not user_id:
         return None
+    if target_user is not None:
+        target_user_id = target_user.id
     
     activity_log = UserActivityLog(
-        user=user,
+        user_id=user_id,
         activity_type=activity_type,
-        target_user=target_user,
+        target_user_id=target_user_id,
         additional_data=additional_data or {}
     )
     
@@ -34,12 +47,19 @@ def log_user_activity(user, activity_type, target_user=None, request=None, addit
         activity_log.ip_address = request.META.get('REMOTE_ADDR')
         activity_log.user_agent = request.META.get('HTTP_USER_AGENT', '')
     
-    try:
-        activity_log.save()
-        return activity_log
-    except Exception as e:
-        print(f"Error logging activity: {e}")
-        return None
+    # Buffered until the end of the request (spooled to disk meanwhile)
+    return record(activity_log)
+
+def _other_participant_id(conversation_id, user_id):
+    """The other member of a two-person conversation (one query on the M2M table)"""
+    return Conversation.participants.through.objects.filter(
+        conversation_id=conversation_id
+    ).exclude(
+        user_id=user_id
+    ).values_list('user_id', flat=True).first()
+
+def _preview(content):
+    return content[:100] + '...' if len(content) > 100 else content
 
 # ==================== AUTHENTICATION SIGNALS ====================
 
@@ -51,8 +71,7 @@ def log_user_login(sender, request, user, **kwargs):
         activity_type='login',
         request=request,
         additional_data={
-            'login_time': timezone.now().isoformat(),
-            'user_agent': request.META.get('HTTP_USER_AGENT', '')
+            'login_time': timezone.now().isoformat()
         }
     )
 
@@ -75,68 +94,40 @@ def log_user_logout(sender, request, user, **kwargs):
 def log_message_sent(sender, instance, created, **kwargs):
     """Log when a message is sent"""
     if created:
-        # Get the receiver
-        other_participants = instance.conversation.participants.exclude(id=instance.sender.id)
-        receiver = other_participants.first() if other_participants.exists() else None
-        
-        # Log for sender
+        # One row; the receiver (target_user) sees it as message_received
         log_user_activity(
-            user=instance.sender,
+            user=None,
+            user_id=instance.sender_id,
             activity_type='message_sent',
-            target_user=receiver,
+            target_user_id=_other_participant_id(instance.conversation_id, instance.sender_id),
             additional_data={
                 'message_id': instance.id,
-                'conversation_id': instance.conversation.id,
-                'content_preview': instance.content[:100] + '...' if len(instance.content) > 100 else instance.content,
+                'conversation_id': instance.conversation_id,
+                'content_preview': _preview(instance.content),
                 'timestamp': instance.created_at.isoformat()
             }
         )
-        
-        # Log for receiver (if different user)
-        if receiver and receiver != instance.sender:
-            log_user_activity(
-                user=receiver,
-                activity_type='message_received',
-                target_user=instance.sender,
-                additional_data={
-                    'message_id': instance.id,
-                    'conversation_id': instance.conversation.id,
-                    'content_preview': instance.content[:100] + '...' if len(instance.content) > 100 else instance.content,
-                    'timestamp': instance.created_at.isoformat()
-                }
-            )
 
 @receiver(pre_save, sender=Message)
 def log_message_deletion(sender, instance, **kwargs):
     """Log when a message is soft-deleted"""
-    if instance.pk:
-        try:
-            old_instance = Message.objects.get(pk=instance.pk)
-            
-            # Check if deletion status changed
-            if (old_instance.is_deleted_for_sender != instance.is_deleted_for_sender or
-                old_instance.is_deleted_for_receiver != instance.is_deleted_for_receiver):
-                
-                # Determine who is deleting
-                if instance.deleted_by:
-                    # Get the other participant in the conversation
-                    other_participants = instance.conversation.participants.exclude(id=instance.deleted_by.id)
-                    other_user = other_participants.first() if other_participants.exists() else None
-                    
-                    log_user_activity(
-                        user=instance.deleted_by,
-                        activity_type='message_deleted',
-                        target_user=other_user,
-                        additional_data={
-                            'message_id': instance.id,
-                            'content_preview': instance.content[:100] + '...' if len(instance.content) > 100 else instance.content,
-                            'deleted_for_sender': instance.is_deleted_for_sender,
-                            'deleted_for_receiver': instance.is_deleted_for_receiver,
-                            'deleted_at': instance.deleted_at.isoformat() if instance.deleted_at else None
-                        }
-                    )
-        except Message.DoesNotExist:
-            pass
+    changes = instance.tracked_changes(kwargs.get('update_fields'))
+    
+    # Check if deletion status changed
+    if ('is_deleted_for_sender' in changes or 'is_deleted_for_receiver' in changes) and instance.deleted_by_id:
+        log_user_activity(
+            user=None,
+            user_id=instance.deleted_by_id,
+            activity_type='message_deleted',
+            target_user_id=_other_participant_id(instance.conversation_id, instance.deleted_by_id),
+            additional_data={
+                'message_id': instance.id,
+                'content_preview': _preview(instance.content),
+                'deleted_for_sender': instance.is_deleted_for_sender,
+                'deleted_for_receiver': instance.is_deleted_for_receiver,
+                'deleted_at': instance.deleted_at.isoformat() if instance.deleted_at else None
+            }
+        )
 
 # ==================== PROFILE EDIT REQUEST SIGNALS ====================
 
@@ -160,140 +151,93 @@ def log_profile_edit_request(sender, instance, created, **kwargs):
 def log_user_like(sender, instance, created, **kwargs):
     """Log when a user likes another user"""
     if created:
-        User = get_user_model()
-        
-        try:
-            target_user = User.objects.get(id=instance.liked_user_id)
-            
-            # Log for user who gave like
-            log_user_activity(
-                user=instance.user,
-                activity_type='like_given',
-                target_user=target_user,
-                additional_data={
-                    'liked_user_id': instance.liked_user_id,
-                    'timestamp': instance.created_at.isoformat()
-                }
-            )
-            
-            # Log for user who received like
-            log_user_activity(
-                user=target_user,
-                activity_type='like_received',
-                target_user=instance.user,
-                additional_data={
-                    'liked_by_user_id': instance.user.id,
-                    'timestamp': instance.created_at.isoformat()
-                }
-            )
-        except User.DoesNotExist:
-            pass
-
-@receiver(post_delete, sender=UserLike)
-def log_user_unlike(sender, instance, **kwargs):
-    """Log when a user unlikes another user"""
-    User = get_user_model()
-    
-    try:
-        target_user = User.objects.get(id=instance.liked_user_id)
-        
+        # One row; the liked user (target_user) sees it as like_received
         log_user_activity(
-            user=instance.user,
-            activity_type='like_removed',
-            target_user=target_user,
+            user=None,
+            user_id=instance.user_id,
+            activity_type='like_given',
+            target_user_id=instance.liked_user_id,
             additional_data={
-                'unliked_user_id': instance.liked_user_id,
-                'timestamp': timezone.now().isoformat()
+                'liked_user_id': instance.liked_user_id,
+                'timestamp': instance.created_at.isoformat()
             }
         )
-    except User.DoesNotExist:
-        pass
+
+@receiver(post_delete, sender=UserLike)
+def log_user_unlike(sender, instance, **kwargs):
+    """Log when a user unlikes another user"""
+    log_user_activity(
+        user=None,
+        user_id=instance.user_id,
+        activity_type='like_removed',
+        target_user_id=instance.liked_user_id,
+        additional_data={
+            'unliked_user_id': instance.liked_user_id,
+            'timestamp': timezone.now().isoformat()
+        }
+    )
 
 @receiver(post_save, sender=UserFavorite)
 def log_user_favorite(sender, instance, created, **kwargs):
     """Log when a user favorites another user"""
     if created:
-        User = get_user_model()
-        
-        try:
-            target_user = User.objects.get(id=instance.favorite_user_id)
-            
-            log_user_activity(
-                user=instance.user,
-                activity_type='favorite',
-                target_user=target_user,
-                additional_data={
-                    'favorited_user_id': instance.favorite_user_id,
-                    'action': 'added',
-                    'timestamp': instance.created_at.isoformat()
-                }
-            )
-        except User.DoesNotExist:
-            pass
-
-@receiver(post_delete, sender=UserFavorite)
-def log_user_unfavorite(sender, instance, **kwargs):
-    """Log when a user removes favorite"""
-    User = get_user_model()
-    
-    try:
-        target_user = User.objects.get(id=instance.favorite_user_id)
-        
         log_user_activity(
-            user=instance.user,
+            user=None,
+            user_id=instance.user_id,
             activity_type='favorite',
-            target_user=target_user,
+            target_user_id=instance.favorite_user_id,
             additional_data={
                 'favorited_user_id': instance.favorite_user_id,
-                'action': 'removed',
-                'timestamp': timezone.now().isoformat()
+                'action': 'added',
+                'timestamp': instance.created_at.isoformat()
             }
         )
-    except User.DoesNotExist:
-        pass
+
+@receiver(post_delete, sender=UserFavorite)
+def log_user_unfavorite(sender, instance, **kwargs):
+    """Log when a user removes favorite"""
+    log_user_activity(
+        user=None,
+        user_id=instance.user_id,
+        activity_type='favorite',
+        target_user_id=instance.favorite_user_id,
+        additional_data={
+            'favorited_user_id': instance.favorite_user_id,
+            'action': 'removed',
+            'timestamp': timezone.now().isoformat()
+        }
+    )
 
 @receiver(post_save, sender=UserBlock)
 def log_user_block(sender, instance, created, **kwargs):
     """Log when a user blocks another user"""
     if created:
-        User = get_user_model()
-        
-        try:
-            target_user = User.objects.get(id=instance.blocked_user_id)
-            
-            log_user_activity(
-                user=instance.user,
-                activity_type='block',
-                target_user=target_user,
-                additional_data={
-                    'blocked_user_id': instance.blocked_user_id,
-                    'action': 'blocked',
-                    'timestamp': instance.created_at.isoformat()
-                }
-            )
-        except User.DoesNotExist:
-            pass
-
-@receiver(post_delete, sender=UserBlock)
-def log_user_unblock(sender, instance, **kwargs):
-    """Log when a user unblocks another user"""
-    User = get_user_model()
-    
-    try:
-        target_user = User.objects.get(id=instance.blocked_user_id)
-        
         log_user_activity(
-            user=instance.user,
+            user=None,
+            user_id=instance.user_id,
             activity_type='block',
-            target_user=target_user,
+            target_user_id=instance.blocked_user_id,
             additional_data={
                 'blocked_user_id': instance.blocked_user_id,
-                'action': 'unblocked',
-                'timestamp': timezone.now().isoformat()
+                'action': 'blocked',
+                'timestamp': instance.created_at.isoformat()
             }
         )
-    except User.DoesNotExist:
-        pass
+
+@receiver(post_delete, sender=UserBlock)
+def log_user_unblock(sender, instance, **kwargs):
+    """Log when a user unblocks another user"""
+    log_user_activity(
+        user=None,
+        user_id=instance.user_id,
+        activity_type='block',
+        target_user_id=instance.blocked_user_id,
+        additional_data={
+            'blocked_user_id': instance.blocked_user_id,
+            'action': 'unblocked',
+            'timestamp': timezone.now().isoformat()
+        }
+    )
 
 # ==================== DATE EVENT SIGNALS ====================
 
@@ -302,7 +246,8 @@ def log_date_created(sender, instance, created, **kwargs):
     """Log when a date event is created"""
     if created:
         log_user_activity(
-            user=instance.host,
+            user=None,
+            user_id=instance.host_id,
             activity_type='date_created',
             additional_data={
                 'date_id': instance.id,
@@ -316,21 +261,18 @@ def log_date_created(sender, instance, created, **kwargs):
 @receiver(pre_save, sender=DateEvent)
 def log_date_cancelled(sender, instance, **kwargs):
     """Log when a date is cancelled"""
-    if instance.pk:
-        try:
-            old_instance = DateEvent.objects.get(pk=instance.pk)
-            if not old_instance.is_cancelled and instance.is_cancelled:
-                log_user_activity(
-                    user=instance.host,
-                    activity_type='date_cancelled',
-                    additional_data={
-                        'date_id': instance.id,
-                        'title': instance.title,
-                        'cancelled_at': timezone.now().isoformat()
-                    }
-                )
-        except DateEvent.DoesNotExist:
-            pass
+    was_cancelled, is_cancelled = instance.tracked_changes(kwargs.get('update_fields')).get('is_cancelled', (None, None))
+    if was_cancelled is False and is_cancelled:
+        log_user_activity(
+            user=None,
+            user_id=instance.host_id,
+            activity_type='date_cancelled',
+            additional_data={
+                'date_id': instance.id,
+                'title': instance.title,
+                'cancelled_at': timezone.now().isoformat()
+            }
+        )
 
 # ==================== CONVERSATION SIGNALS ====================
 
@@ -342,7 +284,7 @@ def log_conversation_started(sender, instance, created, **kwargs):
         if len(participants) == 2:
             user1, user2 = participants[0], participants[1]
             
-            # Log for both users
+            # One row for both users (user2 sees it via target_user)
             log_user_activity(
                 user=user1,
                 activity_type='conversation_started',
@@ -352,16 +294,6 @@ def log_conversation_started(sender, instance, created, **kwargs):
                     'timestamp': instance.created_at.isoformat()
                 }
             )
-            
-            log_user_activity(
-                user=user2,
-                activity_type='conversation_started',
-                target_user=user1,
-                additional_data={
-                    'conversation_id': instance.id,
-                    'timestamp': instance.created_at.isoformat()
-                }
-            )
 
 # ==================== USER PROFILE SIGNALS ====================
 
@@ -380,6 +312,12 @@ def log_user_created(sender, instance, created, **kwargs):
             }
         )
 
+@receiver(post_save, sender=UserProfile)
+def refresh_new_member_recommendations(sender, instance, created, **kwargs):
+    """Score a brand-new member into the stored recommendation lists"""
+    if created and not kwargs.get('raw'):
+        schedule_refresh(instance)
+
 # ==================== PRIVATE ACCESS REQUEST SIGNALS ====================
 
 @receiver(post_save, sender=PrivateAccessRequest)
@@ -388,84 +326,79 @@ def log_private_access_request(sender, instance, created, **kwargs):
     if created:
         # New request
         log_user_activity(
-            user=instance.requester,
+            user=None,
+            user_id=instance.requester_id,
             activity_type='private_access_requested',
-            target_user=instance.target_user,
+            target_user_id=instance.target_user_id,
             additional_data={
                 'request_id': instance.id,
                 'message': instance.message,
                 'timestamp': instance.created_at.isoformat()
             }
         )
-    else:
-        # Status changed
-        try:
-            old_instance = PrivateAccessRequest.objects.get(pk=instance.pk)
-            if old_instance.status != instance.status:
-                if instance.status == 'granted':
-                    log_user_activity(
-                        user=instance.target_user,
-                        activity_type='private_access_granted',
-                        target_user=instance.requester,
-                        additional_data={
-                            'request_id': instance.id,
-                            'granted_at': instance.granted_at.isoformat() if instance.granted_at else None,
-                            'timestamp': timezone.now().isoformat()
-                        }
-                    )
-                elif instance.status == 'denied':
-                    log_user_activity(
-                        user=instance.target_user,
-                        activity_type='private_access_denied',
-                        target_user=instance.requester,
-                        additional_data={
-                            'request_id': instance.id,
-                            'denied_at': instance.denied_at.isoformat() if instance.denied_at else None,
-                            'reason': instance.reason,
-                            'timestamp': timezone.now().isoformat()
-                        }
-                    )
-                elif instance.status == 'revoked':
-                    log_user_activity(
-                        user=instance.target_user if instance.target_user != instance.requester else instance.requester,
-                        activity_type='private_access_revoked',
-                        target_user=instance.requester if instance.target_user != instance.requester else instance.target_user,
-                        additional_data={
-                            'request_id': instance.id,
-                            'revoked_at': instance.revoked_at.isoformat() if instance.revoked_at else None,
-                            'reason': instance.reason,
-                            'timestamp': timezone.now().isoformat()
-                        }
-                    )
-        except PrivateAccessRequest.DoesNotExist:
-            pass
+        return
+    
+    # Status changed (the snapshot still holds the pre-save value in post_save)
+    if 'status' not in instance.tracked_changes(kwargs.get('update_fields')):
+        return
+    
+    if instance.status == 'granted':
+        log_user_activity(
+            user=None,
+            user_id=instance.target_user_id,
+            activity_type='private_access_granted',
+            target_user_id=instance.requester_id,
+            additional_data={
+                'request_id': instance.id,
+                'granted_at': instance.granted_at.isoformat() if instance.granted_at else None,
+                'timestamp': timezone.now().isoformat()
+            }
+        )
+    elif instance.status == 'denied':
+        log_user_activity(
+            user=None,
+            user_id=instance.target_user_id,
+            activity_type='private_access_denied',
+            target_user_id=instance.requester_id,
+            additional_data={
+                'request_id': instance.id,
+                'denied_at': instance.denied_at.isoformat() if instance.denied_at else None,
+                'reason': instance.reason,
+                'timestamp': timezone.now().isoformat()
+            }
+        )
+    elif instance.status == 'revoked':
+        log_user_activity(
+            user=None,
+            user_id=instance.target_user_id,
+            activity_type='private_access_revoked',
+            target_user_id=instance.requester_id,
+            additional_data={
+                'request_id': instance.id,
+                'revoked_at': instance.revoked_at.isoformat() if instance.revoked_at else None,
+                'reason': instance.reason,
+                'timestamp': timezone.now().isoformat()
+            }
+        )
 
 # ==================== MESSAGE READ STATUS SIGNALS ====================
 
 @receiver(pre_save, sender=Message)
 def log_message_read(sender, instance, **kwargs):
     """Log when a message is read"""
-    if instance.pk:
-        try:
-            old_instance = Message.objects.get(pk=instance.pk)
-            if not old_instance.is_read and instance.is_read:
-                # Get the sender
-                sender = instance.sender
-                
-                # Log for the receiver (current user who read it)
-                other_participants = instance.conversation.participants.exclude(id=sender.id)
-                receiver = other_participants.first() if other_participants.exists() else None
-                
-                if receiver:
-                    log_user_activity(
-                        user=receiver,
-                        activity_type='message_read',
-                        target_user=sender,
-                        additional_data={
-                            'message_id': instance.id,
-                            'conversation_id': instance.conversation.id,
-                            'read_at': timezone.now().isoformat()
-                        }
-                    )
-        except Message.DoesNotExist:
-            pass
+    was_read, is_read = instance.tracked_changes(kwargs.get('update_fields')).get('is_read', (None, None))
+    if was_read is False and is_read:
+        # Log for the receiver (current user who read it)
+        receiver_id = _other_participant_id(instance.conversation_id, instance.sender_id)
+        if receiver_id:
+            log_user_activity(
+                user=None,
+                user_id=receiver_id,
+                activity_type='message_read',
+                target_user_id=instance.sender_id,
+                additional_data={
+                    'message_id': instance.id,
+                    'conversation_id': instance.conversation_id,
+                    'read_at': timezone.now().isoformat()
+                }
+            )
@@ -1,3 +1,1239 @@
-from django.test import TestCase
+import gzip
+import importlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Conversation, Message, UserProfile, DateEvent, DateView, UserActivityLog,
+    UserLike, UserFavorite, UserBlock, ProfileEditRequest, QueuedEmail, SiteDailyStats, DataExport,
+    RecommendedCandidate, UserAgent, DateSeenWatermark, PendingRecommendationRefresh
+)
+from .admin import UserLikeInline
+from .activity_log import end_buffer, record, start_buffer
+from .activity_partitions import add_months, archive_tables, month_start, rotate_before
+from .data_exports import claim_pending, export_sections, run_export
+from .exports import activity_log_rows, keyset_rows, streaming_export
+from .geo import geocode
+from .search import (
+    area_options, date_dimensions, facet_counts, member_dimensions, searchable_dates, searchable_members
+)
+from .mail_queue import send_queued
+from .recommendations import (
+    load_block_pairs, load_member_features, rank_candidates, refresh_member, refresh_queued, store_rankings,
+    recommended_for
+)
+from .rollups import activity_totals, rolled_through, rollup_site_stats
+from .timelines import activity_timeline, pair_timeline, pair_timeline_entries
+from .user_agents import clear_cache
+
+
+class AdminChangelistQueryBudgetTests(TestCase):
+    """Changelist pages must cost the same number of queries however many rows they show"""
+
+    CHANGELISTS = [
+        'admin:auth_user_changelist',
+        'admin:website_userprofile_changelist',
+        'admin:website_conversation_changelist',
+        'admin:website_message_changelist',
+        'admin:website_dateevent_changelist',
+        'admin:website_useractivitylog_changelist',
+        'admin:website_userlike_changelist',
+        'admin:website_userfavorite_changelist',
+        'admin:website_userblock_changelist',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('budget_admin', 'budget_admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        self.created = 0
+
+    def add_members(self, count):
+        """Members with a profile, conversation, message, date, date view, log row, like, favorite and block each"""
+        for _ in range(count):
+            self.created += 1
+            user = User.objects.create_user(f'member{self.created}', f'member{self.created}@example.com')
+            UserProfile.objects.create(user=user, profile_name=f'Member {self.created}')
+
+            conversation = Conversation.objects.create()
+            conversation.participants.add(user, self.staff)
+            Message.objects.create(conversation=conversation, sender=user, content='Hello')
+
+            date_event = DateEvent.objects.create(
+                host=user, title='Coffee', activity='coffee', vibe='casual', budget='low',
+                duration='1_hour', date_time=timezone.now(), area='CBD', group_size='1_on_1',
+            )
+            DateView.objects.create(user=self.staff, date_event=date_event)
+            UserActivityLog.objects.create(user=user, activity_type='like_given', target_user=self.staff)
+            UserLike.objects.create(user=self.staff, liked_user_id=user.id)
+            UserFavorite.objects.create(user=self.staff, favorite_user_id=user.id)
+            UserBlock.objects.create(user=user, blocked_user_id=self.staff.id)
+
+    def count_queries(self, url_name):
+        # The estimated-count paginator caches table sizes on SQLite - start cold every time
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.add_members(2)
+        baseline = {url_name: self.count_queries(url_name) for url_name in self.CHANGELISTS}
+
+        self.add_members(10)
+        for url_name in self.CHANGELISTS:
+            with self.subTest(changelist=url_name):
+                self.assertEqual(self.count_queries(url_name), baseline[url_name])
+
+
+class ProfileEditBatchApprovalTests(TestCase):
+    """Approving a batch costs a fixed number of queries and sends no mail until the queue runs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('batch_admin', 'batch_admin@example.com', 'password')
+
+    def add_requests(self, first, count):
+        for number in range(first, first + count):
+            user = User.objects.create_user(f'editor{number}', f'editor{number}@example.com')
+            profile = UserProfile.objects.create(user=user, profile_name=f'Editor {number}', location='Sydney')
+            # Edit requests carry the whole form, not just the changed fields
+            edit_request = ProfileEditRequest(user=user)
+            for field in ProfileEditRequest.PROFILE_FIELDS:
+                setattr(edit_request, field, getattr(profile, field))
+            edit_request.profile_name = f'Renamed {number}'
+            edit_request.save()
+
+    def approve_all(self):
+        pending = ProfileEditRequest.objects.filter(status='pending').select_related('user', 'user__profile')
+        with CaptureQueriesContext(connection) as context:
+            approved = ProfileEditRequest.approve_many(pending, self.staff, 'ok')
+        return approved, len(context)
+
+    def test_batch_approval(self):
+        self.add_requests(0, 2)
+        approved, baseline = self.approve_all()
+        self.assertEqual(len(approved), 2)
+
+        self.add_requests(2, 8)
+        approved, queries = self.approve_all()
+        self.assertEqual(len(approved), 8)
+        self.assertEqual(queries, baseline)
+
+        self.assertEqual(UserProfile.objects.filter(profile_name__startswith='Renamed').count(), 10)
+        self.assertEqual(UserActivityLog.objects.filter(activity_type='profile_approved').count(), 10)
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(send_queued(), (10, 0))
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertFalse(QueuedEmail.objects.filter(status='pending').exists())
+
+    def test_recommendation_refresh_is_queued(self):
+        self.add_requests(0, 3)
+        UserProfile.objects.update(is_approved=True, is_complete=True)
+        with mock.patch('website.recommendations.load_member_features', wraps=load_member_features) as load:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.approve_all()
+            self.assertEqual(callbacks, [])
+            load.assert_not_called()
+            self.assertEqual(PendingRecommendationRefresh.objects.count(), 3)
+
+            # Approving the same members again before the worker runs queues nothing new
+            ProfileEditRequest.objects.update(status='pending')
+            self.approve_all()
+            self.assertEqual(PendingRecommendationRefresh.objects.count(), 3)
+
+            self.assertEqual(refresh_queued(batch_size=2), 2)
+            self.assertEqual(refresh_queued(batch_size=2), 1)
+            self.assertEqual(refresh_queued(), 0)
+            self.assertEqual(load.call_count, 2)
+        self.assertFalse(PendingRecommendationRefresh.objects.exists())
+
+    def test_failed_refresh_stays_queued(self):
+        self.add_requests(0, 2)
+        UserProfile.objects.update(is_approved=True, is_complete=True)
+        self.approve_all()
+        with mock.patch('website.recommendations.refresh_members', side_effect=DatabaseError('database is down')):
+            self.assertEqual(refresh_queued(), 0)
+        self.assertEqual(PendingRecommendationRefresh.objects.count(), 2)
+        self.assertEqual(refresh_queued(), 2)
+
+
+class SiteStatsRollupTests(TestCase):
+    """The dashboard reads the rollup table; the rollup counts each event once"""
+
+    def test_rollup_and_dashboard(self):
+        staff = User.objects.create_superuser('stats_admin', 'stats_admin@example.com', 'password')
+        alice = User.objects.create_user('alice', 'alice@example.com')
+        bob = User.objects.create_user('bob', 'bob@example.com')
+        UserLike.objects.create(user=alice, liked_user_id=bob.id)
+        UserLike.objects.create(user=bob, liked_user_id=alice.id)
+        UserLike.objects.create(user=staff, liked_user_id=alice.id)
+        conversation = Conversation.objects.create()
+        conversation.participants.add(alice, bob)
+        Message.objects.create(conversation=conversation, sender=alice, content='Hi')
+
+        self.assertEqual(rollup_site_stats(), 1)
+        # Running again re-rolls only the last (still open) day
+        self.assertEqual(rollup_site_stats(), 1)
+        stats = SiteDailyStats.objects.get()
+        self.assertEqual(
+            (stats.signups, stats.messages, stats.likes, stats.matches),
+            (3, 1, 3, 1),
+        )
+
+        self.client.force_login(staff)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:website_sitedailystats_changelist'), {'period': '30d'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Site statistics - Last 30 days')
+        self.assertFalse(any('website_message' in query['sql'] for query in context.captured_queries))
+
+
+class ActivityTimelineTests(TestCase):
+    """Keyset pages walk the whole history once, ties on created_at included"""
+
+    def test_pages_cover_history_once(self):
+        member = User.objects.create_user('member', 'member@example.com')
+        other = User.objects.create_user('other', 'other@example.com')
+        now = timezone.now()
+        UserActivityLog.objects.bulk_create([
+            UserActivityLog(
+                user=other if number % 3 == 0 else member,
+                target_user=member if number % 3 == 0 else other,
+                activity_type='like_given',
+                created_at=now if number < 20 else now - timezone.timedelta(minutes=number),
+            )
+            for number in range(120)
+        ])
+
+        seen = []
+        cursor = None
+        while True:
+            entries, cursor = activity_timeline(member.id, cursor, limit=25)
+            seen.extend(entry['id'] for entry in entries)
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), sorted(UserActivityLog.objects.values_list('id', flat=True)))
+
+        received, _ = activity_timeline(member.id, activity_type='like_received', limit=100)
+        self.assertEqual(len(received), 40)
+        self.assertTrue(all(entry['counterpart_username'] == 'other' for entry in received))
+
+    def test_pair_timeline_merges_sources(self):
+        alice = User.objects.create_user('alice', 'alice@example.com')
+        bob = User.objects.create_user('bob', 'bob@example.com')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(alice, bob)
+        for number in range(30):
+            Message.objects.create(conversation=conversation, sender=alice if number % 2 else bob, content=f'm{number}')
+        UserLike.objects.create(user=alice, liked_user_id=bob.id)
+        UserBlock.objects.create(user=bob, blocked_user_id=alice.id)
+        UserActivityLog.objects.create(user=alice, activity_type='profile_view', target_user=bob)
+
+        everything = list(pair_timeline_entries(alice.id, bob.id, batch_size=7))
+        self.assertEqual(len(everything), 33)
+        self.assertEqual([entry['created_at'] for entry in everything],
+                         sorted(entry['created_at'] for entry in everything))
+
+        first_page, cursor = pair_timeline(alice.id, bob.id, limit=20)
+        second_page, cursor = pair_timeline(alice.id, bob.id, cursor, limit=20)
+        self.assertIsNone(cursor)
+        self.assertEqual(
+            [(entry['source'], entry['id']) for entry in first_page + second_page],
+            [(entry['source'], entry['id']) for entry in reversed(everything)],
+        )
+
+
+class DataExportTests(TestCase):
+    """Exports are queued, built complete off the request, and only downloadable by their owner"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def test_export_is_queued_built_and_uncapped(self):
+        member = User.objects.create_user('exporter', 'exporter@example.com', 'password')
+        other = User.objects.create_user('stranger', 'stranger@example.com', 'password')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(member, other)
+        Message.objects.bulk_create([
+            Message(conversation=conversation, sender=member, content=f'm{number}') for number in range(150)
+        ])
+
+        self.client.force_login(member)
+        response = self.client.get(reverse('export_user_data'))
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+        # Asking again while it's queued doesn't queue a second one
+        self.assertEqual(self.client.get(reverse('export_user_data')).json()['status_url'], status_url)
+
+        with override_settings(MEDIA_ROOT=self.media_root):
+            for export in claim_pending(5):
+                run_export(export)
+
+            status = self.client.get(status_url).json()
+            self.assertEqual(status['status'], 'ready')
+            self.assertEqual(status['row_counts']['messages_sent'], 150)
+            self.assertTrue(QueuedEmail.objects.filter(to_email='exporter@example.com').exists())
+
+            download = self.client.get(status['download_url'])
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(download.streaming_content)))
+            self.assertEqual(len(archive.read('messages_sent.ndjson').splitlines()), 150)
+
+            self.client.force_login(other)
+            self.assertEqual(self.client.get(status['download_url']).status_code, 404)
+
+    def test_stuck_and_rebuilt_exports(self):
+        member = User.objects.create_user('rebuilder', 'rebuilder@example.com')
+        with override_settings(MEDIA_ROOT=self.media_root):
+            export = DataExport.objects.create(user=member)
+            self.assertEqual(claim_pending(1), [export])
+            # The worker died mid-build: nobody else may claim it until the timeout passes
+            self.assertEqual(claim_pending(1), [])
+            DataExport.objects.filter(pk=export.pk).update(started_at=timezone.now() - timedelta(hours=2))
+            export = claim_pending(1)[0]
+            run_export(export)
+            first_file = export.file.name
+            self.assertTrue(export.file.storage.exists(first_file))
+
+            # Rebuilding replaces the archive and removes the old one
+            DataExport.objects.filter(pk=export.pk).update(status='pending')
+            export = run_export(claim_pending(1)[0])
+            self.assertEqual(export.status, 'ready')
+            self.assertNotEqual(export.file.name, first_file)
+            self.assertFalse(export.file.storage.exists(first_file))
+            self.assertTrue(export.file.storage.exists(export.file.name))
+
+
+class GeocoderTests(TestCase):
+    """Free-text locations resolve offline, whichever way members spell the state"""
+
+    def test_state_spellings(self):
+        perth = geocode('Perth WA')
+        self.assertIsNotNone(perth)
+        for text in ['Perth, Western Australia', 'Perth, Western Australia, Australia', 'perth  wa, australia']:
+            with self.subTest(location=text):
+                self.assertEqual(geocode(text), perth)
+        self.assertEqual(geocode('Adelaide, South Australia'), geocode('Adelaide SA'))
+        self.assertIsNotNone(geocode('Adelaide SA'))
+        self.assertEqual(geocode('Sydney, New South Wales'), geocode('Sydney NSW, Australia'))
+        self.assertIsNone(geocode('Queensland'))
+        self.assertIsNone(geocode(''))
+
+    def test_radius_search_uses_coordinates(self):
+        for number, location in enumerate(['Sydney NSW', 'Perth, Western Australia']):
+            user = User.objects.create_user(f'geo{number}', f'geo{number}@example.com')
+            UserProfile.objects.create(user=user, profile_name=f'Geo {number}', location=location)
+        latitude, longitude = geocode('Perth WA')
+        nearby = UserProfile.objects.within_km(latitude, longitude, 50)
+        self.assertEqual([profile.location for profile in nearby], ['Perth, Western Australia'])
+
+
+class MemberSearchFacetTests(TestCase):
+    """The state facet counts the geocoded state column, in the same aggregate as the other facets"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user('facet_viewer', 'facet_viewer@example.com')
+        members = [
+            ('Sydney NSW', 'female'),
+            ('Surry Hills, New South Wales', 'male'),
+            ('Perth', 'female'),
+            ('Perth, Western Australia, Australia', 'female'),
+            ('Queensland', 'male'),
+            ('Unknown', 'female'),
+        ]
+        for number, (location, gender) in enumerate(members):
+            user = User.objects.create_user(f'facet{number}', f'facet{number}@example.com')
+            UserProfile.objects.create(user=user, profile_name=f'Facet {number}', location=location,
+                                       gender=gender, is_approved=True, is_complete=True)
+
+    def state_counts(self, facets):
+        return {option['value']: option['count'] for option in facets['state'] if option['count']}
+
+    def test_state_counts(self):
+        self.assertEqual(
+            list(UserProfile.objects.order_by('id').values_list('state', flat=True)),
+            ['nsw', 'nsw', 'wa', 'wa', 'qld', ''],
+        )
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('member_search'), {'gender': 'female'})
+        facets = response.json()['facets']
+        # Each option counts against the other filters only
+        self.assertEqual(self.state_counts(facets), {'nsw': 1, 'wa': 2})
+        self.assertEqual(response.json()['total'], 4)
+
+        response = self.client.get(reverse('member_search'), {'gender': 'female', 'state': 'wa'})
+        self.assertEqual(self.state_counts(response.json()['facets']), {'nsw': 1, 'wa': 2})
+        self.assertEqual({option['value']: option['count'] for option in response.json()['facets']['gender']},
+                         {'male': 0, 'female': 2, 'other': 0})
+        self.assertEqual(response.json()['total'], 2)
+
+    def test_one_aggregate(self):
+        dimensions = member_dimensions()
+        selected = {'state': ['nsw', 'qld'], 'gender': ['male']}
+        with CaptureQueriesContext(connection) as context:
+            facets = facet_counts(searchable_members(self.viewer), dimensions, selected)
+        self.assertEqual(len(context), 1)
+        self.assertNotIn('location', context[0]['sql'])
+        self.assertEqual(self.state_counts(facets), {'nsw': 1, 'qld': 1})
+
+
+class RecommendationRefreshTests(TestCase):
+    """Patching one member into the stored lists matches a full rebuild"""
+
+    TOP_N = 3
+
+    def add_member(self, number, approved=True, birth_year=None):
+        user = User.objects.create_user(f'match{number}', f'match{number}@example.com')
+        return UserProfile.objects.create(
+            user=user, profile_name=f'Match {number}', location='Sydney NSW',
+            date_of_birth=date(birth_year or 1960 + number * 4, 1, 1), preferred_age_min=30, preferred_age_max=45,
+            is_approved=approved, is_complete=True,
+        )
+
+    def rebuild(self):
+        pool = load_member_features()
+        store_rankings([(viewer['user_id'], rank_candidates(viewer, pool, top_n=self.TOP_N)) for viewer in pool])
+
+    def stored_lists(self):
+        lists = {}
+        for row in RecommendedCandidate.objects.order_by('viewer_id', 'rank'):
+            lists.setdefault(row.viewer_id, []).append((row.rank, row.candidate_id))
+        return lists
+
+    def expected_lists(self):
+        pool = load_member_features()
+        return {
+            viewer['user_id']: [
+                (rank, profile_id)
+                for rank, (profile_id, score) in enumerate(rank_candidates(viewer, pool, top_n=self.TOP_N), start=1)
+            ]
+            for viewer in pool
+        }
+
+    def test_new_member_matches_rebuild(self):
+        for number in range(6):
+            self.add_member(number)
+        self.rebuild()
+        newcomer = self.add_member(6, birth_year=1978)
+
+        with CaptureQueriesContext(connection) as context:
+            refresh_member(newcomer, self.TOP_N)
+        # The stored lists are never read whole - every read is narrowed by a WHERE
+        reads = [query['sql'] for query in context
+                 if query['sql'].startswith('SELECT') and 'FROM "website_recommendedcandidate"' in query['sql']]
+        self.assertTrue(reads)
+        self.assertTrue(all(' WHERE ' in sql for sql in reads))
+        self.assertEqual(self.stored_lists(), self.expected_lists())
+        self.assertTrue(RecommendedCandidate.objects.filter(candidate=newcomer).exclude(viewer=newcomer.user).exists())
+
+    def test_block_removes_member(self):
+        members = [self.add_member(number) for number in range(5)]
+        self.rebuild()
+        viewer = members[0].user
+        listed = RecommendedCandidate.objects.filter(viewer=viewer).order_by('rank').first().candidate
+        UserBlock.objects.create(user=listed.user, blocked_user_id=viewer.id)
+
+        refresh_member(listed, self.TOP_N)
+        ranks = list(RecommendedCandidate.objects.filter(viewer=viewer).values_list('rank', 'candidate_id'))
+        self.assertNotIn(listed.id, [candidate_id for rank, candidate_id in ranks])
+        self.assertEqual([rank for rank, candidate_id in sorted(ranks)], list(range(1, len(ranks) + 1)))
+        self.assertFalse(RecommendedCandidate.objects.filter(viewer=listed.user, candidate=members[0]).exists())
+
+    @override_settings(RECOMMENDATIONS_LIVE_REFRESH=True)
+    def test_admin_approval_with_filter(self):
+        for number in range(4):
+            self.add_member(number)
+        self.rebuild()
+        pending = [self.add_member(number, approved=False) for number in (5, 6)]
+        staff = User.objects.create_superuser('match_admin', 'match_admin@example.com', 'password')
+        self.client.force_login(staff)
+
+        response = self.client.post(
+            reverse('admin:website_userprofile_changelist') + '?is_approved__exact=0',
+            {'action': 'approve_profiles', '_selected_action': [profile.id for profile in pending]},
+        )
+        self.assertEqual(response.status_code, 302)
+        # The request only queues them - the worker does the rescoring
+        self.assertFalse(RecommendedCandidate.objects.filter(viewer__in=[profile.user for profile in pending]).exists())
+        self.assertEqual(PendingRecommendationRefresh.objects.count(), 2)
+
+        output = io.StringIO()
+        call_command('refresh_recommendations', stdout=output)
+        self.assertIn('Refreshed recommendations for 2 member(s)', output.getvalue())
+        self.assertFalse(PendingRecommendationRefresh.objects.exists())
+        for profile in pending:
+            self.assertTrue(RecommendedCandidate.objects.filter(viewer=profile.user).exists())
+        self.assertTrue(recommended_for(pending[0].user))
+
+
+class DateAttendeeCountTests(TestCase):
+    """Edits to a date never write back a stale attendee_count"""
+
+    def test_full_save_keeps_counter(self):
+        host = User.objects.create_user('date_host', 'date_host@example.com')
+        guest = User.objects.create_user('date_guest', 'date_guest@example.com')
+        date_event = DateEvent.objects.create(
+            host=host, title='Coffee', activity='Coffee', vibe='Chill', budget='$', duration='60 min',
+            date_time=timezone.now() + timedelta(days=2), area='CBD', group_size='small_group',
+        )
+        # The host's copy was loaded before the guest joined
+        stale = DateEvent.objects.get(pk=date_event.pk)
+        self.assertEqual(DateEvent.objects.get(pk=date_event.pk).join(guest), (True, None))
+
+        stale.title = 'Coffee and cake'
+        stale.is_cancelled = True
+        stale.save()
+        date_event.refresh_from_db()
+        self.assertEqual(date_event.attendee_count, 1)
+        self.assertEqual(date_event.title, 'Coffee and cake')
+        self.assertTrue(date_event.is_cancelled)
+
+        self.assertTrue(date_event.leave(guest))
+        stale.save()
+        self.assertEqual(DateEvent.objects.get(pk=date_event.pk).attendee_count, 0)
+
+
+class ActivityRollupTests(TestCase):
+    """Totals read from rollups match the raw log, before and after old months are rotated out"""
+
+    def setUp(self):
+        self.member = User.objects.create_user('rolled', 'rolled@example.com')
+        self.other = User.objects.create_user('counterpart', 'counterpart@example.com')
+        now = timezone.now()
+        logs = UserActivityLog.objects.bulk_create([
+            UserActivityLog(user=self.member, target_user=self.other, activity_type='like_given')
+            for number in range(30)
+        ])
+        # One row a day, going back 90 days
+        for number, log in enumerate(logs):
+            UserActivityLog.objects.filter(pk=log.pk).update(created_at=now - timedelta(days=number * 3))
+
+    def test_first_rollup_covers_history(self):
+        call_command('rollup_activity', stdout=io.StringIO())
+        self.assertEqual(rolled_through(), timezone.localdate() - timedelta(days=1))
+        self.assertEqual(activity_totals([self.member.id, self.other.id]), {self.member.id: 30, self.other.id: 30})
+
+        # The next run picks up where this one left off
+        UserActivityLog.objects.create(user=self.member, target_user=self.other, activity_type='like_given')
+        call_command('rollup_activity', stdout=io.StringIO())
+        self.assertEqual(activity_totals([self.member.id])[self.member.id], 31)
+
+    def test_rotation_rolls_up_older_history_first(self):
+        # History well past keep_months + 1, and the rollup job has never run
+        UserActivityLog.objects.bulk_create([
+            UserActivityLog(user=self.member, target_user=self.other, activity_type='like_given',
+                            created_at=timezone.now() - timedelta(days=150 + number * 10))
+            for number in range(10)
+        ])
+        call_command('maintain_activity_partitions', '--keep-months=2', stdout=io.StringIO())
+        self.assertTrue(archive_tables())
+        self.assertLess(UserActivityLog.objects.count(), 40)
+
+        call_command('rollup_activity', stdout=io.StringIO())
+        self.assertEqual(activity_totals([self.member.id, self.other.id]), {self.member.id: 40, self.other.id: 40})
+
+    def test_rotated_months_stay_readable(self):
+        old_month = add_months(month_start(timezone.localdate()), -2)
+        moved = sum(rotate_before(add_months(old_month, 1)).values())
+        self.assertTrue(moved)
+        self.assertIn(f'website_useractivitylog_{old_month:%Y_%m}', archive_tables())
+        self.assertEqual(UserActivityLog.objects.count(), 30 - moved)
+
+        seen = []
+        cursor = None
+        while True:
+            entries, cursor = activity_timeline(self.member.id, cursor, limit=4)
+            seen.extend(entry['id'] for entry in entries)
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 30)
+        self.assertEqual(len(set(seen)), 30)
+
+        # An archive made before a later migration added a column is still readable
+        archive = f'website_useractivitylog_{old_month:%Y_%m}'
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{archive}" DROP COLUMN "agent_id"')
+        entries, cursor = activity_timeline(self.member.id, limit=40)
+        self.assertEqual(len(entries), 30)
+
+        # Legal export, GDPR export and the pair timeline include the archived month, oldest first
+        rows = list(activity_log_rows(UserActivityLog.objects.filter(user=self.member)))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual([row['created_at'] for row in rows], sorted(row['created_at'] for row in rows))
+        sections = dict(export_sections(self.other))
+        self.assertEqual(
+            {row['seen_type'] for row in sections['activity_logs.ndjson']}, {'like_received'}
+        )
+        self.assertEqual(len(list(dict(export_sections(self.member))['activity_logs.ndjson'])), 30)
+        self.assertEqual(len(list(pair_timeline_entries(self.member.id, self.other.id, batch_size=7))), 30)
+
+
+class PairedActivityMigrationTests(TestCase):
+    """Legacy counterpart copies are folded into the actor's row on migrate"""
+
+    def test_legacy_twins_are_removed(self):
+        sender = User.objects.create_user('legacy_sender', 'legacy_sender@example.com')
+        receiver = User.objects.create_user('legacy_receiver', 'legacy_receiver@example.com')
+        stamp = timezone.now().isoformat()
+        UserActivityLog.objects.bulk_create([
+            # Logged before the keys had their own columns
+            UserActivityLog(user=sender, target_user=receiver, activity_type='message_sent',
+                            additional_data={'message_id': 7, 'conversation_id': 3}),
+            UserActivityLog(user=receiver, target_user=sender, activity_type='message_received',
+                            additional_data={'message_id': 7, 'conversation_id': 3}),
+            UserActivityLog(user=sender, target_user=receiver, activity_type='conversation_started',
+                            conversation_id=3),
+            UserActivityLog(user=receiver, target_user=sender, activity_type='conversation_started',
+                            conversation_id=3),
+            UserActivityLog(user=sender, target_user=receiver, activity_type='like_given',
+                            additional_data={'timestamp': stamp}),
+            UserActivityLog(user=receiver, target_user=sender, activity_type='like_received',
+                            additional_data={'timestamp': stamp}),
+            # A received message whose sent row is gone is the only record left - kept
+            UserActivityLog(user=receiver, target_user=sender, activity_type='message_received',
+                            additional_data={'message_id': 8}),
+        ])
+        self.assertEqual(UserActivityLog.objects.as_seen_by(receiver.id).filter(seen_type='message_received').count(), 3)
+
+        migration = importlib.import_module('website.migrations.0030_dedupe_paired_activity')
+        migration.dedupe_paired_activity(apps, None)
+
+        seen = UserActivityLog.objects.as_seen_by(receiver.id)
+        self.assertEqual(seen.filter(seen_type='message_received').count(), 2)
+        self.assertEqual(seen.filter(seen_type='like_received').count(), 1)
+        self.assertEqual(seen.filter(seen_type='conversation_started').count(), 1)
+        self.assertEqual(UserActivityLog.objects.filter(message_id=7).count(), 1)
+
+
+class PrecomputeRecommendationsTests(TestCase):
+    """The nightly job stores every active member's top-N, honours blocks and resumes from its checkpoint"""
+
+    def setUp(self):
+        checkpoint_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, checkpoint_dir, ignore_errors=True)
+        self.checkpoint = os.path.join(checkpoint_dir, 'checkpoint.json')
+        self.members = []
+        for number in range(6):
+            user = User.objects.create_user(f'nightly{number}', f'nightly{number}@example.com')
+            self.members.append(UserProfile.objects.create(
+                user=user, profile_name=f'Nightly {number}', location='Perth WA',
+                date_of_birth=date(1970 + number * 3, 6, 1), preferred_age_min=30, preferred_age_max=50,
+                is_approved=number != 5, is_complete=True,
+            ))
+        UserBlock.objects.create(user=self.members[0].user, blocked_user_id=self.members[1].user_id)
+        # Left over from before member 5 was unapproved
+        RecommendedCandidate.objects.create(viewer=self.members[0].user, candidate=self.members[5], rank=1, score=1.0)
+
+    def precompute(self, *args):
+        call_command('precompute_recommendations', '--workers=1', '--shard-size=2', '--top-n=3',
+                     f'--checkpoint={self.checkpoint}', *args, stdout=io.StringIO())
+
+    def test_lists_match_ranking(self):
+        self.precompute()
+        pool = load_member_features()
+        hidden = load_block_pairs()
+        for viewer in pool:
+            expected = rank_candidates(viewer, pool, hidden.get(viewer['user_id'], ()), top_n=3)
+            stored = list(RecommendedCandidate.objects.filter(viewer_id=viewer['user_id'])
+                          .order_by('rank').values_list('candidate_id', 'score'))
+            self.assertEqual(stored, expected)
+        self.assertFalse(RecommendedCandidate.objects.filter(candidate=self.members[5]).exists())
+        self.assertFalse(RecommendedCandidate.objects.filter(viewer=self.members[0].user, candidate=self.members[1]).exists())
+        self.assertFalse(RecommendedCandidate.objects.filter(viewer=self.members[5].user).exists())
+
+    def test_resume_skips_stored_shards(self):
+        first_ids = [self.members[0].user_id, self.members[1].user_id]
+        with open(self.checkpoint, 'w', encoding='utf-8') as file:
+            file.write(f'{{"done_ranges": [[{min(first_ids)}, {max(first_ids)}]]}}')
+        self.precompute('--resume')
+
+        self.assertFalse(RecommendedCandidate.objects.filter(viewer_id__in=first_ids).exists())
+        for member in self.members[2:5]:
+            self.assertEqual(RecommendedCandidate.objects.filter(viewer=member.user).count(), 3)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+
+class UserAgentInterningTests(TestCase):
+    """Activity rows keep a UserAgent id, resolved from the LRU once warm"""
+
+    AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0) AppleWebKit/605.1.15 Safari/605.1.15'
+
+    def setUp(self):
+        clear_cache()
+        self.addCleanup(clear_cache)
+        self.member = User.objects.create_user('agent_member', 'agent_member@example.com')
+
+    def test_rows_share_one_agent(self):
+        for number in range(2):
+            UserActivityLog.objects.create(user=self.member, activity_type='login', user_agent=self.AGENT)
+        with CaptureQueriesContext(connection) as context:
+            log = UserActivityLog.objects.create(user=self.member, activity_type='login', user_agent=self.AGENT)
+        self.assertFalse([query for query in context if 'website_useragent' in query['sql']])
+
+        self.assertEqual(UserAgent.objects.count(), 1)
+        self.assertEqual(UserActivityLog.objects.filter(agent=log.agent_id, user_agent='').count(), 3)
+        self.assertEqual(UserActivityLog.objects.get(pk=log.pk).user_agent_text, self.AGENT)
+        rows = list(activity_log_rows(UserActivityLog.objects.filter(user=self.member)))
+        self.assertEqual({row['user_agent_text'] for row in rows}, {self.AGENT})
+
+    def test_long_agent_kept_whole(self):
+        agent = self.AGENT + ' x' * 2000
+        log = UserActivityLog.objects.create(user=self.member, activity_type='login', user_agent=agent)
+        self.assertEqual(UserActivityLog.objects.get(pk=log.pk).user_agent_text, agent)
+
+    def test_command_interns_legacy_rows(self):
+        UserActivityLog.objects.bulk_create([
+            UserActivityLog(user=self.member, activity_type='profile_view', user_agent=self.AGENT),
+            UserActivityLog(user=self.member, activity_type='login', additional_data={'user_agent': self.AGENT}),
+        ])
+        call_command('intern_user_agents', stdout=io.StringIO())
+
+        agent = UserAgent.objects.get()
+        self.assertEqual(agent.value, self.AGENT)
+        for log in UserActivityLog.objects.all():
+            self.assertEqual((log.agent_id, log.user_agent), (agent.id, ''))
+            self.assertNotIn('user_agent', log.additional_data or {})
+
+
+class ActivitySpoolTests(TestCase):
+    """A request's rows are written once at the end; the spool file outlives a failed write"""
+
+    def setUp(self):
+        self.spool = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool, ignore_errors=True)
+        settings_override = override_settings(ACTIVITY_LOG_SPOOL_DIR=self.spool, ACTIVITY_LOG_SPOOL_FSYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.member = User.objects.create_user('spooled', 'spooled@example.com')
+
+    def log_request(self, count):
+        start_buffer()
+        for number in range(count):
+            record(UserActivityLog(user=self.member, activity_type='profile_view',
+                                   additional_data={'date_id': number}))
+        self.assertEqual(UserActivityLog.objects.count(), 0)
+
+    def spool_files(self):
+        return sorted(os.listdir(self.spool))
+
+    def test_flush_writes_and_drops_spool(self):
+        self.log_request(3)
+        self.assertEqual(len(self.spool_files()), 1)
+        end_buffer()
+        self.assertEqual(UserActivityLog.objects.filter(user=self.member).count(), 3)
+        self.assertEqual(self.spool_files(), [])
+
+    def test_failed_write_keeps_spool_for_replay(self):
+        self.log_request(3)
+        failure = DatabaseError('database is down')
+        with mock.patch.object(UserActivityLog.objects, 'bulk_create', side_effect=failure), \
+                mock.patch.object(UserActivityLog, 'save', side_effect=failure):
+            end_buffer()
+        self.assertEqual(UserActivityLog.objects.count(), 0)
+        files = self.spool_files()
+        self.assertEqual(len(files), 1)
+
+        # replay only takes files left alone for --min-age seconds
+        old = timezone.now().timestamp() - 600
+        os.utime(os.path.join(self.spool, files[0]), (old, old))
+        call_command('replay_activity_spool', stdout=io.StringIO())
+        self.assertEqual(
+            sorted(UserActivityLog.objects.values_list('date_id', flat=True)), [0, 1, 2]
+        )
+        self.assertEqual(self.spool_files(), [])
+
+        # Replaying again finds nothing to do
+        call_command('replay_activity_spool', '--min-age=0', stdout=io.StringIO())
+        self.assertEqual(UserActivityLog.objects.count(), 3)
+
+
+class TargetUserExportTests(TestCase):
+    """Likes / favorites / blocks export with both usernames, however the target is stored"""
+
+    def test_like_export_rows(self):
+        staff = User.objects.create_superuser('export_admin', 'export_admin@example.com', 'password')
+        fans = [User.objects.create_user(f'fan{number}', f'fan{number}@example.com') for number in range(3)]
+        likes = [UserLike.objects.create(user=fan, liked_user_id=staff.id) for fan in fans]
+        UserLike.objects.create(user=staff, liked_user_id=987654)
+        self.client.force_login(staff)
+
+        url = reverse('admin:website_userlike_changelist')
+        self.assertContains(self.client.get(url), 'Liked User')
+        response = self.client.post(url, {'action': 'export_csv', '_selected_action': [like.id for like in likes]})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'User,User ID,Liked User,Liked User ID,Created At')
+        self.assertEqual(
+            [line.split(',')[:4] for line in lines[1:]],
+            [[fan.username, str(fan.id), 'export_admin', str(staff.id)] for fan in fans],
+        )
+
+        # A deleted target keeps its id and gets an empty username
+        missing = UserLike.objects.get(liked_user_id=987654)
+        response = self.client.post(url, {'action': 'export_csv', '_selected_action': [missing.id]})
+        row = b''.join(response.streaming_content).decode().splitlines()[1].split(',')
+        self.assertEqual(row[:4], ['export_admin', str(staff.id), '', '987654'])
+
+
+class StreamingExportTests(TestCase):
+    """Keyset batches read every row once; CSV, NDJSON and gzip encode them faithfully"""
+
+    def setUp(self):
+        self.member = User.objects.create_user('streamed', 'streamed@example.com')
+        stamp = timezone.now()
+        UserActivityLog.objects.bulk_create([
+            UserActivityLog(user=self.member, activity_type='profile_view', additional_data={'n': number},
+                            # Batches of 4 split runs of rows sharing one created_at
+                            created_at=stamp - timedelta(seconds=number // 3))
+            for number in range(10)
+        ])
+        self.logs = UserActivityLog.objects.filter(user=self.member)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_keyset_batches_cover_ties(self):
+        with CaptureQueriesContext(connection) as context:
+            rows = list(keyset_rows(self.logs, ['id', 'created_at'], batch_size=4))
+        self.assertEqual(len(context), 3)
+        self.assertEqual([row['id'] for row in rows],
+                         list(self.logs.order_by('created_at', 'id').values_list('id', flat=True)))
+
+    def test_csv_and_ndjson(self):
+        columns = ['id', 'activity_type', 'additional_data']
+        rows = list(keyset_rows(self.logs, columns, batch_size=4))
+
+        response = streaming_export(iter(rows), columns, 'logs', 'csv', headers=['ID', 'Type', 'Data'])
+        lines = self.body(response).decode().splitlines()
+        self.assertEqual(lines[0], 'ID,Type,Data')
+        self.assertEqual(len(lines), 11)
+        self.assertIn('"{""n"": ', lines[1])
+
+        response = streaming_export(iter(rows), columns, 'logs', 'ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('logs.ndjson', response['Content-Disposition'])
+        decoded = [json.loads(line) for line in self.body(response).decode().splitlines()]
+        self.assertEqual([row['id'] for row in decoded], [row['id'] for row in rows])
+        self.assertEqual(sorted(row['additional_data']['n'] for row in decoded), list(range(10)))
+
+    def test_gzip_round_trip(self):
+        columns = ['id', 'created_at']
+        plain = self.body(streaming_export(keyset_rows(self.logs, columns), columns, 'logs'))
+        response = streaming_export(keyset_rows(self.logs, columns), columns, 'logs', compress=True)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('logs.csv.gz', response['Content-Disposition'])
+        self.assertEqual(gzip.decompress(self.body(response)), plain)
+
+
+class ActivityKeyPromotionTests(TestCase):
+    """Lookup keys in additional_data land in their indexed columns on every write path"""
+
+    KEYS = {'message_id': 5, 'conversation_id': 6, 'request_id': 7, 'date_id': 8}
+
+    def setUp(self):
+        self.member = User.objects.create_user('promoted', 'promoted@example.com')
+
+    def columns(self, log):
+        log = UserActivityLog.objects.get(pk=log.pk)
+        return {key: getattr(log, key) for key in self.KEYS}
+
+    def test_save_promotes_keys(self):
+        log = UserActivityLog.objects.create(
+            user=self.member, activity_type='message_sent', additional_data={**self.KEYS, 'message_id': '5'}
+        )
+        self.assertEqual(self.columns(log), self.KEYS)
+
+    def test_batch_approval_promotes_request_id(self):
+        staff = User.objects.create_superuser('promote_admin', 'promote_admin@example.com', 'password')
+        UserProfile.objects.create(user=self.member, profile_name='Before', location='Sydney')
+        edit_request = ProfileEditRequest(user=self.member)
+        for field in ProfileEditRequest.PROFILE_FIELDS:
+            setattr(edit_request, field, getattr(self.member.profile, field))
+        edit_request.profile_name = 'After'
+        edit_request.save()
+
+        ProfileEditRequest.approve_many([edit_request], staff)
+        log = UserActivityLog.objects.get(activity_type='profile_approved')
+        self.assertEqual(log.request_id, edit_request.id)
+
+    def test_backfill_fills_existing_rows(self):
+        # bulk_create skips save(), like rows written before the columns existed
+        command_rows = UserActivityLog.objects.bulk_create([
+            UserActivityLog(user=self.member, activity_type='message_sent', additional_data=self.KEYS)
+            for number in range(3)
+        ])
+        self.assertEqual(self.columns(command_rows[0]), dict.fromkeys(self.KEYS))
+        call_command('backfill_activity_keys', '--batch-size=2', stdout=io.StringIO())
+        for log in command_rows:
+            self.assertEqual(self.columns(log), self.KEYS)
+
+        migrated = UserActivityLog.objects.bulk_create([
+            UserActivityLog(user=self.member, activity_type='date_created', additional_data={'date_id': 'x'}),
+            UserActivityLog(user=self.member, activity_type='date_created', additional_data={'date_id': 9}),
+        ])
+        migration = importlib.import_module('website.migrations.0030_dedupe_paired_activity')
+        migration.backfill_keys(apps.get_model('website', 'UserActivityLog'))
+        self.assertIsNone(UserActivityLog.objects.get(pk=migrated[0].pk).date_id)
+        self.assertEqual(UserActivityLog.objects.get(pk=migrated[1].pk).date_id, 9)
+
+
+def unconnected_signal_handlers():
+    """website/signals.py with @receiver as a no-op - its handlers, without connecting them for other tests"""
+    spec = importlib.util.spec_from_file_location(
+        'website.signals_under_test', os.path.join(os.path.dirname(__file__), 'signals.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch('django.dispatch.receiver', lambda *args, **kwargs: (lambda handler: handler)):
+        spec.loader.exec_module(module)
+    return module
+
+
+class TrackedFieldsTests(TestCase):
+    """Save handlers see old and new values from the load-time snapshot, without re-reading the row"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.handlers = unconnected_signal_handlers()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sender = User.objects.create_user('tracked_sender', 'tracked_sender@example.com')
+        cls.receiver = User.objects.create_user('tracked_receiver', 'tracked_receiver@example.com')
+
+    def test_changed_then_unchanged_save(self):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.sender, self.receiver)
+        message = Message.objects.create(conversation=conversation, sender=self.sender, content='Hello')
+        message = Message.objects.get(pk=message.pk)
+
+        message.is_read = True
+        self.assertEqual(message.tracked_changes(), {'is_read': (False, True)})
+        with CaptureQueriesContext(connection) as context:
+            self.handlers.log_message_read(sender=Message, instance=message)
+        self.assertFalse([query for query in context if 'FROM "website_message"' in query['sql']])
+        log = UserActivityLog.objects.get(activity_type='message_read')
+        self.assertEqual((log.user_id, log.target_user_id, log.message_id), (self.receiver.id, self.sender.id, message.id))
+
+        # Once saved, the snapshot moves on - saving again logs nothing
+        message.save()
+        self.assertEqual(message.tracked_changes(), {})
+        self.handlers.log_message_read(sender=Message, instance=message)
+        self.assertEqual(UserActivityLog.objects.filter(activity_type='message_read').count(), 1)
+
+    def test_update_fields(self):
+        date_event = DateEvent.objects.create(
+            host=self.sender, title='Walk', activity='Walk / Park', vibe='Chill', budget='Free',
+            duration='60 min', date_time=timezone.now() + timedelta(days=1), area='CBD', group_size='1_on_1',
+        )
+        date_event = DateEvent.objects.get(pk=date_event.pk)
+        date_event.is_cancelled = True
+
+        # A save that doesn't write is_cancelled neither logs it nor forgets it changed
+        self.handlers.log_date_cancelled(sender=DateEvent, instance=date_event, update_fields=frozenset({'title'}))
+        date_event.save(update_fields=['title'])
+        self.assertFalse(UserActivityLog.objects.filter(activity_type='date_cancelled').exists())
+        self.assertEqual(date_event.tracked_changes(), {'is_cancelled': (False, True)})
+
+        self.handlers.log_date_cancelled(sender=DateEvent, instance=date_event,
+                                         update_fields=frozenset({'is_cancelled'}))
+        date_event.save(update_fields=['is_cancelled'])
+        self.assertEqual(UserActivityLog.objects.filter(activity_type='date_cancelled').count(), 1)
+        self.assertEqual(date_event.tracked_changes(), {})
+        self.assertTrue(DateEvent.objects.get(pk=date_event.pk).is_cancelled)
+
+
+def create_date_event(host, days_ahead=1, created_at=None, **fields):
+    """A live date `days_ahead` days out; created_at is backdated with update() as auto_now_add ignores it"""
+    fields = {
+        'title': 'Coffee', 'activity': 'Coffee', 'vibe': 'Chill', 'budget': '$', 'duration': '60 min',
+        'area': 'CBD', 'group_size': 'group', **fields,
+    }
+    date_event = DateEvent.objects.create(
+        host=host, date_time=timezone.now() + timedelta(days=days_ahead), **fields
+    )
+    if created_at:
+        DateEvent.objects.filter(pk=date_event.pk).update(created_at=created_at)
+        date_event.created_at = created_at
+    return date_event
+
+
+class DatesFeedTests(TestCase):
+    """The feed pages upcoming dates with a per-row `seen` flag computed in the page query"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user('feed_viewer', 'feed_viewer@example.com')
+        host = User.objects.create_user('feed_host', 'feed_host@example.com')
+        cls.watermark = timezone.now() - timedelta(days=1)
+        # 25 upcoming dates: the first 10 posted before the viewer's watermark
+        cls.dates = [
+            create_date_event(host, days_ahead=number + 1, title=f'Date {number}',
+                              created_at=cls.watermark - timedelta(hours=1) if number < 10 else None)
+            for number in range(25)
+        ]
+        create_date_event(host, days_ahead=-1, title='Past')
+        create_date_event(host, days_ahead=3, title='Cancelled', is_cancelled=True)
+        DateView.objects.create(user=cls.viewer, date_event=cls.dates[12])
+        DateSeenWatermark.objects.create(user=cls.viewer, seen_until=cls.watermark)
+
+    def get_page(self, **params):
+        # Each visit advances the watermark - start every page from the same one
+        DateSeenWatermark.objects.filter(user=self.viewer).update(seen_until=self.watermark)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('dates_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj'], len(context)
+
+    def test_seen_flag_and_paging(self):
+        self.client.force_login(self.viewer)
+        first, first_queries = self.get_page()
+        second, second_queries = self.get_page(page=2)
+
+        self.assertEqual(first.paginator.count, 25)
+        self.assertEqual([event.title for event in first], [f'Date {number}' for number in range(20)])
+        self.assertEqual([event.title for event in second], [f'Date {number}' for number in range(20, 25)])
+        seen = {event.title for page in (first, second) for event in page if event.seen}
+        self.assertEqual(seen, {f'Date {number}' for number in range(10)} | {'Date 12'})
+        # The flag rides on the page query - five rows cost the same queries as twenty
+        self.assertEqual(first_queries, second_queries)
+
+        # Out-of-range and non-numeric pages fall back instead of failing
+        self.assertEqual(self.get_page(page=9)[0].number, 2)
+        self.assertEqual(self.get_page(page='x')[0].number, 1)
+
+    def test_archived(self):
+        self.client.force_login(self.viewer)
+        page = self.get_page(view='archived')[0]
+        self.assertEqual([event.title for event in page], ['Past'])
+
+
+class DateSeenWatermarkTests(TestCase):
+    """The new-dates badge counts posts since the member last opened the feed"""
+
+    def badge(self):
+        return self.client.get(reverse('dates_new_count')).json()['count']
+
+    def test_badge_follows_feed_visits(self):
+        viewer = User.objects.create_user('badge_viewer', 'badge_viewer@example.com')
+        host = User.objects.create_user('badge_host', 'badge_host@example.com')
+        self.client.force_login(viewer)
+        for number in range(3):
+            create_date_event(host, title=f'Date {number}')
+        create_date_event(viewer, title='Own date')
+        create_date_event(host, days_ahead=-1, title='Past')
+
+        # Never opened the feed: every upcoming date by someone else is new
+        self.assertEqual(self.badge(), 3)
+        self.client.get(reverse('dates_list'))
+        seen_until = DateSeenWatermark.get_for(viewer)
+        self.assertIsNotNone(seen_until)
+        self.assertEqual(self.badge(), 0)
+        self.assertEqual(self.client.get(reverse('notification_counts')).json()['dates'], 0)
+
+        create_date_event(host, title='Posted later')
+        self.assertEqual(self.badge(), 1)
+        # The archive doesn't count as catching up
+        self.client.get(reverse('dates_list'), {'view': 'archived'})
+        self.assertEqual(self.badge(), 1)
+        self.client.get(reverse('dates_list'))
+        self.assertEqual(self.badge(), 0)
+
+    def test_advance_never_moves_back(self):
+        viewer = User.objects.create_user('watermark_viewer', 'watermark_viewer@example.com')
+        now = timezone.now()
+        DateSeenWatermark.advance(viewer, now)
+        DateSeenWatermark.advance(viewer, now - timedelta(hours=1))
+        self.assertEqual(DateSeenWatermark.get_for(viewer), now)
+        DateSeenWatermark.advance(viewer, now + timedelta(hours=1))
+        self.assertEqual(DateSeenWatermark.get_for(viewer), now + timedelta(hours=1))
+        self.assertEqual(DateSeenWatermark.objects.filter(user=viewer).count(), 1)
+
+
+class DateSearchFacetTests(TestCase):
+    """Date discovery counts every facet option in one aggregate, against the other active filters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user('discover_viewer', 'discover_viewer@example.com')
+        host = User.objects.create_user('discover_host', 'discover_host@example.com')
+        blocked = User.objects.create_user('discover_blocked', 'discover_blocked@example.com')
+        UserBlock.objects.create(user=cls.viewer, blocked_user_id=blocked.id)
+        create_date_event(host, activity='Coffee', vibe='Chill', area='Bondi')
+        create_date_event(host, activity='Coffee', vibe='Classy', area='CBD')
+        create_date_event(host, activity='Dinner', vibe='Chill', area='Bondi')
+        create_date_event(host, activity='Dinner', vibe='Classy', area='Manly', days_ahead=-1)
+        create_date_event(host, activity='Movie', vibe='Chill', area='Newtown', is_cancelled=True)
+        create_date_event(blocked, activity='Coffee', vibe='Chill', area='Bondi')
+
+    def counts(self, facets, name):
+        return {option['value']: option['count'] for option in facets[name] if option['count']}
+
+    def test_facet_counts(self):
+        self.client.force_login(self.viewer)
+        data = self.client.get(reverse('dates_search'), {'activity': 'Coffee', 'area': 'Bondi'}).json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual([(result['activity'], result['area']) for result in data['results']], [('Coffee', 'Bondi')])
+        self.assertFalse(data['results'][0]['seen'])
+        # Past, cancelled and blocked hosts' dates aren't options at all
+        self.assertEqual([option['value'] for option in data['facets']['area']], ['Bondi', 'CBD'])
+        self.assertEqual(self.counts(data['facets'], 'activity'), {'Coffee': 1, 'Dinner': 1})
+        self.assertEqual(self.counts(data['facets'], 'area'), {'Bondi': 1, 'CBD': 1})
+        self.assertEqual(self.counts(data['facets'], 'vibe'), {'Chill': 1})
+        self.assertTrue(next(option for option in data['facets']['area'] if option['value'] == 'Bondi')['selected'])
+
+        # An area past the option cap stays selectable
+        data = self.client.get(reverse('dates_search'), {'area': 'Nowhere'}).json()
+        self.assertEqual(data['total'], 0)
+        self.assertEqual(data['facets']['area'][-1], {'value': 'Nowhere', 'label': 'Nowhere', 'count': 0,
+                                                      'selected': True})
+
+    def test_one_aggregate(self):
+        base = searchable_dates(self.viewer)
+        dimensions = date_dimensions(area_options(base))
+        with CaptureQueriesContext(connection) as context:
+            facets = facet_counts(base, dimensions, {'vibe': ['Chill']})
+        self.assertEqual(len(context), 1)
+        self.assertEqual(self.counts(facets, 'vibe'), {'Chill': 2, 'Classy': 1})
+        self.assertEqual(self.counts(facets, 'activity'), {'Coffee': 1, 'Dinner': 1})
+
+
+class RecentWindowInlineTests(TestCase):
+    """The user change page shows only the newest rows of each log-like inline"""
+
+    WINDOW = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('window_admin', 'window_admin@example.com', 'password')
+        cls.member = User.objects.create_user('window_member', 'window_member@example.com')
+        cls.conversation = Conversation.objects.create()
+        cls.conversation.participants.add(cls.member, cls.staff)
+        cls.add_rows(5)
+
+    @classmethod
+    def add_rows(cls, count):
+        start = UserLike.objects.filter(user=cls.member).count()
+        for number in range(start, start + count):
+            created_at = timezone.now() - timedelta(days=100 - number)
+            UserActivityLog.objects.create(user=cls.member, activity_type='profile_view',
+                                           target_user=cls.staff, created_at=created_at)
+            like = UserLike.objects.create(user=cls.member, liked_user_id=10000 + number)
+            UserLike.objects.filter(pk=like.pk).update(created_at=created_at)
+            message = Message.objects.create(conversation=cls.conversation, sender=cls.member,
+                                             content=f'Message {number}')
+            Message.objects.filter(pk=message.pk).update(created_at=created_at)
+
+    def get_change_page(self):
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:auth_user_change', args=[self.member.id]))
+        self.assertEqual(response.status_code, 200)
+        inlines = {
+            inline.formset.model: inline for inline in response.context['inline_admin_formsets']
+            if inline.formset.model is not UserProfile
+        }
+        return response, inlines, len(context)
+
+    def test_more_rows_than_the_window(self):
+        self.get_change_page()  # the first visit fills per-process caches
+        baseline = self.get_change_page()[2]
+        self.add_rows(20)
+        response, inlines, queries = self.get_change_page()
+        self.assertEqual(queries, baseline)
+
+        self.assertEqual(
+            [form.instance.content for form in inlines[Message].formset.forms],
+            [f'Message {number}' for number in range(24, 24 - self.WINDOW, -1)],
+        )
+        self.assertEqual(
+            [form.instance.liked_user_id for form in inlines[UserLike].formset.forms],
+            [10000 + number for number in range(24, 24 - self.WINDOW, -1)],
+        )
+        self.assertEqual(len(inlines[UserActivityLog].formset.forms), self.WINDOW)
+        self.assertContains(response, 'Likes given (latest 10) &middot; <a href="'
+                            + reverse('admin:website_userlike_changelist')
+                            + f'?user__id__exact={self.member.id}">view all</a>', html=False)
+        self.assertContains(response, reverse('admin:auth_user_timeline', args=[self.member.id]))
+
+    def test_title_without_link(self):
+        with mock.patch.object(UserLikeInline, 'view_all_url', return_value=None):
+            response, inlines, queries = self.get_change_page()
+        self.assertEqual(str(inlines[UserLike].opts.verbose_name_plural), 'Likes given (latest 10)')
+        self.assertNotContains(response, reverse('admin:website_userlike_changelist') + '?user__id__exact')
+        self.assertEqual(len(inlines[UserLike].formset.forms), 5)
+
+
+@override_settings(ADMIN_ESTIMATE_THRESHOLD=100)
+class EstimatedCountPaginatorTests(TestCase):
+    """Past the threshold the message changelist pages on an estimate, with no exact COUNT(*)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('estimate_admin', 'estimate_admin@example.com', 'password')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(cls.staff)
+        Message.objects.bulk_create([
+            Message(conversation=conversation, sender=cls.staff, content=f'Message {number}')
+            for number in range(120)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.staff)
+
+    def get_changelist(self, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:website_message_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        counts = [query['sql'] for query in context if 'COUNT(' in query['sql'].upper()]
+        return response, counts
+
+    def test_no_exact_count_above_threshold(self):
+        # SQLite's "estimate" is one exact count, cached - the next page views reuse it
+        self.get_changelist()
+        response, counts = self.get_changelist()
+        self.assertEqual(counts, [])
+        self.assertTrue(response.context['cl'].paginator.estimated)
+        self.assertContains(response, 'about 120 messages')
+
+        pages = [self.get_changelist(p=number) for number in (1, 2, 3)]
+        self.assertEqual([counts for response, counts in pages], [[], [], []])
+        ids = [message.id for response, counts in pages for message in response.context['cl'].result_list]
+        self.assertEqual(len(ids), 120)
+        self.assertEqual(set(ids), set(Message.objects.values_list('id', flat=True)))
+
+        # An estimate may be short - pages past the "last" one still load
+        response, counts = self.get_changelist(p=4)
+        self.assertEqual(list(response.context['cl'].result_list), [])
+        self.assertEqual(counts, [])
+
+    @override_settings(ADMIN_ESTIMATE_THRESHOLD=1000)
+    def test_exact_count_below_threshold(self):
+        response, counts = self.get_changelist()
+        self.assertFalse(response.context['cl'].paginator.estimated)
+        self.assertContains(response, '120 messages')
+        self.assertNotContains(response, 'about 120')
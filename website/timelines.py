@@ -0,0 +1,251 @@
+# timelines.py - Keyset-paginated, newest-first timelines for staff investigations
+"""
+A page is read with one indexed range scan per source, each seeking past
+the previous page's last entry (a cursor) instead of using OFFSET, and
+the sources are merged newest-first with heapq. Page 500 costs the same
+as page 1, however long the history.
+
+Entries are dicts with at least created_at, source and id; the merge
+order - and the cursor - is (created_at, source, id), newest first.
+"""
+import heapq
+from datetime import datetime
+from itertools import chain, islice
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+from .activity_partitions import with_archives
+from .models import (
+    UserActivityLog, Conversation, Message, UserLike, UserFavorite, UserBlock, PrivateAccessRequest
+)
+
+PAGE_SIZE = 50
+ACTIVITY_LABELS = dict(UserActivityLog.ACTIVITY_TYPES)
+
+
+# ==================== CURSORS ====================
+
+def encode_cursor(entry):
+    return f"{entry['created_at'].isoformat()}~{entry['source']}~{entry['id']}"
+
+
+def decode_cursor(value):
+    """(created_at, source, id) from encode_cursor(); None for a missing or mangled cursor"""
+    if not value:
+        return None
+    try:
+        # An unescaped '+' in the UTC offset arrives as a space
+        created_at, source, pk = value.replace(' ', '+').split('~')
+        return datetime.fromisoformat(created_at), source, int(pk)
+    except ValueError:
+        return None
+
+
+def seek(queryset, source, cursor, field='created_at', newest_first=True):
+    """Rows of one source that sort after cursor in (created_at, source, id) order"""
+    if cursor is None:
+        return queryset
+    created_at, cursor_source, pk = cursor
+    op = 'lt' if newest_first else 'gt'
+    if source == cursor_source:
+        return queryset.filter(Q(**{f'{field}__{op}': created_at}) | Q(**{field: created_at, f'id__{op}': pk}))
+    # At the cursor's timestamp, a source that sorts later in page order still has every row to come
+    if (source < cursor_source) == newest_first:
+        return queryset.filter(**{f'{field}__{op}e': created_at})
+    return queryset.filter(**{f'{field}__{op}': created_at})
+
+
+def ordered(queryset, field='created_at', newest_first=True):
+    if newest_first:
+        return queryset.order_by(f'-{field}', '-id')
+    return queryset.order_by(field, 'id')
+
+
+def page_rows(queryset, source, cursor, limit, newest_first=True):
+    """
+    Up to limit + 1 rows of one source past cursor, in page order. Activity
+    rotated into SQLite archive tables follows on once the live rows run out.
+    """
+    rows = ordered(seek(queryset, source, cursor, newest_first=newest_first), newest_first=newest_first)
+    return chain.from_iterable(part[:limit + 1] for part in with_archives(rows, newest_first))
+
+
+# ==================== MERGING ====================
+
+def sort_key(entry):
+    return entry['created_at'], entry['source'], entry['id']
+
+
+def merge_page(sources, limit=PAGE_SIZE, newest_first=True):
+    """
+    Merge iterables already in page order into one page.
+    Returns (entries, next_cursor); next_cursor is None on the last page.
+    """
+    merged = list(islice(heapq.merge(*sources, key=sort_key, reverse=newest_first), limit + 1))
+    entries = merged[:limit]
+    has_more = len(merged) > limit
+    return entries, encode_cursor(entries[-1]) if has_more else None
+
+
+# ==================== ACTIVITY TIMELINE ====================
+
+def activity_timeline(user_id, cursor=None, activity_type=None, counterpart_id=None, limit=PAGE_SIZE):
+    """
+    One member's activity log as they saw it (like involving() + as_seen_by()),
+    newest first. Two range scans per page: the member's own rows on the
+    (user, created_at) index and two-party rows where they were the
+    counterpart on the (target_user, created_at) one.
+    """
+    cursor = decode_cursor(cursor) if isinstance(cursor, str) else cursor
+    logs = UserActivityLog.objects.select_related('agent')
+
+    own = logs.filter(user_id=user_id)
+    if activity_type:
+        own = own.filter(activity_type=activity_type)
+    if counterpart_id:
+        own = own.filter(target_user_id=counterpart_id)
+
+    # Mirrored rows: message_sent by someone else is this member's message_received
+    mirrored_types = [
+        actor_type for actor_type, seen_type in UserActivityLog.COUNTERPART_TYPES.items()
+        if not activity_type or seen_type == activity_type
+    ]
+    received = logs.filter(target_user_id=user_id, activity_type__in=mirrored_types).exclude(user_id=user_id)
+    if counterpart_id:
+        received = received.filter(user_id=counterpart_id)
+
+    sources = [
+        (timeline_entry(log, user_id) for log in page_rows(own, 'activity', cursor, limit)),
+    ]
+    if mirrored_types:
+        sources.append(
+            timeline_entry(log, user_id) for log in page_rows(received, 'activity', cursor, limit)
+        )
+    entries, next_cursor = merge_page(sources, limit)
+    add_usernames(entries)
+    return entries, next_cursor
+
+
+def timeline_entry(log, user_id):
+    own = log.user_id == user_id
+    activity_type = log.activity_type if own else UserActivityLog.COUNTERPART_TYPES[log.activity_type]
+    return {
+        'source': 'activity',
+        'id': log.id,
+        'created_at': log.created_at,
+        'activity_type': activity_type,
+        'activity_label': ACTIVITY_LABELS.get(activity_type, activity_type),
+        'counterpart_id': log.target_user_id if own else log.user_id,
+        'ip_address': log.ip_address,
+        'user_agent': log.user_agent_text,
+        'details': log.additional_data or {},
+    }
+
+
+def add_usernames(entries, id_field='counterpart_id', username_field='counterpart_username'):
+    """Fill in counterpart usernames for a page with one in_bulk query"""
+    ids = {entry[id_field] for entry in entries if entry.get(id_field)}
+    usernames = User.objects.only('username').in_bulk(ids) if ids else {}
+    for entry in entries:
+        user = usernames.get(entry.get(id_field))
+        entry[username_field] = user.username if user else None
+
+
+# ==================== PAIR TIMELINE ====================
+
+PAIR_COLUMNS = ['created_at', 'source', 'id', 'actor_id', 'actor', 'event', 'detail']
+
+
+def shared_conversation_ids(user_a, user_b):
+    participants = Conversation.participants.through.objects
+    return list(participants.filter(
+        user_id=user_a,
+        conversation_id__in=participants.filter(user_id=user_b).values('conversation_id'),
+    ).values_list('conversation_id', flat=True))
+
+
+def _either_way(user_field, other_field, user_a, user_b):
+    return Q(**{user_field: user_a, other_field: user_b}) | Q(**{user_field: user_b, other_field: user_a})
+
+
+def pair_sources(user_a, user_b):
+    """
+    [(source, queryset of .values() rows, row -> entry)] for everything
+    between two members. Per-sender / per-actor querysets keep each one
+    a range scan on a (user, created_at)-style index.
+    """
+    conversation_ids = shared_conversation_ids(user_a, user_b)
+    sources = []
+
+    for sender_id in (user_a, user_b):
+        if conversation_ids:
+            sources.append(('message', Message.objects.filter(
+                sender_id=sender_id, conversation_id__in=conversation_ids,
+            ).values('id', 'created_at', 'sender_id', 'conversation_id', 'content'), lambda row: {
+                'actor_id': row['sender_id'],
+                'event': 'message',
+                'detail': row['content'],
+                'conversation_id': row['conversation_id'],
+            }))
+        other_id = user_b if sender_id == user_a else user_a
+        sources.append(('activity', UserActivityLog.objects.filter(
+            user_id=sender_id, target_user_id=other_id,
+        ).values('id', 'created_at', 'user_id', 'activity_type', 'additional_data'), lambda row: {
+            'actor_id': row['user_id'],
+            'event': row['activity_type'],
+            'detail': row['additional_data'] or {},
+        }))
+
+    # At most a row each way - one small query per table
+    for source, model, other_field in (
+        ('like', UserLike, 'liked_user_id'),
+        ('favorite', UserFavorite, 'favorite_user_id'),
+        ('block', UserBlock, 'blocked_user_id'),
+    ):
+        sources.append((source, model.objects.filter(
+            _either_way('user_id', other_field, user_a, user_b)
+        ).values('id', 'created_at', 'user_id'), lambda row, source=source: {
+            'actor_id': row['user_id'],
+            'event': source,
+            'detail': '',
+        }))
+
+    sources.append(('access_request', PrivateAccessRequest.objects.filter(
+        _either_way('requester_id', 'target_user_id', user_a, user_b)
+    ).values('id', 'created_at', 'requester_id', 'status', 'message'), lambda row: {
+        'actor_id': row['requester_id'],
+        'event': 'private_access_request',
+        'detail': f"{row['status']}: {row['message']}" if row['message'] else row['status'],
+    }))
+    return sources
+
+
+def pair_timeline(user_a, user_b, cursor=None, limit=PAGE_SIZE, newest_first=True, sources=None):
+    """
+    One page of everything between two members, merged across tables.
+    Each source reads at most limit + 1 rows past the cursor, in page order.
+    """
+    cursor = decode_cursor(cursor) if isinstance(cursor, str) else cursor
+    sources = sources if sources is not None else pair_sources(user_a, user_b)
+
+    def entries(source, queryset, to_entry):
+        for row in page_rows(queryset, source, cursor, limit, newest_first):
+            yield {'source': source, 'id': row['id'], 'created_at': row['created_at'], **to_entry(row)}
+
+    page, next_cursor = merge_page(
+        [entries(*source) for source in sources], limit, newest_first
+    )
+    add_usernames(page, 'actor_id', 'actor')
+    return page, next_cursor
+
+
+def pair_timeline_entries(user_a, user_b, batch_size=1000):
+    """The whole pair timeline, oldest first, one page of range scans at a time (for exports)"""
+    sources = pair_sources(user_a, user_b)
+    cursor = None
+    while True:
+        page, cursor = pair_timeline(user_a, user_b, cursor, batch_size, newest_first=False, sources=sources)
+        yield from page
+        if not cursor:
+            return
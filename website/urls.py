@@ -8,6 +8,7 @@ urlpatterns = [
     # Basic pages
     path('', views.index, name='index'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('api/members/search/', views.member_search, name='member_search'),
     path('join/', views.join, name='join'),
     path('login/', views.login_page, name='login'),
     
@@ -50,6 +51,7 @@ urlpatterns = [
     path('matches/', views.matches_list, name='matches_list'),
     path('dates/', views.dates_list, name='dates_list'),
     path('dates/create/', views.dates_create, name='dates_create'),
+    path('api/dates/search/', views.dates_search, name='dates_search'),
     
     # Blog
     path('blog/', views.blog, name='blog'),
@@ -102,6 +104,10 @@ urlpatterns = [
     # Dates URLs
     path('dates/<int:dates_id>/mark-seen/', views.mark_date_seen, name='mark_date_seen'),
     path('dates/<int:dates_id>/cancel/', views.cancel_date, name='cancel_date'),
+    path('dates/<int:dates_id>/rsvp/', views.date_rsvp, name='date_rsvp'),
+    path('dates/<int:dates_id>/rsvp/cancel/', views.date_rsvp_cancel, name='date_rsvp_cancel'),
+    path('api/dates/<int:dates_id>/attendees/', views.date_attendees, name='date_attendees'),
+    path('api/dates/mine/', views.my_upcoming_dates, name='my_upcoming_dates'),
     
     # Profile Edit System URLs
     path('api/profile/edit-request/', views.profile_edit_request, name='profile_edit_request'),
@@ -109,6 +115,9 @@ urlpatterns = [
     # LEGAL COMPLIANCE: Data export endpoints (Admin only)
     path('api/legal/export-user-data/', views.export_user_data, name='export_user_data'),
     path('api/legal/export-user-data/<int:user_id>/', views.export_user_data, name='export_user_data_detail'),
+    path('api/legal/data-exports/<int:export_id>/', views.data_export_status, name='data_export_status'),
+    path('api/legal/data-exports/<int:export_id>/download/', views.download_data_export, name='download_data_export'),
+    path('api/legal/export-activity-logs/', views.export_activity_logs, name='export_activity_logs'),
     
     # Private Access Management URLs - NEW
     path('api/private-access/request/<int:user_id>/', views.request_private_access, name='request_private_access_api'),
@@ -0,0 +1,59 @@
+# user_agents.py - Interned User-Agent strings with an in-process LRU
+"""
+A few hundred distinct browser strings account for millions of activity
+rows, so rows store a UserAgent id instead of the text. agent_id_for()
+resolves text -> id from an LRU dict first and only queries on a miss.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.db import connection
+
+LRU_SIZE = 2048
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def digest_for(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+def agent_id_for(value):
+    """UserAgent id for a User-Agent string, creating the row on first sight"""
+    from .models import UserAgent
+
+    # Kept whole - the log is evidence, and the digest keys strings of any length
+    value = value or ''
+    if not value:
+        return None
+    digest = digest_for(value)
+
+    with _lock:
+        agent_id = _cache.get(digest)
+        if agent_id is not None:
+            _cache.move_to_end(digest)
+            return agent_id
+
+    try:
+        agent, created = UserAgent.objects.get_or_create(digest=digest, defaults={'value': value})
+    except Exception as e:
+        print(f"Error interning user agent: {e}")
+        return None
+
+    # A row created inside a transaction may still roll back - don't remember it yet
+    if created and connection.in_atomic_block:
+        return agent.id
+
+    with _lock:
+        _cache[digest] = agent.id
+        _cache.move_to_end(digest)
+        while len(_cache) > LRU_SIZE:
+            _cache.popitem(last=False)
+    return agent.id
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
@@ -1,13 +1,15 @@
 # views.py - COMPLETE WITH ALL WORKING VIEWS
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib import messages
-from django.http import JsonResponse, Http404
+from django.http import JsonResponse, Http404, FileResponse
 from django.contrib.auth import get_user_model
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 import json
 import csv
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
 from django.contrib.auth.forms import PasswordResetForm
@@ -22,9 +24,18 @@ from django.views.decorators.csrf import csrf_exempt
 from .models import (
     BlogPost, UserLike, UserFavorite, UserBlock, DateEvent, DateView, 
     ProfileEditRequest, UserProfile, Conversation, Message, UserIdMapping,
-    PrivateAccessRequest, PrivateImage, UserActivityLog  # Added UserActivityLog
+    PrivateAccessRequest, PrivateImage, UserActivityLog,  # Added UserActivityLog
+    DateSeenWatermark, DateRSVP, DataExport
 )
 from .db_helpers import get_profile_by_id, get_all_profile_ids, get_all_profiles
+from .search import (
+    member_dimensions, searchable_members, selected_from_querydict,
+    apply_facet_filters, facet_counts,
+    date_dimensions, searchable_dates, area_options
+)
+from .recommendations import recommended_for
+from .exports import activity_log_export
+from .data_exports import request_export
 from django.utils.dateparse import parse_datetime
 
 # ============================================================================
@@ -239,6 +250,7 @@ def faq(request):
 def dashboard(request):
     # Get current user's profile ID
     current_user_profile_id = None
+    user_profile = None
     try:
         user_profile = UserProfile.objects.get(user=request.user)
         current_user_profile_id = user_profile.id
@@ -246,8 +258,17 @@ def dashboard(request):
         # User doesn't have a profile yet, don't exclude anything
         current_user_profile_id = None
     
-    # Get all profiles EXCEPT current user's
-    all_profiles = get_all_profiles(exclude_id=current_user_profile_id)
+    # Optional "within N km" filter - ?within_km=25 or ?within_km=preferred
+    within_km = _parse_within_km(request.GET.get('within_km'), user_profile)
+    
+    if within_km and user_profile and user_profile.has_coordinates:
+        nearby_ids = list(UserProfile.objects.within_km(
+            user_profile.latitude, user_profile.longitude, within_km
+        ).values_list('id', flat=True))
+        all_profiles = get_all_profiles(exclude_id=current_user_profile_id, profile_ids=nearby_ids)
+    else:
+        # Get all profiles EXCEPT current user's
+        all_profiles = get_all_profiles(exclude_id=current_user_profile_id)
     
     print(f"DEBUG: Getting profiles, excluding ID: {current_user_profile_id}")
     print(f"DEBUG: Got {len(all_profiles)} profiles")
@@ -262,12 +283,101 @@ def dashboard(request):
     except EmptyPage:
         profiles = paginator.page(paginator.num_pages)
     
+    # Precomputed nightly - a single indexed read
+    recommended = recommended_for(request.user) if profiles.number == 1 else []
+    
     context = {
         'profiles': profiles,
         'page_obj': profiles,
+        'recommended': recommended,
+        'within_km': request.GET.get('within_km', ''),
+        'distance_options': DASHBOARD_DISTANCE_OPTIONS,
+        'can_filter_distance': bool(user_profile and user_profile.has_coordinates),
     }
     return render(request, 'website/dashboard.html', context)
 
+DASHBOARD_DISTANCE_OPTIONS = [5, 10, 25, 50, 100, 250]
+
+def _parse_within_km(value, user_profile=None):
+    """Turn the within_km query param into a radius, or None for 'anywhere'"""
+    if not value:
+        return None
+    if value == 'preferred':
+        return user_profile.preferred_distance if user_profile else None
+    try:
+        radius = int(value)
+    except (TypeError, ValueError):
+        return None
+    return radius if radius > 0 else None
+
+# -------------------------
+# MEMBER SEARCH (FACETED)
+# -------------------------
+
+@login_required
+def member_search(request):
+    """
+    Combinable member filters + facet counts for the filter sidebar.
+    ?gender=female&age=25-34&state=nsw&smoker=no&within_km=25&page=2
+    """
+    dimensions = member_dimensions()
+    selected = selected_from_querydict(request.GET, dimensions)
+    base = searchable_members(request.user)
+    
+    # Distance narrows both the results and the facet counts
+    viewer_profile = UserProfile.objects.filter(user=request.user).first()
+    within_km = _parse_within_km(request.GET.get('within_km'), viewer_profile)
+    if within_km and viewer_profile and viewer_profile.has_coordinates:
+        base = base.filter(id__in=UserProfile.objects.within_km(
+            viewer_profile.latitude, viewer_profile.longitude, within_km
+        ).values('id'))
+    
+    results = apply_facet_filters(base, dimensions, selected).order_by('-created_at', '-id')
+    
+    paginator = Paginator(results.values(
+        'id', 'user_id', 'profile_name', 'date_of_birth', 'location', 'gender',
+        'profile_image_url', 'profile_photo', 'user__username'
+    ), 24)
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    
+    return JsonResponse({
+        'results': [_member_search_result(row) for row in page.object_list],
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'total': paginator.count,
+        'facets': facet_counts(base, dimensions, selected),
+    })
+
+def _member_search_result(row):
+    """Card data for one search hit, built from .values() without extra queries"""
+    age = None
+    if row['date_of_birth']:
+        today = date.today()
+        dob = row['date_of_birth']
+        age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+    
+    if row['profile_image_url']:
+        profile_image = row['profile_image_url']
+    elif row['profile_photo']:
+        profile_image = f"{settings.MEDIA_URL}{row['profile_photo']}"
+    else:
+        profile_image = None
+    
+    return {
+        'profile_id': row['id'],
+        'user_id': row['user_id'],
+        'profile_name': row['profile_name'] or row['user__username'],
+        'age': age,
+        'location': row['location'],
+        'gender': row['gender'],
+        'profile_image': profile_image,
+    }
+
 # -------------------------
 # PROFILE CREATION FLOW
 # -------------------------
@@ -1020,10 +1130,9 @@ def notification_counts(request):
     unviewed_mutual_count = len(request.session.get('unviewed_mutual_matches', []))
     
     # Dates count
-    viewed_date_ids = DateView.objects.filter(user=request.user).values_list('date_event_id', flat=True)
-    new_dates_count = DateEvent.objects.exclude(id__in=viewed_date_ids).exclude(
-        is_cancelled=True
-    ).filter(date_time__gt=timezone.now()).count()
+    new_dates_count = DateEvent.objects.new_for(
+        request.user, DateSeenWatermark.get_for(request.user)
+    ).count()
     
     # Calculate totals
     likes_total = unviewed_likes_count + unviewed_mutual_count
@@ -1399,21 +1508,83 @@ def profile_edit_request(request):
 
 @login_required
 def dates_list(request):
-    """Dates list page with real database data"""
-    # Get all date events, ordered by date
-    date_events = DateEvent.objects.all().order_by('date_time')
+    """Upcoming dates feed (or ?view=archived for past events), paginated"""
+    archived = request.GET.get('view') == 'archived'
+    opened_at = timezone.now()
+    seen_until = DateSeenWatermark.get_for(request.user)
     
-    # Get which dates the current user has viewed
-    viewed_dates = list(DateView.objects.filter(
-        user=request.user
-    ).values_list('date_event_id', flat=True))
+    date_events = DateEvent.objects.archived() if archived else DateEvent.objects.upcoming()
+    date_events = date_events.select_related('host').with_seen(request.user, seen_until).with_rsvp(request.user)
+    
+    paginator = Paginator(date_events, 20)
+    page = request.GET.get('page', 1)
+    
+    try:
+        date_events_page = paginator.page(page)
+    except PageNotAnInteger:
+        date_events_page = paginator.page(1)
+    except EmptyPage:
+        date_events_page = paginator.page(paginator.num_pages)
+    
+    # Opening the feed clears the new-dates badge
+    if not archived:
+        DateSeenWatermark.advance(request.user, opened_at)
     
     context = {
-        'date_events': date_events,
-        'viewed_dates': viewed_dates,
+        'date_events': date_events_page,
+        'page_obj': date_events_page,
+        'archived': archived,
     }
     return render(request, 'website/dates_list.html', context)
 
+@login_required
+def dates_search(request):
+    """
+    Date discovery: combinable filters + facet counts, paginated.
+    ?activity=Coffee&vibe=Chill&area=Bondi&audience=anyone&page=2
+    """
+    base = searchable_dates(request.user)
+    
+    # Keep a requested area selectable even if it's beyond the option cap
+    areas = area_options(base)
+    areas += [area for area in request.GET.getlist('area') if area and area not in areas]
+    
+    dimensions = date_dimensions(areas)
+    selected = selected_from_querydict(request.GET, dimensions)
+    results = apply_facet_filters(base, dimensions, selected).select_related('host').with_seen(
+        request.user, DateSeenWatermark.get_for(request.user)
+    )
+    
+    paginator = Paginator(results, 20)
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    
+    return JsonResponse({
+        'results': [{
+            'id': date_event.id,
+            'title': date_event.title,
+            'host': date_event.host.username,
+            'host_id': date_event.host_id,
+            'activity': date_event.activity,
+            'vibe': date_event.vibe,
+            'budget': date_event.budget,
+            'duration': date_event.duration,
+            'group_size': date_event.get_group_size_display(),
+            'audience': date_event.get_audience_display(),
+            'area': date_event.area,
+            'date_time': date_event.date_time.isoformat(),
+            'seen': date_event.seen,
+        } for date_event in page.object_list],
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'total': paginator.count,
+        'facets': facet_counts(base, dimensions, selected),
+    })
+
 @login_required
 def dates_create(request):
     """Create a new date event"""
@@ -1501,23 +1672,122 @@ def cancel_date(request, dates_id):
     
     return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
 
+# -------------------------
+# DATE RSVPS
+# -------------------------
+
+@login_required
+def date_rsvp(request, dates_id):
+    """Join a date (capacity enforced by a conditional counter update)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+    
+    try:
+        date_event = DateEvent.objects.get(id=dates_id)
+    except DateEvent.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Date not found'}, status=404)
+    
+    success, error = date_event.join(request.user)
+    if not success:
+        return JsonResponse({'success': False, 'error': error}, status=409)
+    
+    return JsonResponse({
+        'success': True,
+        'attendee_count': date_event.attendee_count,
+        'spots_left': date_event.spots_left(),
+    })
+
+@login_required
+def date_rsvp_cancel(request, dates_id):
+    """Withdraw from a date"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+    
+    try:
+        date_event = DateEvent.objects.get(id=dates_id)
+    except DateEvent.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Date not found'}, status=404)
+    
+    if not date_event.leave(request.user):
+        return JsonResponse({'success': False, 'error': 'You are not going to this date'}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'attendee_count': date_event.attendee_count,
+        'spots_left': date_event.spots_left(),
+    })
+
+@login_required
+def date_attendees(request, dates_id):
+    """Paginated attendee list for a date"""
+    try:
+        date_event = DateEvent.objects.get(id=dates_id)
+    except DateEvent.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Date not found'}, status=404)
+    
+    attendees = DateRSVP.objects.filter(date_event=date_event).order_by('created_at', 'id').values(
+        'user_id', 'user__username', 'user__profile__id', 'user__profile__profile_name', 'created_at'
+    )
+    paginator = Paginator(attendees, 25)
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    
+    return JsonResponse({
+        'success': True,
+        'attendees': [{
+            'user_id': row['user_id'],
+            'profile_id': row['user__profile__id'],
+            'name': row['user__profile__profile_name'] or row['user__username'],
+            'joined_at': row['created_at'].isoformat(),
+        } for row in page.object_list],
+        'attendee_count': date_event.attendee_count,
+        'spots_left': date_event.spots_left(),
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+    })
+
+@login_required
+def my_upcoming_dates(request):
+    """Upcoming dates the user is going to, soonest first"""
+    date_events = DateEvent.objects.upcoming().filter(
+        rsvps__user=request.user
+    ).select_related('host')
+    
+    paginator = Paginator(date_events, 20)
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    
+    return JsonResponse({
+        'success': True,
+        'dates': [{
+            'id': date_event.id,
+            'title': date_event.title,
+            'host': date_event.host.username,
+            'area': date_event.area,
+            'date_time': date_event.date_time.isoformat(),
+            'attendee_count': date_event.attendee_count,
+        } for date_event in page.object_list],
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+    })
+
 @login_required
 def dates_new_count(request):
     """Return count of new/unseen dates for badge"""
     if not request.user.is_authenticated:
         return JsonResponse({'count': 0})
     
-    # Count dates that user hasn't viewed yet
-    viewed_date_ids = DateView.objects.filter(
-        user=request.user
-    ).values_list('date_event_id', flat=True)
-    
-    new_dates_count = DateEvent.objects.exclude(
-        id__in=viewed_date_ids
-    ).exclude(
-        is_cancelled=True
-    ).filter(
-        date_time__gt=timezone.now()
+    # Count dates posted since the user last opened the feed
+    new_dates_count = DateEvent.objects.new_for(
+        request.user, DateSeenWatermark.get_for(request.user)
     ).count()
     
     return JsonResponse({'count': new_dates_count})
@@ -1848,7 +2118,11 @@ def delete_message(request, message_id):
 
 @login_required
 def export_user_data(request, user_id=None):
-    """Export user data for legal compliance (GDPR)"""
+    """
+    Queue a complete data export for legal compliance (GDPR).
+    The archive is built in the background (process_data_exports) and a
+    download link is emailed when it's ready; poll status_url meanwhile.
+    """
     try:
         # If user_id is provided and user is staff, export that user's data
         # Otherwise, export the current user's data
@@ -1856,125 +2130,105 @@ def export_user_data(request, user_id=None):
             user = get_user_model().objects.get(id=user_id)
         else:
             user = request.user
-            
-        # Collect user data
-        user_data = {
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'date_joined': user.date_joined.isoformat(),
-                'last_login': user.last_login.isoformat() if user.last_login else None,
-                'is_active': user.is_active,
-            },
-            'profile': None,
-            'messages_sent': [],
-            'messages_received': [],
-            'likes_given': [],
-            'likes_received': [],
-            'private_access_requests': [],
-            'activity_logs': []
-        }
-        
-        # Get profile data
-        try:
-            profile = user.profile
-            user_data['profile'] = {
-                'profile_name': profile.profile_name,
-                'date_of_birth': profile.date_of_birth.isoformat() if profile.date_of_birth else None,
-                'relationship_status': profile.relationship_status,
-                'body_type': profile.body_type,
-                'location': profile.location,
-                'story': profile.story,
-                'created_at': profile.created_at.isoformat(),
-                'updated_at': profile.updated_at.isoformat(),
-            }
-        except UserProfile.DoesNotExist:
-            pass
-        
-        # Get messages sent
-        messages_sent = Message.objects.filter(sender=user).order_by('-created_at')[:100]
-        for msg in messages_sent:
-            user_data['messages_sent'].append({
-                'id': msg.id,
-                'content': msg.content,
-                'created_at': msg.created_at.isoformat(),
-                'is_read': msg.is_read,
-                'conversation_id': msg.conversation.id
-            })
-        
-        # Get messages received
-        messages_received = Message.objects.filter(
-            conversation__participants=user
-        ).exclude(sender=user).order_by('-created_at')[:100]
-        
-        for msg in messages_received:
-            user_data['messages_received'].append({
-                'id': msg.id,
-                'content': msg.content,
-                'created_at': msg.created_at.isoformat(),
-                'is_read': msg.is_read,
-                'sender': msg.sender.username,
-                'conversation_id': msg.conversation.id
-            })
-        
-        # Get likes given
-        likes_given = UserLike.objects.filter(user=user)
-        for like in likes_given:
-            user_data['likes_given'].append({
-                'liked_user_id': like.liked_user_id,
-                'created_at': like.created_at.isoformat()
-            })
-        
-        # Get likes received
-        likes_received = UserLike.objects.filter(liked_user_id=user.id)
-        for like in likes_received:
-            user_data['likes_received'].append({
-                'user_id': like.user_id,
-                'created_at': like.created_at.isoformat()
-            })
         
-        # Get private access requests
-        access_requests = PrivateAccessRequest.objects.filter(
-            requester=user
-        ) | PrivateAccessRequest.objects.filter(
-            target_user=user
-        )
-        
-        for req in access_requests:
-            user_data['private_access_requests'].append({
-                'id': req.id,
-                'requester': req.requester.username,
-                'target_user': req.target_user.username,
-                'status': req.status,
-                'message': req.message,
-                'created_at': req.created_at.isoformat(),
-                'granted_at': req.granted_at.isoformat() if req.granted_at else None,
-                'denied_at': req.denied_at.isoformat() if req.denied_at else None,
-                'revoked_at': req.revoked_at.isoformat() if req.revoked_at else None
-            })
-        
-        # Get activity logs
-        activity_logs = UserActivityLog.objects.filter(user=user).order_by('-created_at')[:100]
-        for log in activity_logs:
-            user_data['activity_logs'].append({
-                'id': log.id,
-                'activity_type': log.activity_type,
-                'target_user': log.target_user.username if log.target_user else None,
-                'ip_address': log.ip_address,
-                'created_at': log.created_at.isoformat(),
-                'additional_data': log.additional_data
-            })
-        
-        # Return as JSON
-        response = JsonResponse(user_data, json_dumps_params={'indent': 2})
-        response['Content-Disposition'] = f'attachment; filename="user_data_{user.id}_{timezone.now().date()}.json"'
-        return response
+        export = request_export(user, requested_by=request.user)
+        return JsonResponse(_data_export_status(export), status=202 if export.status != 'ready' else 200)
         
+    except get_user_model().DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': 'User not found'}, status=404)
     except Exception as e:
         return JsonResponse({
             'status': 'error',
             'message': f'Error exporting data: {str(e)}'
         }, status=500)
+
+def _data_export_status(export):
+    data = {
+        'status': export.status,
+        'export_id': export.id,
+        'user_id': export.user_id,
+        'requested_at': export.created_at.isoformat(),
+        'status_url': reverse('data_export_status', args=[export.id]),
+    }
+    if export.status == 'ready':
+        data.update({
+            'download_url': reverse('download_data_export', args=[export.id]),
+            'size': export.size,
+            'row_counts': export.row_counts,
+        })
+    elif export.status == 'failed':
+        data['message'] = 'The export failed - please request it again'
+    return data
+
+def _visible_export(request, export_id):
+    """The export if it's the requester's own (or they're staff), else 404"""
+    export = get_object_or_404(DataExport.objects.select_related('user'), id=export_id)
+    if not request.user.is_staff and export.user_id != request.user.id:
+        raise Http404("Export not found")
+    return export
+
+@login_required
+def data_export_status(request, export_id):
+    """Where a queued export is up to"""
+    return JsonResponse(_data_export_status(_visible_export(request, export_id)))
+
+@login_required
+def download_data_export(request, export_id):
+    """Stream a finished export archive from storage"""
+    export = _visible_export(request, export_id)
+    if export.status != 'ready' or not export.file:
+        raise Http404("Export not ready")
+    filename = f"user_data_{export.user_id}_{export.created_at:%Y-%m-%d}.zip"
+    return FileResponse(export.file.open('rb'), as_attachment=True, filename=filename,
+                        content_type='application/zip')
+
+def _parse_when(value, end=False):
+    """ISO date or datetime from a query param -> aware datetime (a bare end date is inclusive)"""
+    if not value:
+        return None
+    when = parse_datetime(value)
+    if when is None:
+        try:
+            day = date.fromisoformat(value)
+        except ValueError:
+            return None
+        when = datetime.combine(day + timedelta(days=1) if end else day, datetime.min.time())
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+@login_required
+def export_activity_logs(request):
+    """
+    Stream activity logs for legal requests (staff only).
+    ?user_id=1&user_id=2 &ip=... &type=... &start=2024-01-01 &end=2024-12-31
+    &format=csv|ndjson &gzip=1 - any size, constant memory.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Staff only'}, status=403)
+
+    logs = UserActivityLog.objects.all()
+    user_ids = [value for value in request.GET.getlist('user_id') if value.isdigit()]
+    if user_ids:
+        logs = logs.involving(user_ids)
+    if request.GET.get('ip'):
+        logs = logs.filter(ip_address=request.GET['ip'])
+    if request.GET.get('type'):
+        logs = logs.filter(activity_type=request.GET['type'])
+
+    start = _parse_when(request.GET.get('start'))
+    end = _parse_when(request.GET.get('end'), end=True)
+    if start:
+        logs = logs.filter(created_at__gte=start)
+    if end:
+        logs = logs.filter(created_at__lt=end)
+
+    if not (user_ids or request.GET.get('ip') or start or end):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Give at least one of user_id, ip, start or end'
+        }, status=400)
+
+    fmt = request.GET.get('format', 'csv')
+    filename = f"activity_logs_{timezone.now():%Y%m%d_%H%M%S}"
+    return activity_log_export(logs, filename, fmt, request.GET.get('gzip') == '1')